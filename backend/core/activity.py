@@ -0,0 +1,168 @@
+"""
+Append-only activity stream behind the dashboard feed.
+
+Events are written when the underlying change happens and carry the actor
+name denormalized, so reading the latest N events is a single indexed query
+with no joins. Pagination is keyset based on (created_at, id).
+
+Complaints, payments, room allocations and visitors are followed at the
+model layer: core.signals records an event when one is created or its
+status changes through save(). Code that writes them with bulk_create(),
+bulk_update() or update() calls record_changes() for the rows it wrote.
+"""
+import base64
+import logging
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q, prefetch_related_objects
+
+from .models import ActivityEvent, Complaint, Payment, RoomAllocation, Visitor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEED_LIMIT = 15
+MAX_FEED_LIMIT = 100
+
+
+def build_activity(event_type, user, description, object_id=None, scope=ActivityEvent.Scope.STAFF, created_at=None):
+    """
+    Unsaved ActivityEvent, for callers that bulk_create a batch of them
+    """
+    activity = ActivityEvent(
+        event_type=event_type,
+        scope=scope,
+        user=user,
+        user_name=user.get_full_name() if user else '',
+        description=description[:300],
+        object_id=str(object_id) if object_id is not None else '',
+    )
+    if created_at is not None:
+        activity.created_at = created_at
+    return activity
+
+
+def record_activity(event_type, user, description, object_id=None, scope=ActivityEvent.Scope.STAFF):
+    """
+    Append one event to the stream; failures are logged, never raised
+    """
+    try:
+        activity = build_activity(event_type, user, description, object_id, scope)
+        # A savepoint, so a failed insert does not break the caller's transaction
+        with transaction.atomic():
+            activity.save()
+        return activity
+    except Exception as e:
+        logger.error(f"Failed to record activity: {e}")
+
+
+def _describe_complaint(complaint, created):
+    if created:
+        return f'New complaint: {complaint.title}'
+    return f'Complaint {complaint.get_status_display().lower()}: {complaint.title}'
+
+
+def _describe_payment(payment, created):
+    name = payment.user.get_full_name()
+    if created:
+        return f'{name} was billed ₹{payment.amount}'
+    if payment.status == Payment.Status.SUCCESS:
+        return f'{name} paid ₹{payment.amount}'
+    if payment.status == Payment.Status.REFUNDED:
+        return f'{name} was refunded ₹{payment.amount}'
+    return f'Payment of ₹{payment.amount} by {name} is {payment.get_status_display().lower()}'
+
+
+def _describe_allocation(allocation, created):
+    name = allocation.user.get_full_name()
+    if allocation.status == RoomAllocation.Status.ACTIVE:
+        return f'{name} moved into room {allocation.room.number}'
+    return f'{name} moved out of room {allocation.room.number}'
+
+
+def _describe_visitor(visitor, created):
+    if created:
+        return f'Visitor request: {visitor.visitor_name}'
+    return f'Visitor {visitor.get_status_display().lower()}: {visitor.visitor_name}'
+
+
+# Followed models: (event type, owner field, related objects the description
+# reads, describe(instance, created))
+FOLLOWED = {
+    Complaint: ('complaint', 'user', ('user',), _describe_complaint),
+    Payment: ('payment', 'user', ('user',), _describe_payment),
+    RoomAllocation: ('allocation', 'user', ('user', 'room'), _describe_allocation),
+    Visitor: ('visitor', 'student', ('student',), _describe_visitor),
+}
+
+
+def remember_status(instance):
+    """
+    Note the status an instance was loaded or last recorded with, so a later
+    save can tell whether it changed. Deferred status is left unloaded.
+    """
+    instance._activity_status = instance.__dict__.get('status')
+
+
+def activity_for(instance, created):
+    """
+    Unsaved ActivityEvent for a followed instance that was just created or
+    whose status changed, or None
+    """
+    event_type, owner, _related, describe = FOLLOWED[type(instance)]
+    if not created:
+        previous = getattr(instance, '_activity_status', None)
+        if previous is None or previous == instance.__dict__.get('status', previous):
+            return None
+    remember_status(instance)
+    return build_activity(event_type, getattr(instance, owner), describe(instance, created), instance.pk)
+
+
+def record_changes(instances, created=False):
+    """
+    Record events for instances of one followed model written in bulk, with
+    one query per related object type and one insert
+    """
+    instances = [instance for instance in instances if instance.pk is not None]
+    if not instances:
+        return []
+    prefetch_related_objects(instances, *FOLLOWED[type(instances[0])][2])
+    events = [event for event in (activity_for(instance, created) for instance in instances) if event]
+    try:
+        with transaction.atomic():
+            return ActivityEvent.objects.bulk_create(events, batch_size=500)
+    except Exception as e:
+        logger.error(f"Failed to record activity: {e}")
+        return []
+
+
+def encode_cursor(event):
+    raw = f'{event.created_at.isoformat()}|{event.pk}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def activity_feed(user, limit=DEFAULT_FEED_LIMIT, cursor=None):
+    """
+    Latest events visible to ``user``, newest first. Staff see the whole
+    stream; students see public events and their own. Returns
+    (events, next_cursor).
+    """
+    limit = max(1, min(limit, MAX_FEED_LIMIT))
+    queryset = ActivityEvent.objects.order_by('-created_at', '-id')
+    if user.role == 'student':
+        queryset = queryset.filter(Q(scope=ActivityEvent.Scope.ALL) | Q(user=user))
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    events = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(events[limit - 1]) if len(events) > limit else None
+    return events[:limit], next_cursor
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Room, Attendance, Complaint, Payment, Feedback, RoomAllocation
+from .models import User, Room, Attendance, Complaint, Payment, Feedback, RoomAllocation, Job
 
 
 @admin.register(User)
@@ -42,3 +42,7 @@ class RoomAllocationAdmin(admin.ModelAdmin):
     list_display = ("user", "room", "start_date", "end_date")
 
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "task")
@@ -0,0 +1,478 @@
+"""
+Room assignment: batch intake and race-free transfers.
+
+The solver works entirely in memory: free beds are bucketed by
+(room_type, floor) and sorted by rent, so finding a slot for a student is a
+walk over a handful of buckets instead of a scan over every room. A greedy
+pass places the most constrained students first, then a repair pass tries to
+place the leftovers by moving an already placed student into a free bed that
+still satisfies their own constraints.
+
+Transfers use optimistic concurrency: Room and RoomAllocation carry a
+``version`` column, every write is a compare-and-swap on that column, and a
+lost race rolls the whole transfer back and retries it. A batch intake
+reads, solves and inserts in one transaction with the rooms and pending
+students row-locked, and bumps the versions of the rooms it fills.
+"""
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, OperationalError
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .activity import record_changes
+from .backends import write_atomic
+from .models import Room, RoomAllocation
+
+
+User = get_user_model()
+
+# Preference satisfaction levels used for scoring and reporting
+SCORE_EXACT = 3
+SCORE_ROOM_TYPE = 2
+SCORE_FLOOR = 1
+SCORE_NONE = 0
+
+SCORE_LABELS = {
+    SCORE_EXACT: 'room_type_and_floor',
+    SCORE_ROOM_TYPE: 'room_type_only',
+    SCORE_FLOOR: 'floor_only',
+    SCORE_NONE: 'no_preference_met',
+}
+
+# Upper bound on rooms inspected per unassigned student during repair
+MAX_REPAIR_CANDIDATES = 50
+
+# Transfer retry policy for lost optimistic-locking races
+TRANSFER_MAX_ATTEMPTS = 5
+TRANSFER_BACKOFF_SECONDS = 0.005
+
+
+class AllocationError(Exception):
+    """The request cannot be satisfied (unknown room, room full, ...)."""
+
+
+class AllocationConflict(Exception):
+    """A concurrent update changed a row we read; safe to retry."""
+
+
+class _Bucket:
+    """Rooms sharing a (room_type, floor) key, cheapest first."""
+
+    __slots__ = ('rooms', 'cursor')
+
+    def __init__(self, rooms):
+        self.rooms = sorted(rooms, key=lambda r: (r['rent'], r['number']))
+        self.cursor = 0
+
+    def first_free(self, max_rent):
+        # Rooms only ever fill up during a solve, so full rooms at the front
+        # can be skipped permanently.
+        rooms = self.rooms
+        while self.cursor < len(rooms) and rooms[self.cursor]['free'] <= 0:
+            self.cursor += 1
+        if self.cursor >= len(rooms):
+            return None
+        room = rooms[self.cursor]
+        if max_rent is not None and room['rent'] > max_rent:
+            return None
+        return room
+
+
+def _score(student, room):
+    type_ok = student['room_type'] is None or student['room_type'] == room['room_type']
+    floor_ok = student['floor'] is None or student['floor'] == room['floor']
+    if type_ok and floor_ok:
+        return SCORE_EXACT
+    if type_ok:
+        return SCORE_ROOM_TYPE
+    if floor_ok:
+        return SCORE_FLOOR
+    return SCORE_NONE
+
+
+class _Index:
+    """Bucketed view over free beds used by the greedy and repair passes."""
+
+    def __init__(self, rooms):
+        grouped = defaultdict(list)
+        for room in rooms:
+            grouped[(room['room_type'], room['floor'])].append(room)
+        self.buckets = {key: _Bucket(items) for key, items in grouped.items()}
+        self.floors_by_type = defaultdict(list)
+        self.types_by_floor = defaultdict(list)
+        for room_type, floor in self.buckets:
+            self.floors_by_type[room_type].append(floor)
+            self.types_by_floor[floor].append(room_type)
+        self.all_keys = sorted(self.buckets, key=lambda k: (k[1], k[0]))
+
+    def _keys_for(self, student):
+        """Bucket keys in order of decreasing preference for ``student``."""
+        room_type, floor = student['room_type'], student['floor']
+        seen = set()
+
+        def emit(key):
+            if key in self.buckets and key not in seen:
+                seen.add(key)
+                return True
+            return False
+
+        if room_type is not None and floor is not None and emit((room_type, floor)):
+            yield (room_type, floor)
+        if room_type is not None:
+            floors = self.floors_by_type.get(room_type, [])
+            if floor is not None:
+                floors = sorted(floors, key=lambda f: (abs(f - floor), f))
+            for f in floors:
+                if emit((room_type, f)):
+                    yield (room_type, f)
+        if floor is not None:
+            for t in self.types_by_floor.get(floor, []):
+                if emit((t, floor)):
+                    yield (t, floor)
+        for key in self.all_keys:
+            if emit(key):
+                yield key
+
+    def find_slot(self, student):
+        # Keys come out in decreasing preference order, so the first free
+        # affordable bed is also the best scoring one.
+        for key in self._keys_for(student):
+            room = self.buckets[key].first_free(student['max_rent'])
+            if room is not None:
+                return room, _score(student, room)
+        return None
+
+    def repair_candidates(self, student):
+        """Full rooms the student could afford, best preference match first."""
+        count = 0
+        for key in self._keys_for(student):
+            for room in self.buckets[key].rooms:
+                if student['max_rent'] is not None and room['rent'] > student['max_rent']:
+                    break
+                if room['free'] <= 0 and room['assigned']:
+                    yield room
+                    count += 1
+                    if count >= MAX_REPAIR_CANDIDATES:
+                        return
+
+
+def solve_room_assignment(students, rooms):
+    """
+    Assign students to rooms in memory.
+
+    ``students`` is a list of dicts with ``id``, ``room_type``, ``floor`` and
+    ``max_rent`` (any of the last three may be None). ``rooms`` is a list of
+    dicts with ``id``, ``number``, ``room_type``, ``floor``, ``rent`` and
+    ``free`` (number of free beds). Returns ``(assignments, unassigned)``
+    where ``assignments`` maps student id to ``(room, score)``.
+    """
+    rooms = [dict(room, assigned=[]) for room in rooms if room['free'] > 0]
+    index = _Index(rooms)
+
+    # Most constrained students first: tight budgets, then specific preferences
+    def constraint_key(student):
+        max_rent = student['max_rent']
+        return (
+            max_rent is None,
+            max_rent if max_rent is not None else 0,
+            student['room_type'] is None,
+            student['floor'] is None,
+            student['id'],
+        )
+
+    assignments = {}
+    by_id = {}
+    unassigned = []
+    for student in sorted(students, key=constraint_key):
+        by_id[student['id']] = student
+        slot = index.find_slot(student)
+        if slot is None:
+            unassigned.append(student)
+            continue
+        room, score = slot
+        room['free'] -= 1
+        room['assigned'].append(student['id'])
+        assignments[student['id']] = (room, score)
+
+    # Repair: free a bed for each leftover by relocating a placed student.
+    # Beds only fill up from here on, so the cheapest free rent is a lower
+    # bound for the whole pass and a budget that failed once fails again.
+    free_rents = [room['rent'] for room in rooms if room['free'] > 0]
+    cheapest_free = min(free_rents) if free_rents else None
+    failed_budget = None
+    still_unassigned = []
+    for student in unassigned:
+        budget = student['max_rent']
+        if cheapest_free is None or (failed_budget is not None and budget is not None and budget <= failed_budget):
+            still_unassigned.append(student)
+            continue
+        placed = False
+        for room in index.repair_candidates(student):
+            for other_id in room['assigned']:
+                other = by_id[other_id]
+                if other['max_rent'] is not None and other['max_rent'] < cheapest_free:
+                    continue
+                slot = index.find_slot(other)
+                if slot is None:
+                    continue
+                new_room, new_score = slot
+                room['assigned'].remove(other_id)
+                new_room['free'] -= 1
+                new_room['assigned'].append(other_id)
+                assignments[other_id] = (new_room, new_score)
+                room['assigned'].append(student['id'])
+                assignments[student['id']] = (room, _score(student, room))
+                placed = True
+                break
+            if placed:
+                break
+        if not placed:
+            still_unassigned.append(student)
+            if budget is not None and (failed_budget is None or budget > failed_budget):
+                failed_budget = budget
+
+    return assignments, still_unassigned
+
+
+def summarize_assignment(assignments, unassigned, total_beds, elapsed):
+    """
+    Build a quality report for a solved assignment
+    """
+    total_students = len(assignments) + len(unassigned)
+    satisfaction = {label: 0 for label in SCORE_LABELS.values()}
+    total_score = 0
+    for _room, score in assignments.values():
+        satisfaction[SCORE_LABELS[score]] += 1
+        total_score += score
+
+    assigned = len(assignments)
+    return {
+        'total_students': total_students,
+        'assigned': assigned,
+        'unassigned': len(unassigned),
+        'unassigned_students': [s['id'] for s in unassigned],
+        'assignment_rate': round((assigned / total_students * 100) if total_students > 0 else 0, 2),
+        'bed_utilization': round((assigned / total_beds * 100) if total_beds > 0 else 0, 2),
+        'preference_satisfaction': satisfaction,
+        'average_score': round((total_score / assigned) if assigned > 0 else 0, 2),
+        'max_score': SCORE_EXACT,
+        'solve_seconds': round(elapsed, 4),
+    }
+
+
+def load_pending_students(preferences=None, student_ids=None, max_rent=None):
+    """
+    Load active students without an active allocation, merged with their
+    room_type/floor/max_rent preferences (keyed by user id).
+    """
+    preferences = preferences or {}
+    queryset = User.objects.filter(role='student', is_active=True).exclude(
+        allocations__status='active'
+    )
+    if student_ids is not None:
+        queryset = queryset.filter(id__in=student_ids)
+
+    students = []
+    for user_id in queryset.values_list('id', flat=True).iterator():
+        pref = preferences.get(user_id, {})
+        student_max_rent = pref.get('max_rent')
+        if max_rent is not None:
+            student_max_rent = min(max_rent, student_max_rent) if student_max_rent is not None else max_rent
+        students.append({
+            'id': user_id,
+            'room_type': pref.get('room_type') or None,
+            'floor': pref.get('floor'),
+            'max_rent': Decimal(str(student_max_rent)) if student_max_rent is not None else None,
+        })
+    return students
+
+
+def load_room_capacity():
+    """
+    Load every room that can take students together with its free beds,
+    using a single aggregate query.
+    """
+    rooms = (
+        Room.objects.exclude(status='maintenance')
+        .annotate(occupied=Count('allocations', filter=Q(allocations__status='active')))
+        .values('id', 'number', 'room_type', 'floor', 'monthly_rent', 'capacity', 'occupied')
+    )
+    return [
+        {
+            'id': room['id'],
+            'number': room['number'],
+            'room_type': room['room_type'],
+            'floor': room['floor'],
+            'rent': room['monthly_rent'],
+            'capacity': room['capacity'],
+            'free': room['capacity'] - room['occupied'],
+        }
+        for room in rooms
+    ]
+
+
+def _lock_for_allocation(student_ids=None):
+    """
+    Row-lock the candidate students, then every room that can take them.
+    Users come first and both in id order, the order transfers lock in, so
+    neither can deadlock against the other.
+    """
+    students = User.objects.filter(role='student', is_active=True)
+    if student_ids is not None:
+        students = students.filter(id__in=student_ids)
+    list(students.select_for_update().order_by('pk').values_list('pk', flat=True))
+    list(Room.objects.exclude(status='maintenance').select_for_update().order_by('pk').values_list('pk', flat=True))
+
+
+def allocate_pending_students(start_date, preferences=None, student_ids=None, max_rent=None,
+                              security_deposit_months=0, dry_run=False):
+    """
+    Solve the intake assignment and commit every RoomAllocation with a single
+    bulk_create. Returns the quality report.
+
+    Pending students and free beds are read, solved and written in one
+    transaction that holds the rooms and students locked, so a transfer or
+    another batch cannot commit in between and leave the solve working on
+    stale numbers. A dry run reads without locking. Raises
+    AllocationConflict when SQLite reports the database busy.
+    """
+    if dry_run:
+        return _allocate(start_date, preferences, student_ids, max_rent, security_deposit_months, dry_run=True)
+    try:
+        with write_atomic():
+            _lock_for_allocation(student_ids)
+            return _allocate(start_date, preferences, student_ids, max_rent, security_deposit_months)
+    except OperationalError as e:
+        if not _is_lock_error(e):
+            raise
+        raise AllocationConflict('Room allocation is busy, please retry.') from e
+
+
+def _allocate(start_date, preferences, student_ids, max_rent, security_deposit_months, dry_run=False):
+    students = load_pending_students(preferences, student_ids, max_rent)
+    rooms = load_room_capacity()
+    total_beds = sum(max(room['free'], 0) for room in rooms)
+
+    started = time.perf_counter()
+    assignments, unassigned = solve_room_assignment(students, rooms)
+    report = summarize_assignment(assignments, unassigned, total_beds, time.perf_counter() - started)
+    report['dry_run'] = dry_run
+    report['created'] = 0
+
+    if dry_run or not assignments:
+        return report
+
+    allocations = [
+        RoomAllocation(
+            user_id=user_id,
+            room_id=room['id'],
+            start_date=start_date,
+            status='active',
+            monthly_rent=room['rent'],
+            security_deposit=room['rent'] * security_deposit_months,
+        )
+        for user_id, (room, _score) in assignments.items()
+    ]
+    full_rooms = {room['id'] for room, _score in assignments.values() if room['free'] <= 0}
+
+    touched_rooms = {room['id'] for room, _score in assignments.values()}
+
+    RoomAllocation.objects.bulk_create(allocations, batch_size=1000)
+    record_changes(allocations, created=True)
+    now = timezone.now()
+    # Invalidate occupancy reads taken by in-flight transfers
+    Room.objects.filter(id__in=touched_rooms).update(version=F('version') + 1, updated_at=now)
+    if full_rooms:
+        Room.objects.filter(id__in=full_rooms).update(status='occupied', updated_at=now)
+
+    report['created'] = len(allocations)
+    return report
+
+
+def _transfer_once(user, room_id):
+    today = timezone.now().date()
+
+    # Serialize transfers of the same student; this row is never contended
+    # by anyone else, so the lock is effectively free.
+    list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+
+    room = Room.objects.filter(pk=room_id).values(
+        'id', 'capacity', 'status', 'monthly_rent', 'version'
+    ).first()
+    if room is None:
+        raise AllocationError('Room not found.')
+    if room['status'] == 'maintenance':
+        raise AllocationError('Room is under maintenance.')
+
+    current = RoomAllocation.objects.filter(user=user, status='active').order_by('-start_date', '-id').first()
+    if current and current.room_id == room['id']:
+        raise AllocationError('You are already allocated to this room.')
+
+    occupied = RoomAllocation.objects.filter(room_id=room['id'], status='active').count()
+    if occupied >= room['capacity']:
+        raise AllocationError('Room is full.')
+
+    # Claim the target room: only one of several racing transfers that read
+    # the same occupancy can move the version forward.
+    new_status = 'occupied' if occupied + 1 >= room['capacity'] else room['status']
+    now = timezone.now()
+    claimed = Room.objects.filter(pk=room['id'], version=room['version']).update(
+        version=F('version') + 1, status=new_status, updated_at=now
+    )
+    if not claimed:
+        raise AllocationConflict('Room was updated concurrently.')
+
+    security_deposit = 0
+    if current:
+        ended = RoomAllocation.objects.filter(pk=current.pk, version=current.version, status='active').update(
+            status='inactive', end_date=today, version=F('version') + 1, updated_at=now
+        )
+        if not ended:
+            raise AllocationConflict('Current allocation was updated concurrently.')
+        Room.objects.filter(pk=current.room_id).update(version=F('version') + 1, updated_at=now)
+        Room.objects.filter(pk=current.room_id, status='occupied').update(status='available', updated_at=now)
+        security_deposit = current.security_deposit
+        current.status = 'inactive'
+        record_changes([current])
+
+    return RoomAllocation.objects.create(
+        user=user,
+        room_id=room['id'],
+        start_date=today,
+        status='active',
+        monthly_rent=room['monthly_rent'],
+        security_deposit=security_deposit,
+    )
+
+
+def _is_lock_error(exc):
+    # SQLite reports lost write races as "database is locked"/"database table is locked"
+    return 'locked' in str(exc).lower()
+
+
+def transfer_allocation(user, room_id, max_attempts=TRANSFER_MAX_ATTEMPTS):
+    """
+    Move ``user`` from their active allocation (if any) into ``room_id`` as
+    one atomic operation. Lost races are retried with jittered backoff;
+    AllocationConflict is raised once ``max_attempts`` is exhausted.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with write_atomic():
+                return _transfer_once(user, room_id)
+        except AllocationConflict:
+            if attempt == max_attempts:
+                raise
+        except OperationalError as e:
+            if not _is_lock_error(e):
+                raise
+            if attempt == max_attempts:
+                raise AllocationConflict('Room allocation is busy, please retry.') from e
+        except IntegrityError as e:
+            raise AllocationError('An allocation for this room already starts today.') from e
+        time.sleep(random.uniform(0, TRANSFER_BACKOFF_SECONDS * 2 ** attempt))
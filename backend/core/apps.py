@@ -5,4 +5,10 @@ class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
 
+    def ready(self):
+        # Registers the job tasks so enqueue() and workers can find them
+        from . import tasks  # noqa: F401
+        # Activity feed events for model changes
+        from . import signals  # noqa: F401
+
 
@@ -0,0 +1,131 @@
+"""
+JWT authentication without a user query per request.
+
+Access and refresh tokens carry the user's role, active flag and
+token_version. Authentication builds a User instance from those claims
+(other fields load lazily, in one query, if a view touches them) and only
+checks that the token's version is still current. Current versions live in
+the cache; User.save() publishes a new one whenever role, is_active or the
+password changes, so tokens issued before that are rejected. Individual
+tokens revoked at logout are refused via core.revocation.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import is_token_revoked
+
+VERSION_CLAIM = 'ver'
+CLAIM_FIELDS = ('username', 'role', 'is_active')
+
+
+def _version_key(user_id):
+    return f'auth:token-version:{user_id}'
+
+
+def publish_token_version(user_id, version):
+    """
+    Make a new token version visible to every worker once the change commits
+    """
+    transaction.on_commit(
+        lambda: cache.set(_version_key(user_id), version, settings.AUTH_TOKEN_VERSION_CACHE_SECONDS)
+    )
+
+
+def current_token_version(user_id):
+    """
+    The user's token version from the cache, falling back to the database
+    on a miss. None if the user no longer exists.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = get_user_model().objects.filter(pk=user_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, settings.AUTH_TOKEN_VERSION_CACHE_SECONDS)
+    return version
+
+
+def check_token_version(token):
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+    version = current_token_version(user_id)
+    if version is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if token.get(VERSION_CLAIM) != version:
+        raise AuthenticationFailed(_("Token is no longer valid, please sign in again"), code="token_version")
+
+
+def check_not_revoked(token):
+    if is_token_revoked(token):
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+def user_from_claims(token):
+    """
+    A User carrying only what the token asserts; any other field is loaded
+    from the database on first access
+    """
+    User = get_user_model()
+    claims = {
+        'id': token[api_settings.USER_ID_CLAIM],
+        'token_version': token[VERSION_CLAIM],
+        **{name: token[name] for name in CLAIM_FIELDS},
+    }
+    # from_db expects values in the model's field order
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in claims]
+    user = User.from_db(DEFAULT_DB_ALIAS, field_names, [claims[name] for name in field_names])
+    user.from_token_claims = True
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        check_not_revoked(validated_token)
+        return validated_token
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token or any(name not in validated_token for name in CLAIM_FIELDS):
+            # Issued before claims were added; load the user the old way
+            return super().get_user(validated_token)
+
+        check_token_version(validated_token)
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user_from_claims(validated_token)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for name in CLAIM_FIELDS:
+            token[name] = getattr(user, name)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuse revoked refresh tokens and those issued before the user's last
+    role, status or password change, since the new access token would copy
+    stale claims
+    """
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        try:
+            check_not_revoked(refresh)
+            if VERSION_CLAIM in refresh:
+                check_token_version(refresh)
+        except AuthenticationFailed as e:
+            raise InvalidToken(e.detail)
+        return super().validate(attrs)
@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def write_atomic(using=None):
+    """
+    transaction.atomic() for a block that reads and then writes. On the tuned
+    SQLite backend the outermost block starts with BEGIN IMMEDIATE, so
+    concurrent writers queue on the busy timeout instead of failing; elsewhere
+    it is a plain atomic() and select_for_update() does the locking.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    immediate = hasattr(connection, 'begin_immediate') and not connection.in_atomic_block
+    if not immediate:
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
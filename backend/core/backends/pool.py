@@ -0,0 +1,155 @@
+"""
+In-process database connection pool.
+
+Connections are checked out when Django opens a connection and returned when
+it closes one (end of request with CONN_MAX_AGE = 0), so a request reuses an
+already authenticated connection instead of paying for a new one. Checkouts
+block up to ``timeout`` seconds when ``max_size`` connections are in use.
+Each pool counts checkouts, waits and timeouts for the pool stats endpoint.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+DEFAULTS = {
+    'max_size': 10,
+    'timeout': 10.0,
+    'max_idle': 300.0,
+}
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, max_size=10, timeout=10.0, max_idle=300.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'connections_opened': 0,
+            'connections_closed': 0,
+        }
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._stats['connections_closed'] += 1
+
+    def get(self, connect):
+        """
+        An idle connection, or a new one from ``connect()`` while below max_size
+        """
+        waited_since = None
+        stale = []
+        with self._cond:
+            while True:
+                while self._idle:
+                    connection, returned_at = self._idle.pop()
+                    if time.monotonic() - returned_at <= self.max_idle:
+                        break
+                    # The server or a proxy may have dropped it; open a fresh one instead
+                    stale.append(connection)
+                    self._size -= 1
+                else:
+                    connection = None
+                if connection is not None or self._size < self.max_size:
+                    break
+                now = time.monotonic()
+                if waited_since is None:
+                    waited_since = now
+                    self._stats['waits'] += 1
+                remaining = self.timeout - (now - waited_since)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    self._stats['wait_seconds'] += now - waited_since
+                    raise PoolTimeout(f'No database connection available within {self.timeout}s')
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._stats['wait_seconds'] += time.monotonic() - waited_since
+            if connection is None:
+                self._size += 1
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            for old in stale:
+                self._close(old)
+
+        if connection is None:
+            try:
+                connection = connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['connections_opened'] += 1
+        return connection
+
+    def put(self, connection):
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, connection):
+        """
+        Close a connection that must not be reused (broken, mid-transaction)
+        """
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._close(connection)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                **self._stats,
+                'wait_seconds': round(self._stats['wait_seconds'], 3),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """
+    The process's pool for a database alias, configured from its "POOL" settings
+    """
+    pool = _pools.get(alias)
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pools_lock:
+        pool = _pools.get(alias)
+        # A forked worker must not share its parent's sockets
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(**{**DEFAULTS, **settings_dict.get('POOL', {})})
+            _pools[alias] = pool
+    return pool
+
+
+def pool_stats():
+    return {alias: pool.stats() for alias, pool in _pools.items() if pool.pid == os.getpid()}
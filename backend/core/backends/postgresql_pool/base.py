@@ -0,0 +1,49 @@
+"""
+PostgreSQL backend that checks connections out of an in-process pool.
+
+Use it as ENGINE "core.backends.postgresql_pool" with CONN_MAX_AGE = 0 and
+optional "POOL" settings (max_size, timeout, max_idle). Closing the
+connection at the end of a request returns it to the pool after rolling back
+anything left open; broken connections are discarded.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions
+
+from ..pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict)
+        connection = pool.get(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # A reused connection skipped the isolation level bookkeeping done on connect
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _reusable(self, connection):
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+                return True
+            except Exception:
+                return False
+        return False
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = get_pool(self.alias, self.settings_dict)
+        with self.wrap_database_errors:
+            # Closed inside atomic(): Django keeps referencing the connection, so it cannot be shared
+            if self.in_atomic_block or not self._reusable(self.connection):
+                pool.discard(self.connection)
+            else:
+                pool.put(self.connection)
@@ -0,0 +1,46 @@
+"""
+SQLite backend tuned for a single node serving concurrent requests.
+
+Every new connection gets the "PRAGMAS" from its settings: WAL so readers
+never block the writer, synchronous=NORMAL (safe with WAL, no fsync per
+commit), a memory-mapped file and a larger page cache for reads, a busy
+timeout so writers queue instead of failing, and in-memory temp tables.
+
+Transactions stay deferred, so a read-only atomic() is a WAL snapshot that
+never blocks writers. Blocks that read and then write use
+core.backends.write_atomic(), which starts them with BEGIN IMMEDIATE: a
+deferred transaction that has read cannot wait for the write lock and fails
+straight away with "database is locked".
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are KiB
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Set by write_atomic() for the BEGIN of its transaction only
+    begin_immediate = False
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.settings_dict.get('PRAGMAS', DEFAULT_PRAGMAS))
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
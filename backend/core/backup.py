@@ -0,0 +1,390 @@
+"""
+Streaming database backups.
+
+A backup is a directory under BACKUP_DIR with one gzip-compressed NDJSON
+file per model, plus a manifest.json written last. A directory without a
+manifest is an unfinished backup and is ignored. Each line is one row: a
+JSON array of column values in the order listed in the manifest. Rows are
+read in primary-key chunks of BACKUP_CHUNK_SIZE, and memory stays flat
+however large the tables are.
+
+An incremental backup names the previous backup as its base and stores
+only the rows changed since then:
+- Models with ``updated_at``: rows updated since the base started, minus
+  BACKUP_WATERMARK_OVERLAP_SECONDS. The overlap also catches rows saved by
+  transactions that committed late.
+- Models in APPEND_ONLY_MODELS: new rows by ``created_at``.
+- Every other model: copied in full.
+For each changes-only model the backup also writes every current primary
+key, so a restore can drop rows deleted since the base.
+
+The manifest records each file's SHA-256, row count and columns. The whole
+backup reads from one snapshot: REPEATABLE READ on PostgreSQL, a deferred
+read transaction on SQLite, which does not block writers in WAL mode.
+Uploaded media files are not included.
+"""
+import base64
+import datetime
+import decimal
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.duration import duration_string
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+# Rows here are never updated after insert, so created_at is a safe watermark
+APPEND_ONLY_MODELS = {'core.AuditLog', 'core.ActivityEvent'}
+
+
+class BackupError(Exception):
+    pass
+
+
+def _json_default(value):
+    # Lossless where DjangoJSONEncoder is not: it truncates microseconds
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return duration_string(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    raise TypeError(f'Cannot back up value of type {type(value).__name__}')
+
+
+def encode_row(row):
+    return json.dumps(row, default=_json_default, separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def backup_models():
+    """
+    Every table Django manages, including many-to-many tables, parents first
+    """
+    models = [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+    ]
+    return dependency_order(models)
+
+
+def dependency_levels(models):
+    """
+    Models grouped so each group only has foreign keys to earlier groups;
+    the models within a group are independent of each other. Cycles, which
+    foreign keys between two tables can form, are broken in label order.
+    """
+    by_label = {model._meta.label: model for model in models}
+    depends = {
+        label: {
+            field.related_model._meta.concrete_model._meta.label
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is not None
+        } & set(by_label) - {label}
+        for label, model in by_label.items()
+    }
+    levels = []
+    done = set()
+    while len(done) < len(by_label):
+        ready = sorted(label for label in by_label if label not in done and depends[label] <= done)
+        if not ready:
+            ready = [min(label for label in by_label if label not in done)]
+        levels.append([by_label[label] for label in ready])
+        done.update(ready)
+    return levels
+
+
+def dependency_order(models):
+    """
+    Models sorted so each comes after the models its foreign keys point to
+    """
+    return [model for level in dependency_levels(models) for model in level]
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def watermark_field(model):
+    """
+    The timestamp that tells which rows changed since a base backup, or None
+    when the model must be copied in full
+    """
+    names = {field.name for field in model._meta.concrete_fields}
+    if 'updated_at' in names:
+        return 'updated_at'
+    if 'created_at' in names and model._meta.label in APPEND_ONLY_MODELS:
+        return 'created_at'
+    return None
+
+
+class _HashingWriter:
+    """
+    File wrapper that checksums and counts the bytes written through it
+    """
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def _write_chunks(path, chunks, compresslevel):
+    """
+    Write an iterable of text chunks as gzip; returns (sha256, bytes)
+    """
+    with open(path, 'wb') as raw:
+        hashing = _HashingWriter(raw)
+        # mtime=0 keeps identical content byte-identical
+        with gzip.GzipFile(fileobj=hashing, mode='wb', compresslevel=compresslevel, mtime=0) as out:
+            for chunk in chunks:
+                out.write(chunk.encode('utf-8'))
+    return hashing.sha256.hexdigest(), hashing.size
+
+
+def _pk_chunks(queryset, fields, chunk_size):
+    """
+    Rows of ``fields`` in primary-key order, fetched chunk_size at a time by
+    seeking past the last key rather than with OFFSET
+    """
+    last_pk = None
+    pk_index = fields.index(queryset.model._meta.pk.attname)
+    queryset = queryset.order_by('pk')
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][pk_index]
+
+
+def _dump_model(model, directory, since, using, chunk_size, compresslevel):
+    label = model._meta.label
+    fields = columns(model)
+    queryset = model._base_manager.using(using)
+    field = watermark_field(model) if since else None
+    mode = 'changes' if field else 'full'
+    if field:
+        queryset = queryset.filter(**{f'{field}__gte': since})
+
+    rows = 0
+
+    def lines():
+        nonlocal rows
+        for chunk in _pk_chunks(queryset, fields, chunk_size):
+            rows += len(chunk)
+            yield ''.join(encode_row(row) for row in chunk)
+
+    filename = f'{label.lower()}.ndjson.gz'
+    sha256, size = _write_chunks(os.path.join(directory, filename), lines(), compresslevel)
+    entry = {
+        'file': filename, 'mode': mode, 'columns': fields, 'rows': rows, 'bytes': size, 'sha256': sha256,
+        'watermark_field': field, 'since': since.isoformat() if field else None,
+    }
+
+    if mode == 'changes':
+        # Every surviving key, so the restore can tell which rows were deleted
+        pk = model._meta.pk.attname
+        count = 0
+
+        def keys():
+            nonlocal count
+            for chunk in _pk_chunks(model._base_manager.using(using), [pk], chunk_size):
+                count += len(chunk)
+                yield ''.join(encode_row(row[0]) for row in chunk)
+
+        pks_filename = f'{label.lower()}.pks.ndjson.gz'
+        pks_sha256, pks_size = _write_chunks(os.path.join(directory, pks_filename), keys(), compresslevel)
+        entry.update({'pks_file': pks_filename, 'pks': count, 'pks_bytes': pks_size, 'pks_sha256': pks_sha256})
+    return entry
+
+
+def list_backups(directory=None):
+    """
+    Manifests of the finished backups in a directory, oldest first
+    """
+    directory = directory or settings.BACKUP_DIR
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name, MANIFEST)
+        if os.path.isfile(path):
+            manifests.append(load_manifest(os.path.dirname(path)))
+    return sorted(manifests, key=lambda manifest: manifest['started_at'])
+
+
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise BackupError(f"{path}: unsupported backup format {manifest.get('format')}")
+    manifest['path'] = path
+    return manifest
+
+
+def backup_chain(path):
+    """
+    Manifests needed to restore a backup: its full base, then each
+    incremental up to and including it
+    """
+    chain = [load_manifest(path)]
+    while chain[0]['kind'] == 'incremental':
+        base = os.path.join(os.path.dirname(chain[0]['path']), chain[0]['base'])
+        if not os.path.isfile(os.path.join(base, MANIFEST)):
+            raise BackupError(f"Base backup {chain[0]['base']} of {chain[0]['id']} is missing")
+        chain.insert(0, load_manifest(base))
+    return chain
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_backup(manifest):
+    """
+    Raise BackupError unless every file matches its checksum
+    """
+    for label, entry in manifest['models'].items():
+        files = [(entry['file'], entry['sha256'])]
+        if entry.get('pks_file'):
+            files.append((entry['pks_file'], entry['pks_sha256']))
+        for filename, expected in files:
+            path = os.path.join(manifest['path'], filename)
+            if not os.path.isfile(path):
+                raise BackupError(f"{manifest['id']}: {filename} is missing")
+            if _file_sha256(path) != expected:
+                raise BackupError(f"{manifest['id']}: {filename} does not match its checksum")
+
+
+def read_rows(path):
+    """
+    Decoded rows of a backup file, one at a time
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _new_backup_id(directory):
+    backup_id = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    suffix = 1
+    candidate = backup_id
+    while os.path.exists(os.path.join(directory, candidate)):
+        suffix += 1
+        candidate = f'{backup_id}-{suffix}'
+    return candidate
+
+
+def create_backup(incremental=False, directory=None, using=DEFAULT_DB_ALIAS, chunk_size=None, compresslevel=None):
+    """
+    Write a backup and return its manifest. An incremental backup without a
+    previous one to build on is written as a full backup.
+    """
+    directory = directory or settings.BACKUP_DIR
+    chunk_size = chunk_size or settings.BACKUP_CHUNK_SIZE
+    compresslevel = compresslevel if compresslevel is not None else settings.BACKUP_COMPRESS_LEVEL
+    os.makedirs(directory, exist_ok=True)
+
+    existing = list_backups(directory)
+    base = existing[-1] if incremental and existing else None
+    since = None
+    if base:
+        overlap = datetime.timedelta(seconds=settings.BACKUP_WATERMARK_OVERLAP_SECONDS)
+        since = parse_datetime(base['started_at']) - overlap
+
+    backup_id = _new_backup_id(directory)
+    path = os.path.join(directory, backup_id)
+    os.makedirs(path)
+    connection = connections[using]
+    started_at = timezone.now()
+    try:
+        with transaction.atomic(using=using):
+            if connection.vendor == 'postgresql':
+                # One consistent snapshot across all tables
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+            elif connection.vendor == 'sqlite':
+                # A deferred transaction (never write_atomic(), which would hold
+                # the write lock for the whole run); the first read pins the
+                # snapshot. Only WAL lets writers commit while it is open.
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    if cursor.fetchone()[0].lower() != 'wal':
+                        logger.warning("SQLite is not in WAL mode; writes wait until the backup finishes (set SQLITE_TUNED=True)")
+            entries = {}
+            for model in backup_models():
+                entries[model._meta.label] = _dump_model(model, path, since, using, chunk_size, compresslevel)
+            migrations = sorted(
+                f'{app}.{name}' for app, name in MigrationRecorder(connection).applied_migrations()
+            )
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'id': backup_id,
+        'kind': 'incremental' if base else 'full',
+        'base': base['id'] if base else None,
+        'started_at': started_at.isoformat(),
+        'finished_at': timezone.now().isoformat(),
+        'vendor': connection.vendor,
+        'migrations': migrations,
+        'rows': sum(entry['rows'] for entry in entries.values()),
+        'bytes': sum(entry['bytes'] + entry.get('pks_bytes', 0) for entry in entries.values()),
+        'models': entries,
+    }
+    # Written last and renamed into place: a manifest means the backup is complete
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    manifest['path'] = path
+    return manifest
+
+
+def prune_backups(keep_full=None, directory=None):
+    """
+    Delete backups older than the newest ``keep_full`` full backups; the
+    incrementals built on the kept ones stay. Returns the removed IDs.
+    """
+    keep_full = keep_full if keep_full is not None else settings.BACKUP_KEEP_FULL
+    manifests = list_backups(directory)
+    fulls = [manifest for manifest in manifests if manifest['kind'] == 'full']
+    if keep_full < 1 or len(fulls) <= keep_full:
+        return []
+    oldest_kept = fulls[-keep_full]['started_at']
+    removed = []
+    for manifest in manifests:
+        if manifest['started_at'] < oldest_kept:
+            shutil.rmtree(manifest['path'])
+            removed.append(manifest['id'])
+    return removed
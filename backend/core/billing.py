@@ -0,0 +1,160 @@
+"""
+Recurring rent invoicing.
+
+A billing run walks every allocation that overlaps the billing month once,
+computes the (possibly prorated) rent in Python and inserts the Payment rows
+with bulk_create. Each rent Payment is keyed on (allocation, billing_period),
+so re-running a period only fills in what is missing.
+"""
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Q
+
+from .activity import record_changes
+from .backends import write_atomic
+from .models import Payment, RoomAllocation
+
+
+# Same convention as utils.calculate_rent_amount
+DAYS_PER_MONTH = 30
+DEFAULT_DUE_DAY = 5
+CENTS = Decimal('0.01')
+
+
+def parse_billing_period(value):
+    """
+    Normalize 'YYYY-MM', 'YYYY-MM-DD' or a date to the first day of the month
+    """
+    if isinstance(value, date):
+        return value.replace(day=1)
+    try:
+        parts = [int(part) for part in str(value).strip().split('-')]
+        return date(parts[0], parts[1], 1)
+    except (ValueError, IndexError):
+        raise ValueError('Billing period must be in YYYY-MM format')
+
+
+def period_bounds(period_start):
+    days = calendar.monthrange(period_start.year, period_start.month)[1]
+    return period_start, period_start + timedelta(days=days - 1)
+
+
+def prorate_rent(monthly_rent, period_start, period_end, start_date, end_date=None):
+    """
+    Rent owed for the part of the period covered by [start_date, end_date).
+    The end date is the move-out day, which is billed to the next allocation
+    on a transfer rather than to both. A full month is billed at the monthly
+    rate; partial stays use the daily rate of calculate_rent_amount, capped
+    at the monthly rent. Returns (amount, days_billed).
+    """
+    first = max(start_date, period_start)
+    last = min(end_date - timedelta(days=1), period_end) if end_date else period_end
+    if last < first:
+        return Decimal('0.00'), 0
+
+    days = (last - first).days + 1
+    if first == period_start and last == period_end:
+        return Decimal(monthly_rent).quantize(CENTS, ROUND_HALF_UP), days
+
+    amount = Decimal(monthly_rent) / DAYS_PER_MONTH * days
+    return min(amount, Decimal(monthly_rent)).quantize(CENTS, ROUND_HALF_UP), days
+
+
+def generate_rent_invoices(period, due_day=DEFAULT_DUE_DAY, dry_run=False, batch_size=1000):
+    """
+    Create one pending rent Payment per allocation overlapping ``period``.
+    Safe to re-run: allocations already invoiced for the period are skipped.
+    Overlapping runs serialize on the allocation rows, so ``created`` counts
+    only the invoices this run inserted.
+    """
+    period_start, period_end = period_bounds(parse_billing_period(period))
+    due_date = period_start.replace(day=min(max(due_day, 1), period_end.day))
+    label = period_start.strftime('%B %Y')
+
+    already_billed = set(
+        Payment.objects.filter(billing_period=period_start, allocation__isnull=False)
+        .values_list('allocation_id', flat=True)
+    )
+
+    # Inactive allocations without an end date carry no stay to bill
+    allocations = (
+        RoomAllocation.objects.filter(start_date__lte=period_end)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gt=period_start))
+        .filter(Q(status='active') | Q(end_date__isnull=False))
+        .values_list('id', 'user_id', 'monthly_rent', 'room__monthly_rent', 'start_date', 'end_date')
+        .order_by('id')
+    )
+
+    payments = []
+    summary = {
+        'period': period_start.strftime('%Y-%m'),
+        'allocations': 0,
+        'created': 0,
+        'skipped_existing': 0,
+        'skipped_zero_rent': 0,
+        'prorated': 0,
+        'total_amount': Decimal('0.00'),
+        'dry_run': dry_run,
+    }
+
+    for allocation_id, user_id, rent, room_rent, start_date, end_date in allocations.iterator(chunk_size=2000):
+        summary['allocations'] += 1
+        if allocation_id in already_billed:
+            summary['skipped_existing'] += 1
+            continue
+
+        monthly_rent = rent or room_rent or 0
+        amount, days = prorate_rent(monthly_rent, period_start, period_end, start_date, end_date)
+        if amount <= 0:
+            summary['skipped_zero_rent'] += 1
+            continue
+
+        description = f'Monthly rent for {label}'
+        if days < (period_end - period_start).days + 1:
+            summary['prorated'] += 1
+            description += f' (prorated, {days} days)'
+
+        summary['total_amount'] += amount
+        payments.append(Payment(
+            user_id=user_id,
+            allocation_id=allocation_id,
+            billing_period=period_start,
+            amount=amount,
+            payment_type='rent',
+            status='pending',
+            due_date=due_date,
+            description=description,
+        ))
+
+    if dry_run:
+        summary['created'] = len(payments)
+        return summary
+
+    with write_atomic():
+        for start in range(0, len(payments), batch_size):
+            batch = payments[start:start + batch_size]
+            ids = [payment.allocation_id for payment in batch]
+            # An overlapping run holds these locks until it commits; what it
+            # billed meanwhile is dropped so only rows inserted here are counted
+            list(RoomAllocation.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+            billed = set(
+                Payment.objects.filter(billing_period=period_start, allocation_id__in=ids)
+                .values_list('allocation_id', flat=True)
+            )
+            new = []
+            for payment in batch:
+                if payment.allocation_id in billed:
+                    summary['skipped_existing'] += 1
+                    summary['total_amount'] -= payment.amount
+                else:
+                    new.append(payment)
+            Payment.objects.bulk_create(new, ignore_conflicts=True)
+            summary['created'] += len(new)
+            # ignore_conflicts leaves primary keys unset; the locks make these rows ours
+            record_changes(list(
+                Payment.objects.filter(billing_period=period_start, allocation_id__in=[payment.allocation_id for payment in new])
+            ), created=True)
+
+    return summary
@@ -0,0 +1,184 @@
+"""
+Serializer-free list responses for large, flat collections.
+
+ModelSerializer builds every row field by field through get_attribute() and
+to_representation(), which dominates CPU time on lists of tens of thousands
+of rows. For serializers whose fields all map onto columns, row_plan() works
+out once per request which columns to select and how to convert each one;
+rows are then built from values_list() tuples with the serializer fields' own
+to_representation(), so the output matches the serializer byte for byte.
+Anything the plan does not understand (method fields, nested or expanded
+serializers, nullable relation paths) falls back to the regular serializer.
+"""
+import operator
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import Field
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Serializer fields whose representation is the column value as read, keyed
+# by the model fields that hold it
+PASSTHROUGH_FIELDS = {
+    serializers.IntegerField: (models.IntegerField,),
+    serializers.BooleanField: (models.BooleanField,),
+    serializers.CharField: (models.CharField, models.TextField),
+}
+
+# Serializer fields converted with their own to_representation(). All of
+# them return str, int or bool, so rows never hold anything else (or None)
+CONVERTED_FIELDS = {
+    serializers.IntegerField, serializers.BooleanField, serializers.CharField,
+    serializers.EmailField, serializers.SlugField, serializers.URLField,
+    serializers.ChoiceField, serializers.DateTimeField, serializers.DateField,
+    serializers.TimeField, serializers.DecimalField, serializers.UUIDField,
+}
+
+# Settings a date/time field without its own format falls back to. A None
+# format would put date objects in the rows
+FORMAT_SETTINGS = {
+    serializers.DateTimeField: 'DATETIME_FORMAT',
+    serializers.DateField: 'DATE_FORMAT',
+    serializers.TimeField: 'TIME_FORMAT',
+}
+
+# Model methods a source may end in, with the columns they read
+METHOD_COLUMNS = {
+    (get_user_model(), 'get_full_name'): ('first_name', 'last_name'),
+}
+
+
+class FlatRows(list):
+    """Rows built by a RowPlan: lists of dicts of str, int, bool and None only."""
+
+
+class RowPlan:
+    def __init__(self, columns, getters):
+        self.columns = columns
+        self.getters = getters
+
+    def rows(self, queryset):
+        getters = self.getters
+        return FlatRows(
+            {name: get(row) for name, get in getters}
+            for row in queryset.values_list(*self.columns)
+        )
+
+
+def _converted(index, convert):
+    def get(row):
+        value = row[index]
+        return None if value is None else convert(value)
+    return get
+
+
+def _computed(indexes, names, method):
+    def get(row):
+        return method(SimpleNamespace(**{name: row[i] for name, i in zip(names, indexes)}))
+    return get
+
+
+def _column_path(model, attrs):
+    """
+    Resolve a dotted source to (lookup, model field) or (lookups, method) for
+    a computed value. Only non-null forward relations are followed: DRF skips
+    a read-only field whose relation is empty, which a flat row cannot express.
+    """
+    path = []
+    for position, attr in enumerate(attrs):
+        last = position == len(attrs) - 1
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            columns = METHOD_COLUMNS.get((model, attr)) if last else None
+            if columns is None:
+                return None
+            return ['__'.join(path + [column]) for column in columns], getattr(model, attr)
+        if last:
+            if not field.concrete or field.many_to_many:
+                return None
+            return '__'.join(path + [field.name]), field
+        if not (field.many_to_one or field.one_to_one) or not field.concrete or field.null:
+            return None
+        path.append(field.name)
+        model = field.related_model
+    return None
+
+
+def row_plan(serializer):
+    """Return a RowPlan reproducing serializer.to_representation(), or None."""
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return None
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return None
+    model = serializer.Meta.model
+    columns, getters = [], []
+
+    def column(lookup):
+        if lookup not in columns:
+            columns.append(lookup)
+        return columns.index(lookup)
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if type(field).get_attribute is not Field.get_attribute and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            return None
+        resolved = _column_path(model, field.source_attrs) if field.source != '*' else None
+        if resolved is None:
+            return None
+        lookup, target = resolved
+        if not isinstance(target, models.Field):
+            if type(field) is not serializers.CharField:
+                return None
+            indexes = [column(each) for each in lookup]
+            getters.append((name, _computed(indexes, [each.rsplit('__', 1)[-1] for each in lookup], target)))
+            continue
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            # Representation is the related pk, which the column already holds
+            if type(field) is not serializers.PrimaryKeyRelatedField or field.pk_field is not None:
+                return None
+            if not target.many_to_one or target.target_field != target.related_model._meta.pk:
+                return None
+            if not isinstance(target.target_field, (models.AutoField, models.IntegerField)):
+                return None
+            getters.append((name, operator.itemgetter(column(lookup))))
+        elif target.is_relation:
+            return None
+        elif isinstance(target, PASSTHROUGH_FIELDS.get(type(field), ())):
+            getters.append((name, operator.itemgetter(column(lookup))))
+        elif type(field) in CONVERTED_FIELDS:
+            if type(field) is serializers.DecimalField:
+                if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+                    return None
+            elif type(field) in FORMAT_SETTINGS:
+                if getattr(field, 'format', getattr(api_settings, FORMAT_SETTINGS[type(field)])) is None:
+                    return None
+            if type(field) is serializers.DateTimeField and not hasattr(field, 'timezone'):
+                # Looked up once instead of per value; it cannot change mid-request
+                field.timezone = field.default_timezone()
+            getters.append((name, _converted(column(lookup), field.to_representation)))
+        else:
+            return None
+    return RowPlan(columns, getters)
+
+
+class FastListMixin:
+    """
+    list() from values_list() rows when the serializer allows it and the
+    view does not paginate. Filters, ordering and ?fields= apply as usual.
+    """
+    def list(self, request, *args, **kwargs):
+        plan = None
+        if settings.FAST_LIST_VIEWS and self.paginator is None:
+            plan = row_plan(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(plan.rows(queryset))
@@ -0,0 +1,257 @@
+"""
+Security desk check-in/check-out against today's approved visitor passes.
+
+Each worker keeps an in-memory index of the day's approved passes keyed by
+normalized ID proof and phone number, so a gate lookup is a dict access.
+The index is loaded with one query the first time it is used on a given
+day, updated in place when a visit is approved, rejected or edited in this
+worker, and falls back to one indexed query on a miss (a pass approved in
+another worker). That query compares the normalized id_proof_key and
+phone_key columns Visitor.save() maintains. Entry and exit are single conditional UPDATEs, which keeps
+the database authoritative when several desks share a pass.
+"""
+import re
+import threading
+from dataclasses import dataclass
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .activity import record_changes
+from .models import Visitor
+
+
+@dataclass
+class VisitorPass:
+    visitor_id: int
+    visitor_name: str
+    visitor_phone: str
+    visitor_id_proof: str
+    student_id: int
+    student_name: str
+    visit_time: object
+    expected_duration: int
+    entry_time: object = None
+    exit_time: object = None
+
+    def as_dict(self):
+        return {
+            'visitor': self.visitor_id,
+            'visitor_name': self.visitor_name,
+            'student': self.student_id,
+            'student_name': self.student_name,
+            'visit_time': self.visit_time,
+            'expected_duration': self.expected_duration,
+            'actual_entry_time': self.entry_time,
+            'actual_exit_time': self.exit_time,
+        }
+
+
+class GateError(Exception):
+    """
+    Check-in/out refused; ``status`` is the HTTP status to answer with
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+PASS_FIELDS = (
+    'id', 'visitor_name', 'visitor_phone', 'visitor_id_proof', 'student_id',
+    'student__first_name', 'student__last_name', 'visit_time', 'expected_duration',
+    'actual_entry_time', 'actual_exit_time',
+)
+
+# Visit fields an approval vouches for; changing any of them needs a new approval
+APPROVED_FIELDS = ('visitor_name', 'visitor_phone', 'visitor_id_proof', 'visit_date')
+
+
+def normalize_id_proof(value):
+    return re.sub(r'[\s\-]', '', value or '').upper()
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value or '')
+    # Compare on the national number so "+91 98765 43210" matches "9876543210"
+    return digits[-10:]
+
+
+def _pass_from_row(row):
+    (visitor_id, name, phone, id_proof, student_id, first_name, last_name,
+     visit_time, duration, entry_time, exit_time) = row
+    return VisitorPass(
+        visitor_id=visitor_id,
+        visitor_name=name,
+        visitor_phone=phone,
+        visitor_id_proof=id_proof,
+        student_id=student_id,
+        student_name=f'{first_name} {last_name}'.strip(),
+        visit_time=visit_time,
+        expected_duration=duration,
+        entry_time=entry_time,
+        exit_time=exit_time,
+    )
+
+
+class DailyPassIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._passes = {}
+        self._by_key = {}
+
+    def _keys(self, visitor_pass):
+        keys = []
+        id_proof = normalize_id_proof(visitor_pass.visitor_id_proof)
+        phone = normalize_phone(visitor_pass.visitor_phone)
+        if id_proof:
+            keys.append(('id', id_proof))
+        if phone:
+            keys.append(('phone', phone))
+        return keys
+
+    def _insert(self, visitor_pass):
+        self._passes[visitor_pass.visitor_id] = visitor_pass
+        for key in self._keys(visitor_pass):
+            entries = self._by_key.setdefault(key, [])
+            if visitor_pass.visitor_id not in entries:
+                entries.append(visitor_pass.visitor_id)
+
+    def _remove(self, visitor_id):
+        visitor_pass = self._passes.pop(visitor_id, None)
+        if visitor_pass is None:
+            return
+        for key in self._keys(visitor_pass):
+            entries = self._by_key.get(key, [])
+            if visitor_id in entries:
+                entries.remove(visitor_id)
+            if not entries:
+                self._by_key.pop(key, None)
+
+    def _ensure_day(self, day):
+        if self._day == day:
+            return
+        with self._lock:
+            if self._day == day:
+                return
+            rows = Visitor.objects.filter(visit_date=day, status=Visitor.Status.APPROVED).values_list(*PASS_FIELDS)
+            self._passes, self._by_key = {}, {}
+            for row in rows:
+                self._insert(_pass_from_row(row))
+            self._day = day
+
+    def _load_missing(self, day, kind, value):
+        condition = Q(id_proof_key=value) if kind == 'id' else Q(phone_key=value)
+        rows = Visitor.objects.filter(condition, visit_date=day, status=Visitor.Status.APPROVED).values_list(*PASS_FIELDS)
+        found = [_pass_from_row(row) for row in rows]
+        with self._lock:
+            for visitor_pass in found:
+                self._insert(visitor_pass)
+        return self._by_key.get((kind, value), [])
+
+    def lookup(self, id_proof=None, phone=None, day=None):
+        """
+        Today's approved passes matching the ID proof or phone number
+        """
+        day = day or timezone.localdate()
+        self._ensure_day(day)
+        if id_proof:
+            kind, value = 'id', normalize_id_proof(id_proof)
+        else:
+            kind, value = 'phone', normalize_phone(phone)
+        if not value:
+            return []
+        visitor_ids = self._by_key.get((kind, value))
+        if visitor_ids is None:
+            visitor_ids = self._load_missing(day, kind, value)
+        return [self._passes[visitor_id] for visitor_id in list(visitor_ids) if visitor_id in self._passes]
+
+    def add(self, visitor):
+        """
+        Index a newly approved visit if it is for the loaded day
+        """
+        if self._day != visitor.visit_date or visitor.status != Visitor.Status.APPROVED:
+            self.discard(visitor.id)
+            return
+        visitor_pass = VisitorPass(
+            visitor_id=visitor.id,
+            visitor_name=visitor.visitor_name,
+            visitor_phone=visitor.visitor_phone,
+            visitor_id_proof=visitor.visitor_id_proof,
+            student_id=visitor.student_id,
+            student_name=visitor.student.get_full_name(),
+            visit_time=visitor.visit_time,
+            expected_duration=visitor.expected_duration,
+            entry_time=visitor.actual_entry_time,
+            exit_time=visitor.actual_exit_time,
+        )
+        with self._lock:
+            self._remove(visitor.id)
+            self._insert(visitor_pass)
+
+    def discard(self, visitor_id):
+        with self._lock:
+            self._remove(visitor_id)
+
+    def clear(self):
+        with self._lock:
+            self._day, self._passes, self._by_key = None, {}, {}
+
+
+pass_index = DailyPassIndex()
+
+
+def _select_pass(passes, visitor_id=None):
+    if visitor_id is not None:
+        passes = [visitor_pass for visitor_pass in passes if visitor_pass.visitor_id == visitor_id]
+    if not passes:
+        raise GateError('No approved visit for today', status=404)
+    if len(passes) > 1:
+        raise GateError('Several visits match; pass the visitor ID to choose one', status=409)
+    return passes[0]
+
+
+def check_in(id_proof=None, phone=None, visitor_id=None):
+    """
+    Record the visitor's entry. One UPDATE, guarded so a pass is only used once.
+    """
+    visitor_pass = _select_pass(pass_index.lookup(id_proof=id_proof, phone=phone), visitor_id)
+    if visitor_pass.entry_time:
+        raise GateError('Visitor already checked in', status=409)
+
+    now = timezone.now()
+    updated = Visitor.objects.filter(
+        pk=visitor_pass.visitor_id, status=Visitor.Status.APPROVED, actual_entry_time__isnull=True
+    ).update(actual_entry_time=now)
+    if not updated:
+        # Checked in at another desk or no longer approved; resync this pass
+        pass_index.discard(visitor_pass.visitor_id)
+        raise GateError('Visitor already checked in or pass no longer valid', status=409)
+    visitor_pass.entry_time = now
+    return visitor_pass
+
+
+def check_out(id_proof=None, phone=None, visitor_id=None):
+    """
+    Record the visitor's exit and mark the visit completed in one UPDATE
+    """
+    visitor_pass = _select_pass(pass_index.lookup(id_proof=id_proof, phone=phone), visitor_id)
+    if visitor_pass.exit_time:
+        raise GateError('Visitor already checked out', status=409)
+
+    now = timezone.now()
+    updated = Visitor.objects.filter(
+        pk=visitor_pass.visitor_id, status=Visitor.Status.APPROVED,
+        actual_entry_time__isnull=False, actual_exit_time__isnull=True
+    ).update(actual_exit_time=now, status=Visitor.Status.COMPLETED)
+    if not updated:
+        pass_index.discard(visitor_pass.visitor_id)
+        raise GateError('Visitor has not checked in', status=409)
+    visitor_pass.exit_time = now
+    visitor = Visitor(
+        pk=visitor_pass.visitor_id, student_id=visitor_pass.student_id,
+        visitor_name=visitor_pass.visitor_name, status=Visitor.Status.APPROVED,
+    )
+    visitor.status = Visitor.Status.COMPLETED
+    record_changes([visitor])
+    return visitor_pass
@@ -0,0 +1,146 @@
+"""
+Idempotency-Key support for retried POSTs.
+
+A client sends the same ``Idempotency-Key`` header on every retry of one
+logical request. The first call claims the key in a short transaction, runs
+the view without holding any lock and then stores the response with the
+headers worth replaying. Later calls with the same key and payload replay
+that response without running the view again; one that arrives while the
+first is still running gets 409 and retries. A claim whose request never
+finished is taken over after IDEMPOTENCY_CLAIM_SECONDS.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .backends import write_atomic
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Outcomes the client is expected to retry are never cached
+UNCACHED_STATUS_CODES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+# Response headers that describe the stored result; anything per-request
+# (cookies, Vary, timing) is left out
+REPLAYED_HEADERS = ('Location', 'Content-Location', 'ETag', 'Last-Modified')
+
+
+def request_fingerprint(request):
+    """
+    Hash of method, path and body so a key cannot be reused for a different request
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: values for key, values in data.lists()}
+    body = json.dumps(data, sort_keys=True, cls=JSONEncoder, default=str)
+    payload = f'{request.method}\n{request.path}\n{body}'
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _replay(record):
+    response = Response(json.loads(record.response_body) if record.response_body else None, status=record.status_code)
+    for name, value in record.response_headers.items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user, key, fingerprint, now):
+    """
+    Take the key for this request. Returns (claim_expires_at, None) when the
+    view should run, or (None, response) to answer without running it.
+    """
+    claim_expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_CLAIM_SECONDS)
+    with write_atomic():
+        record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+            user=user, key=key,
+            defaults={'fingerprint': fingerprint, 'expires_at': claim_expires_at}
+        )
+        if created:
+            return claim_expires_at, None
+        if record.expires_at > now:
+            if record.fingerprint != fingerprint:
+                return None, Response(
+                    {'error': f'{HEADER} was already used with a different request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status_code is not None:
+                return None, _replay(record)
+            response = Response(
+                {'error': f'A request with this {HEADER} is still in progress.'},
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Retry-After'] = '1'
+            return None, response
+        # An expired response, or a claim whose request never finished
+        record.fingerprint = fingerprint
+        record.status_code = None
+        record.response_body = ''
+        record.response_headers = {}
+        record.expires_at = claim_expires_at
+        record.save(update_fields=['fingerprint', 'status_code', 'response_body', 'response_headers', 'expires_at'])
+    return claim_expires_at, None
+
+
+def idempotent(view_method):
+    """
+    Decorator for ViewSet handlers that honours the Idempotency-Key header.
+    Requests without the header run unchanged.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        claim_expires_at, response = _claim(request.user, key, request_fingerprint(request), timezone.now())
+        if response is not None:
+            return response
+
+        # Only our own claim is updated: a request that outlived it has been taken over
+        claim = IdempotencyKey.objects.filter(
+            user=request.user, key=key, status_code__isnull=True, expires_at=claim_expires_at
+        )
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            claim.delete()
+            raise
+
+        if response.status_code < 500 and response.status_code not in UNCACHED_STATUS_CODES:
+            with write_atomic():
+                claim.update(
+                    status_code=response.status_code,
+                    response_body=json.dumps(response.data, cls=JSONEncoder) if response.data is not None else '',
+                    response_headers={name: response[name] for name in REPLAYED_HEADERS if response.has_header(name)},
+                    expires_at=timezone.now() + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+                )
+        else:
+            # Let the next retry run the view again
+            claim.delete()
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys():
+    """
+    Delete idempotency records past their TTL, returns the number removed
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
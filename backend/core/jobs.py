@@ -0,0 +1,397 @@
+"""
+Database-backed background jobs.
+
+``enqueue`` stores a Job row for a registered task, and ``manage.py run_jobs``
+workers run it. The row is written in the caller's transaction, so work
+that was rolled back never runs, and nothing is lost when no worker is
+running at the time.
+
+A worker claims due jobs in one short transaction.
+- PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers
+  can poll the table without waiting on each other.
+- SQLite: has no row locks. The claim is a conditional UPDATE (still
+  queued), so a job is still handed out only once. With SQLITE_TUNED the
+  claim starts with BEGIN IMMEDIATE (write_atomic) and claims queue on the
+  busy timeout; on stock SQLite a colliding claim fails with "database is
+  locked" and the worker polls again.
+
+Failed jobs are retried with exponential backoff and jitter until
+max_attempts. Workers refresh locked_at while a job runs. A running job
+without a heartbeat for JOB_LEASE_SECONDS is put back in the queue.
+
+JOB_SCHEDULES enqueues tasks on cron expressions. JobSchedule stores the next
+due time of each schedule and is claimed the same way as jobs, so each run
+is enqueued by exactly one worker.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.utils import timezone
+
+from .backends import write_atomic
+from .models import Job, JobSchedule
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def task(name=None, max_attempts=None):
+    """
+    Register a function as a job task. Its keyword arguments must be
+    JSON-serialisable, since they are stored with the job.
+    """
+    def register(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        _tasks[func.task_name] = func
+        return func
+    return register
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"Unknown job task '{name}'")
+
+
+def enqueue(task, *, delay=None, run_at=None, priority=0, max_attempts=None, created_by=None, schedule='', **kwargs):
+    """
+    Queue a task (registered function or its name) with keyword arguments.
+    Returns the Job.
+    """
+    func = get_task(getattr(task, 'task_name', task))
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        task=func.task_name,
+        kwargs=kwargs,
+        run_at=run_at,
+        priority=priority,
+        max_attempts=max_attempts or func.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        created_by=created_by,
+        schedule=schedule,
+    )
+
+
+def retry_delay(attempts):
+    """
+    Seconds before retry number ``attempts``: doubling from
+    JOB_RETRY_BASE_SECONDS up to JOB_RETRY_MAX_SECONDS, half of it random
+    so failures that happened together do not retry together
+    """
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_jobs(worker, limit=1):
+    """
+    Mark up to ``limit`` due jobs as running for this worker and return them
+    """
+    now = timezone.now()
+    with write_atomic():
+        queryset = Job.objects.filter(status=Job.Status.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        ids = list(queryset.values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING, locked_by=worker, locked_at=now, started_at=now, attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(pk__in=ids, status=Job.Status.RUNNING, locked_by=worker))
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome. Returns the job's new status.
+    """
+    started = time.perf_counter()
+    mine = Job.objects.filter(pk=job.pk, status=Job.Status.RUNNING, locked_by=job.locked_by)
+    try:
+        result = get_task(job.task)(**job.kwargs)
+        mine.update(
+            status=Job.Status.SUCCEEDED, result=result, last_error='', locked_by='', finished_at=timezone.now()
+        )
+        status = Job.Status.SUCCEEDED
+    except Exception:
+        error = traceback.format_exc()[-4000:]
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            mine.update(
+                status=Job.Status.QUEUED, run_at=now + timedelta(seconds=delay), last_error=error,
+                locked_by='', locked_at=None,
+            )
+            status = Job.Status.QUEUED
+            logger.warning(f"Job {job.pk} ({job.task}) failed on attempt {job.attempts}, retrying in {delay:.0f}s")
+        else:
+            mine.update(status=Job.Status.FAILED, last_error=error, locked_by='', finished_at=now)
+            status = Job.Status.FAILED
+            logger.error(f"Job {job.pk} ({job.task}) failed after {job.attempts} attempts")
+    finally:
+        # A failed query must not poison this thread's connection for the next job
+        close_old_connections()
+    logger.info(f"Job {job.pk} ({job.task}) {status} in {time.perf_counter() - started:.2f}s")
+    return status
+
+
+def heartbeat(job_ids):
+    if job_ids:
+        Job.objects.filter(pk__in=job_ids, status=Job.Status.RUNNING).update(locked_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """
+    Put back running jobs whose worker stopped heartbeating; those out of
+    attempts fail instead. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    )
+    error = 'Worker stopped responding'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED, last_error=error, locked_by='', finished_at=now
+    )
+    requeued = stale.update(status=Job.Status.QUEUED, last_error=error, locked_by='', locked_at=None)
+    return requeued, failed
+
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week)
+    with *, lists, ranges and steps, or @hourly/@daily/@weekly/@monthly.
+    Evaluated in TIME_ZONE.
+    """
+    ALIASES = {'@hourly': '0 * * * *', '@daily': '0 0 * * *', '@weekly': '0 0 * * 0', '@monthly': '0 0 1 * *'}
+    BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        self.expression = expression
+        fields = self.ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.BOUNDS)
+        )
+        # 7 is Sunday too
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron: with both day fields restricted, either may match
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _parse(self, field, low, high):
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            if spec == '*':
+                start, end = low, high
+            elif '-' in spec:
+                start, end = (int(value) for value in spec.split('-', 1))
+            else:
+                start = end = int(spec)
+                if step:
+                    end = high
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field '{field}' is outside {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        """
+        First matching minute strictly after ``moment``
+        """
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        # Skips whole months, days and hours, so this is far more than a real search needs
+        for _ in range(100_000):
+            if local.month not in self.months:
+                local = datetime(local.year + local.month // 12, local.month % 12 + 1, 1)
+            elif not self._day_matches(local):
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+            elif local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(local)
+        raise ValueError(f"Cron expression never matches: '{self.expression}'")
+
+
+def enqueue_due_schedules():
+    """
+    Enqueue one job for every schedule in JOB_SCHEDULES that is due. A run is
+    skipped while the previous one is still queued or running, and runs
+    missed while no worker was up collapse into one. Returns the jobs.
+    """
+    schedules = settings.JOB_SCHEDULES
+    if not schedules:
+        return []
+    now = timezone.now()
+    known = set(JobSchedule.objects.filter(name__in=schedules).values_list('name', flat=True))
+    JobSchedule.objects.bulk_create([
+        JobSchedule(name=name, next_run_at=CronSchedule(config['cron']).next_after(now))
+        for name, config in schedules.items() if name not in known
+    ], ignore_conflicts=True)
+
+    jobs = []
+    with write_atomic():
+        queryset = JobSchedule.objects.filter(name__in=schedules, next_run_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        for schedule in queryset:
+            config = schedules[schedule.name]
+            advanced = JobSchedule.objects.filter(name=schedule.name, next_run_at=schedule.next_run_at).update(
+                next_run_at=CronSchedule(config['cron']).next_after(now), last_run_at=now
+            )
+            busy = Job.objects.filter(
+                schedule=schedule.name, status__in=[Job.Status.QUEUED, Job.Status.RUNNING]
+            ).exists()
+            if advanced and not busy:
+                jobs.append(enqueue(config['task'], schedule=schedule.name, **config.get('kwargs', {})))
+    return jobs
+
+
+def job_metrics(window_hours=1):
+    """
+    Queue depth and recent throughput, overall and per task
+    """
+    now = timezone.now()
+    since = now - timedelta(hours=window_hours)
+    duration = ExpressionWrapper(F('finished_at') - F('started_at'), output_field=DurationField())
+    rows = Job.objects.values('task').annotate(
+        queued=Count('id', filter=Q(status=Job.Status.QUEUED)),
+        due=Count('id', filter=Q(status=Job.Status.QUEUED, run_at__lte=now)),
+        running=Count('id', filter=Q(status=Job.Status.RUNNING)),
+        retrying=Count('id', filter=Q(status=Job.Status.QUEUED, attempts__gt=0)),
+        succeeded=Count('id', filter=Q(status=Job.Status.SUCCEEDED, finished_at__gte=since)),
+        failed=Count('id', filter=Q(status=Job.Status.FAILED, finished_at__gte=since)),
+        average_duration=Avg(duration, filter=Q(status=Job.Status.SUCCEEDED, finished_at__gte=since)),
+        oldest_due=Min('run_at', filter=Q(status=Job.Status.QUEUED, run_at__lte=now)),
+    ).order_by('task')
+
+    tasks = {}
+    totals = {'queued': 0, 'due': 0, 'running': 0, 'retrying': 0, 'succeeded': 0, 'failed': 0}
+    oldest_due = None
+    for row in rows:
+        name = row.pop('task')
+        average = row.pop('average_duration')
+        due_since = row.pop('oldest_due')
+        row['average_seconds'] = round(average.total_seconds(), 3) if average is not None else None
+        row['oldest_due_seconds'] = round((now - due_since).total_seconds(), 1) if due_since else None
+        tasks[name] = row
+        for key in totals:
+            totals[key] += row[key]
+        if due_since and (oldest_due is None or due_since < oldest_due):
+            oldest_due = due_since
+
+    return {
+        'window_hours': window_hours,
+        **totals,
+        # How long the most overdue job has been waiting: the queue's lag behind
+        'oldest_due_seconds': round((now - oldest_due).total_seconds(), 1) if oldest_due else None,
+        'tasks': tasks,
+    }
+
+
+class Worker:
+    """
+    Runs jobs on ``concurrency`` threads. The calling thread sends
+    heartbeats, enqueues scheduled jobs and requeues stale ones until
+    stop() is called, or until the queue is empty when ``burst`` is set.
+    """
+    def __init__(self, concurrency=1, poll_interval=1.0, burst=False, name=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stats = {'succeeded': 0, 'retried': 0, 'failed': 0}
+        self._running = {}
+        self._idle = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _record(self, status):
+        key = {Job.Status.SUCCEEDED: 'succeeded', Job.Status.QUEUED: 'retried'}.get(status, 'failed')
+        with self._lock:
+            self.stats[key] += 1
+
+    def _loop(self, index):
+        worker = f'{self.name}:{index}'
+        try:
+            while not self._stop.is_set():
+                try:
+                    jobs = claim_jobs(worker)
+                except Exception as e:
+                    logger.error(f"Worker {worker} could not claim jobs: {e}")
+                    close_old_connections()
+                    jobs = []
+                if not jobs:
+                    with self._lock:
+                        self._idle.add(index)
+                    self._stop.wait(self.poll_interval)
+                    continue
+                with self._lock:
+                    self._idle.discard(index)
+                    self._running[index] = jobs[0].pk
+                try:
+                    self._record(run_job(jobs[0]))
+                finally:
+                    with self._lock:
+                        self._running.pop(index, None)
+        finally:
+            connection.close()
+
+    def _maintain(self):
+        with self._lock:
+            running = list(self._running.values())
+        try:
+            heartbeat(running)
+            requeue_stale_jobs()
+            enqueue_due_schedules()
+        except Exception as e:
+            logger.error(f"Worker {self.name} maintenance failed: {e}")
+        finally:
+            close_old_connections()
+
+    def run(self):
+        threads = [
+            threading.Thread(target=self._loop, args=(index,), name=f'job-worker-{index}', daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        interval = min(settings.JOB_LEASE_SECONDS / 3, 10)
+        while not self._stop.is_set():
+            self._maintain()
+            if self.burst:
+                with self._lock:
+                    drained = len(self._idle) == self.concurrency and not self._running
+                if drained:
+                    self.stop()
+                    break
+            self._stop.wait(min(interval, self.poll_interval) if self.burst else interval)
+        for thread in threads:
+            thread.join()
+        connection.close()
+        return self.stats
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from core.backup import create_backup, list_backups, prune_backups
+
+
+class Command(BaseCommand):
+    help = 'Write a compressed backup of every table to BACKUP_DIR, optionally only the rows changed since the last one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Store only rows changed since the previous backup (a full backup is written if there is none)',
+        )
+        parser.add_argument('--dir', help='Backup directory (defaults to BACKUP_DIR)')
+        parser.add_argument('--chunk-size', type=int, help='Rows read per query (defaults to BACKUP_CHUNK_SIZE)')
+        parser.add_argument('--compress-level', type=int, choices=range(0, 10), metavar='0-9', help='gzip level')
+        parser.add_argument('--list', action='store_true', help='List existing backups instead of writing one')
+        parser.add_argument(
+            '--keep-full',
+            type=int,
+            help='Delete chains older than this many full backups (defaults to BACKUP_KEEP_FULL; 0 keeps all)',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.BACKUP_DIR
+        if options['list']:
+            for manifest in list_backups(directory):
+                self.stdout.write(
+                    f"{manifest['id']}  {manifest['kind']:<11}  {manifest['rows']:>9} rows  "
+                    f"{manifest['bytes'] / 1024:>10.1f} KiB" + (f"  base {manifest['base']}" if manifest['base'] else '')
+                )
+            return
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        started = time.perf_counter()
+        manifest = create_backup(
+            incremental=options['incremental'], directory=directory,
+            chunk_size=options['chunk_size'], compresslevel=options['compress_level'],
+        )
+        elapsed = time.perf_counter() - started
+        if options['incremental'] and manifest['kind'] == 'full':
+            self.stdout.write(self.style.WARNING('No previous backup to build on; wrote a full backup'))
+
+        removed = prune_backups(keep_full=options['keep_full'], directory=directory)
+        for backup_id in removed:
+            self.stdout.write(f'Removed old backup {backup_id}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{manifest['kind'].capitalize()} backup {manifest['id']}: {manifest['rows']} rows, "
+            f"{manifest['bytes'] / 1024:.1f} KiB in {elapsed:.2f}s -> {manifest['path']}"
+        ))
@@ -0,0 +1,163 @@
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework.response import Response
+from rest_framework.views import APIView
+import asyncio
+import statistics
+import time
+
+from core.authentication import ClaimsTokenObtainPairSerializer
+from core.models import Complaint, Notice, User
+from core.views import NoticeViewSet, UserViewSet
+from core.views_async import (
+    DashboardStatsView, NoticeListView, SearchView, UserMeView, dashboard_stat_queries, dashboard_stats
+)
+from core.views_enhanced import SearchView as SyncSearchView
+
+PREFIX = 'bench-async-'
+
+
+class SyncDashboardStatsView(APIView):
+    """
+    The async dashboard's queries, run one after another
+    """
+    def get(self, request):
+        return Response(dashboard_stats({name: query() for name, query in dashboard_stat_queries().items()}))
+
+
+class BenchmarkURLConf:
+    urlpatterns = [
+        path('sync/dashboard/', SyncDashboardStatsView.as_view()),
+        path('async/dashboard/', DashboardStatsView.as_view()),
+        path('sync/notices/', NoticeViewSet.as_view({'get': 'list'})),
+        path('async/notices/', NoticeListView.as_view()),
+        path('sync/me/', UserViewSet.as_view({'get': 'me'})),
+        path('async/me/', UserMeView.as_view()),
+        path('sync/search/', SyncSearchView.as_view()),
+        path('async/search/', SearchView.as_view()),
+    ]
+
+
+ENDPOINTS = {
+    'dashboard': ('dashboard/', ''),
+    'notices': ('notices/', ''),
+    'me': ('me/', ''),
+    'search': ('search/', 'q=bench'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync and async versions of the dashboard, notices, users/me and search "
+        "endpoints through the ASGI handler in this process (fixture rows are deleted afterwards)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Requests per endpoint and version")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once")
+        parser.add_argument('--notices', type=int, default=50, help="Notices visible to the benchmark user")
+        parser.add_argument(
+            '--latency-ms', type=float, default=0.0,
+            help="Delay added to every query, to mimic the round trip to a database on another host"
+        )
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS), action='append', help="Endpoints to run (default all)")
+
+    def handle(self, *args, **options):
+        delay = options['latency_ms'] / 1000
+
+        def add_latency(sender, connection, **kwargs):
+            def wrapper(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+            connection.execute_wrappers.append(wrapper)
+
+        if delay:
+            connection_created.connect(add_latency)
+        try:
+            token = self.seed(options['notices'])
+            with override_settings(ROOT_URLCONF=BenchmarkURLConf, THROTTLE_ENABLED=False, ALLOWED_HOSTS=['testserver']):
+                app = ASGIHandler()
+                for name in options['endpoint'] or ENDPOINTS:
+                    for version in ('sync', 'async'):
+                        self.report(name, version, asyncio.run(self.load(app, name, version, token, options)))
+        finally:
+            connection_created.disconnect(add_latency)
+            # Cascades to the notices and complaints created below
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+    def seed(self, notices):
+        # Committed rather than rolled back: the views read on other threads' connections
+        User.objects.filter(username__startswith=PREFIX).delete()
+        admin = User.objects.create_user(
+            username=f'{PREFIX}admin', password=None, role=User.Roles.ADMIN, first_name='Bench', last_name='Admin'
+        )
+        student = User.objects.create_user(username=f'{PREFIX}student', password=None, role=User.Roles.STUDENT)
+        Notice.objects.bulk_create([
+            Notice(title=f'bench notice {i}', content='benchmark', target_audience=User.Roles.ADMIN, created_by=admin)
+            for i in range(notices)
+        ])
+        Complaint.objects.bulk_create([
+            Complaint(user=student, title=f'bench complaint {i}', description='benchmark') for i in range(10)
+        ])
+        return str(ClaimsTokenObtainPairSerializer.get_token(admin).access_token)
+
+    async def load(self, app, name, version, token, options):
+        route, query_string = ENDPOINTS[name]
+        path_info = f'/{version}/{route}'
+        latencies = []
+        failures = 0
+        remaining = options['requests']
+
+        async def request():
+            status = None
+
+            async def receive():
+                if not sent.done():
+                    sent.set_result(True)
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client never disconnects; the handler cancels this wait
+                await asyncio.Future()
+
+            async def send(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+
+            sent = asyncio.get_running_loop().create_future()
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path_info, 'raw_path': path_info.encode(), 'root_path': '',
+                'query_string': query_string.encode(), 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+                'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+            }
+            await app(scope, receive, send)
+            return status
+
+        async def client():
+            nonlocal remaining, failures
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                status = await request()
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        return {'elapsed': elapsed, 'latencies': sorted(latencies), 'failures': failures}
+
+    def report(self, name, version, results):
+        latencies = results['latencies']
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        line = (
+            f"{name:<10} {version:<6} {len(latencies) / results['elapsed']:8.1f} req/s   "
+            f"p50 {statistics.median(latencies) * 1000:7.1f}ms   p95 {p95 * 1000:7.1f}ms"
+        )
+        self.stdout.write(line)
+        if results['failures']:
+            self.stdout.write(self.style.ERROR(f"{results['failures']} {version} {name} requests did not return 200"))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.postgresql.base import DatabaseWrapper as PlainWrapper
+import copy
+import statistics
+import time
+
+from core.backends.pool import ConnectionPool, _pools
+from core.backends.postgresql_pool.base import DatabaseWrapper as PooledWrapper
+
+
+class Command(BaseCommand):
+    help = "Compare per-request connection cost on PostgreSQL: new connection, persistent, and pooled"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Simulated requests per mode")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database alias to benchmark")
+
+    def handle(self, *args, **options):
+        source = connections[options['database']]
+        if source.vendor != 'postgresql':
+            raise CommandError("Connection pooling applies to PostgreSQL; point DATABASE_URL or DB_HOST at a Postgres server")
+
+        modes = [
+            ('new connection per request (CONN_MAX_AGE=0)', PlainWrapper, True),
+            ('persistent connection (CONN_MAX_AGE>0)', PlainWrapper, False),
+            ('pooled (DB_POOL=True)', PooledWrapper, True),
+        ]
+        for index, (label, wrapper_class, close_each_request) in enumerate(modes):
+            alias = f'benchmark-{index}'
+            if wrapper_class is PooledWrapper:
+                _pools[alias] = ConnectionPool(max_size=1)
+            wrapper = wrapper_class(copy.deepcopy(source.settings_dict), alias)
+            try:
+                setup, total = self.run(wrapper, options['requests'], close_each_request)
+            finally:
+                wrapper.close()
+                _pools.pop(alias, None)
+            self.stdout.write(
+                f"{label}: connect {statistics.mean(setup) * 1000:.2f}ms mean, "
+                f"p95 {sorted(setup)[int(len(setup) * 0.95) - 1] * 1000:.2f}ms; "
+                f"request {statistics.mean(total) * 1000:.2f}ms mean"
+            )
+
+    def run(self, wrapper, requests, close_each_request):
+        setup, total = [], []
+        for _ in range(requests):
+            started = time.perf_counter()
+            wrapper.ensure_connection()
+            connected = time.perf_counter()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            if close_each_request:
+                wrapper.close()
+            finished = time.perf_counter()
+            setup.append(connected - started)
+            total.append(finished - started)
+        return setup, total
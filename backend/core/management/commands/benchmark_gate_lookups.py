@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from datetime import time as dt_time
+import random
+import time
+
+from core.gate import DailyPassIndex, normalize_id_proof, normalize_phone
+from core.models import Visitor
+
+User = get_user_model()
+
+PREFIX = 'gatebench-'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time gate pass lookups against a day of approved visits (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--passes', type=int, default=5000, help="Approved visits for today")
+        parser.add_argument('--lookups', type=int, default=100000, help="Lookups to time")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        today = timezone.localdate()
+        student = User.objects.create(username=f'{PREFIX}student', role='student', password='!')
+        Visitor.objects.bulk_create([
+            Visitor(
+                student=student, visitor_name=f'Guest {i}', visitor_phone=f'9{i:09d}',
+                visitor_id_proof=f'ID-{i:06d}', purpose='Visit', visit_date=today,
+                visit_time=dt_time(10, 0), expected_duration=2, status=Visitor.Status.APPROVED,
+                id_proof_key=normalize_id_proof(f'ID-{i:06d}'), phone_key=normalize_phone(f'9{i:09d}'),
+            )
+            for i in range(options['passes'])
+        ], batch_size=1000)
+
+        index = DailyPassIndex()
+        started = time.perf_counter()
+        index.lookup(id_proof='warm-up', day=today)
+        load = time.perf_counter() - started
+
+        keys = [f'id-{random.randrange(options["passes"]):06d}' for _ in range(options['lookups'])]
+        started = time.perf_counter()
+        for key in keys:
+            index.lookup(id_proof=key, day=today)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Loaded {options['passes']} passes in {load * 1000:.1f}ms")
+        self.stdout.write(
+            f"{options['lookups']} lookups in {elapsed:.3f}s "
+            f"({elapsed / options['lookups'] * 1e6:.2f}µs per lookup)"
+        )
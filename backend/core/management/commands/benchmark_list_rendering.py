@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from datetime import date, timedelta
+from decimal import Decimal
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from core.fastlist import row_plan
+from core.models import Attendance, Payment
+from core.renderers import FastJSONRenderer, orjson
+from core.serializers import AttendanceSerializer, PaymentSerializer
+
+User = get_user_model()
+
+PREFIX = 'listbench-'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare rows/s of serializer and values() list rendering for attendance and payments (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Rows of each kind to create")
+        parser.add_argument('--students', type=int, default=200, help="Students the rows are spread over")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per variant; the fastest is reported")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        students = User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', role='student', first_name=f'Student{i}', last_name='Bench', password='!')
+            for i in range(options['students'])
+        ])
+        days = -(-options['rows'] // len(students))
+        first_day = date.today() - timedelta(days=days)
+        Attendance.objects.bulk_create([
+            Attendance(user=students[i % len(students)], date=first_day + timedelta(days=i // len(students)), present=i % 7 != 0)
+            for i in range(options['rows'])
+        ], batch_size=2000)
+        Payment.objects.bulk_create([
+            Payment(
+                user=students[i % len(students)], amount=Decimal(5000 + i % 997) / 4,
+                description=f'Rent instalment {i}', due_date=first_day + timedelta(days=i % 28),
+            )
+            for i in range(options['rows'])
+        ], batch_size=2000)
+
+        for serializer_class in (AttendanceSerializer, PaymentSerializer):
+            model = serializer_class.Meta.model
+            queryset = model.objects.filter(user__username__startswith=PREFIX).select_related('user').order_by('-pk')
+            self.compare(serializer_class, queryset, options)
+
+    def compare(self, serializer_class, queryset, options):
+        plan = row_plan(serializer_class())
+        if plan is None:
+            raise CommandError(f"{serializer_class.__name__} has no values() row plan")
+        variants = [
+            ('serializer + JSONRenderer', lambda: JSONRenderer().render(serializer_class(queryset, many=True).data)),
+            ('values() + JSONRenderer', lambda: JSONRenderer().render(plan.rows(queryset))),
+        ]
+        if orjson is not None:
+            variants.append(('values() + orjson', lambda: FastJSONRenderer().render(plan.rows(queryset))))
+        else:
+            self.stdout.write("orjson is not installed; skipping the orjson variant")
+
+        rows = queryset.count()
+        self.stdout.write(f"{serializer_class.Meta.model.__name__} ({rows} rows)")
+        baseline = None
+        for label, render in variants:
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                body = render()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            if baseline is None:
+                baseline, reference = best, body
+            identical = 'identical' if body == reference else 'DIFFERENT OUTPUT'
+            self.stdout.write(
+                f"  {label:<28} {rows / best:>10,.0f} rows/s  {best * 1000:8.1f}ms  "
+                f"{baseline / best:5.1f}x  {len(body):,} bytes, {identical}"
+            )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+import time
+import uuid
+
+from core.models import RevokedToken
+from core.revocation import RevocationList
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time token revocation checks against a table of revoked JTIs (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revoked', type=int, default=20000, help="Revoked tokens in the table")
+        parser.add_argument('--checks', type=int, default=100000, help="Checks of live (unrevoked) tokens to time")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        expires_at = timezone.now() + timedelta(days=1)
+        revoked = [uuid.uuid4().hex for _ in range(options['revoked'])]
+        RevokedToken.objects.bulk_create([
+            RevokedToken(jti=jti, token_type='access', expires_at=expires_at) for jti in revoked
+        ], batch_size=1000)
+
+        revocations = RevocationList()
+        started = time.perf_counter()
+        revocations.is_revoked('warm-up')
+        load = time.perf_counter() - started
+
+        live = [uuid.uuid4().hex for _ in range(options['checks'])]
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for jti in live:
+                revocations.is_revoked(jti)
+            elapsed = time.perf_counter() - started
+
+        missed = sum(1 for jti in revoked[:1000] if not revocations.is_revoked(jti))
+
+        self.stdout.write(f"Loaded {options['revoked']} revocations in {load * 1000:.1f}ms")
+        self.stdout.write(
+            f"{options['checks']} checks in {elapsed:.3f}s "
+            f"({elapsed / options['checks'] * 1e6:.2f}µs per check, "
+            f"{len(queries)} confirmation queries from false positives)"
+        )
+        if missed:
+            self.stdout.write(self.style.ERROR(f"{missed} revoked tokens were not detected"))
@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from core.backends.sqlite_tuned.base import DEFAULT_PRAGMAS, apply_pragmas
+
+
+class Command(BaseCommand):
+    help = "Compare reader/writer throughput of stock and tuned SQLite settings on a scratch database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help="Reader threads")
+        parser.add_argument('--writers', type=int, default=4, help="Writer threads")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of each run")
+        parser.add_argument('--rows', type=int, default=20000, help="Rows to seed")
+
+    def handle(self, *args, **options):
+        for label, tuned in (('stock', False), ('tuned', True)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['rows'], tuned)
+                results = self.run(path, options, tuned)
+            self.stdout.write(
+                f"{label}: {results['reads'] / options['seconds']:.0f} reads/s, "
+                f"{results['writes'] / options['seconds']:.0f} writes/s, "
+                f"{results['locked']} 'database is locked' errors"
+            )
+
+    def connect(self, path, tuned):
+        # Django's stock SQLite connection: 5s timeout, deferred transactions
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        if tuned:
+            apply_pragmas(connection, DEFAULT_PRAGMAS)
+        return connection
+
+    def seed(self, path, rows, tuned):
+        connection = self.connect(path, tuned)
+        connection.execute('CREATE TABLE attendance (id INTEGER PRIMARY KEY, user_id INTEGER, day INTEGER, present INTEGER)')
+        connection.execute('CREATE INDEX attendance_user ON attendance (user_id)')
+        connection.executemany(
+            'INSERT INTO attendance (user_id, day, present) VALUES (?, ?, 1)',
+            ((i % 500, i // 500) for i in range(rows)),
+        )
+        connection.close()
+
+    def run(self, path, options, tuned):
+        results = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def reader():
+            connection = self.connect(path, tuned)
+            reads = locked = 0
+            while time.monotonic() < deadline:
+                try:
+                    connection.execute(
+                        'SELECT COUNT(*) FROM attendance WHERE user_id = ? AND present = 1', (random.randrange(500),)
+                    ).fetchone()
+                    reads += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+            connection.close()
+            with lock:
+                results['reads'] += reads
+                results['locked'] += locked
+
+        def writer():
+            connection = self.connect(path, tuned)
+            writes = locked = 0
+            while time.monotonic() < deadline:
+                user_id = random.randrange(500)
+                try:
+                    # Read-then-write, like marking attendance inside atomic()
+                    connection.execute('BEGIN IMMEDIATE' if tuned else 'BEGIN')
+                    day = connection.execute('SELECT MAX(day) FROM attendance WHERE user_id = ?', (user_id,)).fetchone()[0] or 0
+                    connection.execute('INSERT INTO attendance (user_id, day, present) VALUES (?, ?, 1)', (user_id, day + 1))
+                    connection.execute('COMMIT')
+                    writes += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+            connection.close()
+            with lock:
+                results['writes'] += writes
+                results['locked'] += locked
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
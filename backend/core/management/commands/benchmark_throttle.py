@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import time
+
+from core.throttling import LocalBucketStore, get_store, parse_rate
+
+
+class Command(BaseCommand):
+    help = "Time token-bucket throttle decisions against the configured store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--decisions', type=int, default=100000, help="Decisions to time")
+        parser.add_argument('--clients', type=int, default=1000, help="Distinct clients to spread them over")
+        parser.add_argument('--scope', default='user', help="Scope from THROTTLE_RATES whose rates to use")
+        parser.add_argument('--local', action='store_true', help="Use a process-local store whatever THROTTLE_STORE says")
+
+    def handle(self, *args, **options):
+        config = settings.THROTTLE_RATES[options['scope']]
+        burst, rate = config['burst'], parse_rate(config['rate'])
+        store = LocalBucketStore() if options['local'] else get_store()
+        keys = [f"bench:{options['scope']}:user:{i % options['clients']}" for i in range(options['decisions'])]
+
+        refused = 0
+        started = time.perf_counter()
+        for key in keys:
+            if store.consume([(key, burst, rate)]):
+                refused += 1
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Store: {type(store).__name__}")
+        self.stdout.write(
+            f"{options['decisions']} decisions in {elapsed:.3f}s "
+            f"({elapsed / options['decisions'] * 1e6:.2f}µs per decision, {refused} refused)"
+        )
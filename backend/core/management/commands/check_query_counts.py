@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import AuditLog, Complaint, ComplaintComment, Document, Event, Room, RoomAllocation, Visitor
+from core.rsvp import join_event
+from core.views import ComplaintViewSet, RoomViewSet, UserViewSet
+from core.views_enhanced import (
+    AdvancedDashboardStatsView, AdvancedUserViewSet, AuditLogViewSet, DocumentViewSet,
+    EventViewSet, VisitorViewSet
+)
+
+User = get_user_model()
+
+PREFIX = 'qcount-'
+
+ENDPOINTS = [
+    ('users', UserViewSet.as_view({'get': 'list'})),
+    ('rooms', RoomViewSet.as_view({'get': 'list'})),
+    ('complaints', ComplaintViewSet.as_view({'get': 'list'})),
+    ('advanced/users', AdvancedUserViewSet.as_view({'get': 'list'})),
+    ('documents', DocumentViewSet.as_view({'get': 'list'})),
+    ('visitors', VisitorViewSet.as_view({'get': 'list'})),
+    ('events', EventViewSet.as_view({'get': 'list'})),
+    ('audit-logs', AuditLogViewSet.as_view({'get': 'list'})),
+    ('dashboard/advanced-stats', AdvancedDashboardStatsView.as_view()),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Verify list endpoints run a fixed number of queries regardless of row count (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2, help='Rows per model for the first measurement')
+        parser.add_argument('--large', type=int, default=12, help='Rows per model for the second measurement')
+
+    def handle(self, *args, **options):
+        results = {}
+        try:
+            with transaction.atomic():
+                admin = User.objects.create(username=f'{PREFIX}admin', role='admin', password='!')
+                self.add_rows(admin, 0, options['small'])
+                small = self.measure(admin)
+                self.add_rows(admin, options['small'], options['large'])
+                large = self.measure(admin)
+                for name in small:
+                    results[name] = (small[name], large[name])
+                raise Rollback
+        except Rollback:
+            pass
+
+        failures = []
+        for name, (small, large) in results.items():
+            line = f'{name}: {small} queries for {options["small"]} rows, {large} for {options["large"]}'
+            if small != large:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f'Query count grows with rows for: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('All endpoints run a fixed number of queries'))
+
+    def measure(self, admin):
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')), 'localhost')
+        factory = APIRequestFactory(HTTP_HOST=host)
+        counts = {}
+        for name, view in ENDPOINTS:
+            request = factory.get(f'/api/{name}/')
+            force_authenticate(request, user=admin)
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request)
+            if response.status_code != 200:
+                raise CommandError(f'{name} returned {response.status_code}')
+            counts[name] = len(queries)
+        return counts
+
+    def add_rows(self, admin, start, end):
+        now = timezone.now()
+        for i in range(start, end):
+            student = User.objects.create(username=f'{PREFIX}{i}', role='student', password='!')
+            room = Room.objects.create(number=f'{PREFIX}{i}', capacity=2, monthly_rent=Decimal('5000'))
+            RoomAllocation.objects.create(user=student, room=room, start_date=date.today(), monthly_rent=room.monthly_rent)
+            Document.objects.create(user=student, document_type='id_proof', title=f'ID {i}', file=f'documents/{PREFIX}{i}.pdf', verified_by=admin)
+            Visitor.objects.create(
+                student=student, visitor_name=f'Guest {i}', visitor_phone='9999999999',
+                visitor_id_proof=f'ID{i}', purpose='Visit', visit_date=date.today(),
+                visit_time=dt_time(10, 0), expected_duration=2, approved_by=admin,
+            )
+            event = Event.objects.create(
+                title=f'Event {i}', description='', event_type='meeting', start_date=now,
+                end_date=now + timedelta(hours=1), location='Hall', organizer=admin,
+            )
+            join_event(event.id, student.id)
+            join_event(event.id, admin.id)
+            AuditLog.objects.create(user=student, action='create', model_name='Visitor', description='Created')
+            complaint = Complaint.objects.create(user=student, room=room, title=f'Complaint {i}', description='')
+            ComplaintComment.objects.create(complaint=complaint, user=admin, message='Looking into it')
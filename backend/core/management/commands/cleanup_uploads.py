@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.uploads import purge_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked upload sessions idle past CHUNKED_UPLOAD_TTL_HOURS and their temp files'
+
+    def handle(self, *args, **options):
+        removed = purge_stale_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} stale upload sessions'))
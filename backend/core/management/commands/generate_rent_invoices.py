@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+import time
+
+from core.billing import DEFAULT_DUE_DAY, generate_rent_invoices, parse_billing_period
+
+
+class Command(BaseCommand):
+    help = 'Create pending rent payments for every allocation in a billing month (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            help='Billing month as YYYY-MM, defaults to the current month',
+        )
+        parser.add_argument(
+            '--due-day',
+            type=int,
+            default=DEFAULT_DUE_DAY,
+            help='Day of the month the rent is due',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute invoices without writing them',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            period = parse_billing_period(options['period'] or timezone.now().date())
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        summary = generate_rent_invoices(period, due_day=options['due_day'], dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Billing period: {summary['period']}")
+        self.stdout.write(f"Allocations in period: {summary['allocations']}")
+        self.stdout.write(f"Already invoiced: {summary['skipped_existing']}")
+        self.stdout.write(f"Zero rent: {summary['skipped_zero_rent']}")
+        self.stdout.write(f"Prorated: {summary['prorated']}")
+        self.stdout.write(f"Total amount: {summary['total_amount']}")
+
+        if summary['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run: {summary['created']} invoices computed in {elapsed:.2f}s"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created {summary['created']} rent invoices in {elapsed:.2f}s"))
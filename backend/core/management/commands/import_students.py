@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+import csv
+import time
+
+from core.provisioning import import_students, parse_rows
+
+
+class Command(BaseCommand):
+    help = 'Create student accounts from a CSV or JSON file; invalid rows are reported and skipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV with a header row, or a JSON list of students')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without creating accounts',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processes for password hashing (defaults to BULK_IMPORT_HASH_WORKERS or one per CPU)',
+        )
+        parser.add_argument(
+            '--tokens-out',
+            help='Write activation tokens for rows without a password to this CSV file',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                rows = parse_rows(f.read(), options['path'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValueError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        started = time.perf_counter()
+        summary = import_students(rows, dry_run=options['dry_run'], workers=options['workers'])
+        elapsed = time.perf_counter() - started
+
+        for error in summary['errors']:
+            details = '; '.join(f'{field}: {" ".join(map(str, messages))}' for field, messages in error['errors'].items())
+            self.stdout.write(self.style.ERROR(f"Row {error['row']}: {details}"))
+
+        if options['tokens_out'] and summary['activations']:
+            with open(options['tokens_out'], 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['username', 'uid', 'token'])
+                writer.writeheader()
+                writer.writerows(summary['activations'])
+            self.stdout.write(f"Activation tokens written to {options['tokens_out']}")
+        elif summary['activations']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(summary['activations'])} accounts need activation; pass --tokens-out to save their tokens"
+            ))
+
+        self.stdout.write(f"Rows: {summary['rows']}, failed: {summary['failed']}")
+        if summary['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run: {summary['created']} students valid in {elapsed:.2f}s"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created {summary['created']} students in {elapsed:.2f}s"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.revocation import purge_expired_revocations
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked token records whose tokens have expired'
+
+    def handle(self, *args, **options):
+        removed = purge_expired_revocations()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired token revocations'))
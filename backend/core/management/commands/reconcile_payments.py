@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+import time
+
+from core.webhooks import reconcile_pending
+
+
+class Command(BaseCommand):
+    help = 'Apply pending payment webhook events to payments in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Events applied per transaction',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the inbox instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep between polls in --loop mode',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            totals = reconcile_pending(batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+            if totals['events']:
+                self.stdout.write(
+                    f"Processed {totals['events']} events in {elapsed:.2f}s "
+                    f"(applied {totals['applied']}, ignored {totals['ignored']}, failed {totals['failed']}, deferred {totals['deferred']})"
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Payment webhook inbox drained'))
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+import os
+
+from core.backup import BackupError, backup_chain, verify_backup
+from core.restore import restore_backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Replace the database contents with a backup written by backup_database (and the chain it builds on); '
+        'an interrupted restore resumes when run again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup', help='Backup directory, or a backup ID in BACKUP_DIR')
+        parser.add_argument('--verify-only', action='store_true', help='Check the checksums and exit')
+        parser.add_argument('--chunk-size', type=int, help='Rows committed at a time (defaults to BACKUP_CHUNK_SIZE)')
+        parser.add_argument('--workers', type=int, help='Tables loaded at once (defaults to RESTORE_WORKERS)')
+        parser.add_argument('--restart', action='store_true', help='Start over instead of resuming an interrupted restore')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive', help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        path = options['backup']
+        if not os.path.isdir(path):
+            path = os.path.join(settings.BACKUP_DIR, path)
+
+        try:
+            chain = backup_chain(path)
+            if options['verify_only']:
+                for manifest in chain:
+                    verify_backup(manifest)
+                    self.stdout.write(f"{manifest['id']} ({manifest['kind']}): {len(manifest['models'])} files OK")
+                self.stdout.write(self.style.SUCCESS('Backup verified'))
+                return
+
+            if options['interactive']:
+                answer = input(
+                    f"This replaces ALL data in the database with backup {chain[-1]['id']} "
+                    f"({' -> '.join(manifest['id'] for manifest in chain)}). Type 'yes' to continue: "
+                )
+                if answer != 'yes':
+                    raise CommandError('Restore cancelled')
+
+            summary = restore_backup(
+                path, chunk_size=options['chunk_size'], workers=options['workers'], restart=options['restart'],
+                progress=self.report_table,
+            )
+        except (BackupError, IntegrityError, OSError) as e:
+            raise CommandError(str(e))
+
+        if summary['resumed']:
+            self.stdout.write(self.style.WARNING('Resumed an interrupted restore; row counts exclude earlier progress'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {summary['backup']}: {summary['rows']} rows into {summary['models']} tables "
+            f"({summary['deleted']} deleted by incrementals) with {summary['workers']} workers in {summary['seconds']}s"
+        ))
+
+    def report_table(self, label, rows):
+        if rows:
+            self.stdout.write(f'  {label}: {rows} rows')
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+import multiprocessing
+import signal
+import time
+
+from core.jobs import Worker, job_metrics
+
+
+def _run_worker_process(concurrency, poll_interval, burst):
+    # Needed when processes are spawned rather than forked
+    import django
+    django.setup()
+
+    worker = Worker(concurrency=concurrency, poll_interval=poll_interval, burst=burst)
+    signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+    signal.signal(signal.SIGINT, lambda *args: worker.stop())
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = "Run background jobs and enqueue scheduled ones until stopped (SIGTERM/Ctrl-C finishes running jobs first)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help="Jobs run at once per process (threads)")
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes, each with --concurrency threads")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds an idle thread waits before polling again")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due instead of waiting for more")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['processes'] < 1:
+            raise CommandError("--concurrency and --processes must be at least 1")
+
+        started = time.perf_counter()
+        if options['processes'] == 1:
+            worker = Worker(
+                concurrency=options['concurrency'], poll_interval=options['poll_interval'], burst=options['burst']
+            )
+            signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+            signal.signal(signal.SIGINT, lambda *args: worker.stop())
+            self.stdout.write(f"Worker {worker.name} running {options['concurrency']} threads")
+            stats = worker.run()
+            self.stdout.write(
+                f"Ran {sum(stats.values())} jobs in {time.perf_counter() - started:.1f}s "
+                f"(succeeded {stats['succeeded']}, retried {stats['retried']}, failed {stats['failed']})"
+            )
+        else:
+            # Children must not inherit this process's open connections
+            connections.close_all()
+            processes = [
+                multiprocessing.Process(
+                    target=_run_worker_process,
+                    args=(options['concurrency'], options['poll_interval'], options['burst']),
+                )
+                for _ in range(options['processes'])
+            ]
+            for process in processes:
+                process.start()
+            stop = lambda *args: [process.terminate() for process in processes if process.is_alive()]
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            self.stdout.write(
+                f"Running {options['processes']} worker processes with {options['concurrency']} threads each"
+            )
+            for process in processes:
+                process.join()
+
+        metrics = job_metrics()
+        self.stdout.write(
+            f"Queue: {metrics['queued']} queued ({metrics['due']} due), {metrics['running']} running, "
+            f"{metrics['failed']} failed in the last hour"
+        )
+        self.stdout.write(self.style.SUCCESS("Job worker stopped"))
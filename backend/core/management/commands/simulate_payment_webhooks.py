@@ -0,0 +1,127 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from core.models import Payment
+from core.webhooks import EVENT_ID_HEADER, SIGNATURE_HEADER, reconcile_pending, sign_payload
+
+
+class Command(BaseCommand):
+    help = 'Stand-in payment provider: fire signed webhook callbacks for pending payments (load testing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Number of distinct events to send')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel senders')
+        parser.add_argument('--url', help='Webhook URL of a running server (both need the same PAYMENT_WEBHOOK_SECRET); sends in-process when omitted')
+        parser.add_argument('--duplicate-rate', type=float, default=0.1, help='Fraction of events delivered twice')
+        parser.add_argument('--failure-rate', type=float, default=0.1, help='Fraction of payment.failed events')
+        parser.add_argument('--bad-signature-rate', type=float, default=0.0, help='Fraction of tampered callbacks')
+        parser.add_argument('--prepare', action='store_true',
+                            help='Give pending payments without a provider order ID a simulated one')
+        parser.add_argument('--reconcile', action='store_true', help='Run the reconciler after sending')
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            self.prepare_orders()
+
+        order_ids = list(
+            Payment.objects.filter(status='pending').exclude(provider_order_id='')
+            .values_list('provider_order_id', flat=True)[:options['count']]
+        )
+        if not order_ids:
+            raise CommandError('No pending payments with a provider order ID; rerun with --prepare')
+
+        deliveries = []
+        for order_id in order_ids:
+            delivery = self.build_event(order_id, options['failure_rate'], options['bad_signature_rate'])
+            deliveries.append(delivery)
+            if random.random() < options['duplicate_rate']:
+                deliveries.append(delivery)
+        random.shuffle(deliveries)
+
+        send = self.http_sender(options['url']) if options['url'] else self.local_sender()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            codes = list(pool.map(send, deliveries))
+        elapsed = time.perf_counter() - started
+
+        accepted = sum(1 for code in codes if code == 200)
+        self.stdout.write(f'Sent {len(deliveries)} callbacks for {len(order_ids)} payments in {elapsed:.2f}s '
+                          f'({len(deliveries) / elapsed if elapsed else 0:.0f}/s)')
+        self.stdout.write(f'  accepted: {accepted}')
+        self.stdout.write(f'  rejected: {len(codes) - accepted}')
+
+        if options['reconcile']:
+            started = time.perf_counter()
+            totals = reconcile_pending()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"Reconciled {totals['events']} events in {elapsed:.2f}s "
+                              f"(applied {totals['applied']}, ignored {totals['ignored']}, failed {totals['failed']}, deferred {totals['deferred']})")
+
+    def prepare_orders(self):
+        payments = list(Payment.objects.filter(status='pending', provider_order_id=''))
+        for payment in payments:
+            payment.provider_order_id = f'order_sim_{payment.pk}'
+        Payment.objects.bulk_update(payments, ['provider_order_id'], batch_size=1000)
+        self.stdout.write(f'Assigned simulated order IDs to {len(payments)} payments')
+
+    def build_event(self, order_id, failure_rate, bad_signature_rate):
+        event_type = 'payment.failed' if random.random() < failure_rate else 'payment.captured'
+        body = json.dumps({
+            'entity': 'event',
+            'event': event_type,
+            'payload': {
+                'payment': {
+                    'entity': {
+                        'id': f'pay_sim_{uuid.uuid4().hex[:14]}',
+                        'order_id': order_id,
+                        'status': 'failed' if event_type == 'payment.failed' else 'captured',
+                    }
+                }
+            },
+            'created_at': int(time.time()),
+        }).encode('utf-8')
+        signature = sign_payload(body)
+        if random.random() < bad_signature_rate:
+            signature = signature[::-1]
+        return body, signature, f'evt_sim_{uuid.uuid4().hex}'
+
+    def local_sender(self):
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')), 'localhost')
+        path = reverse('payment-webhook')
+
+        def send(delivery):
+            body, signature, event_id = delivery
+            response = Client(HTTP_HOST=host).post(
+                path, data=body, content_type='application/json',
+                headers={SIGNATURE_HEADER: signature, EVENT_ID_HEADER: event_id},
+            )
+            return response.status_code
+
+        return send
+
+    def http_sender(self, url):
+        def send(delivery):
+            body, signature, event_id = delivery
+            request = urllib.request.Request(url, data=body, method='POST', headers={
+                'Content-Type': 'application/json',
+                SIGNATURE_HEADER: signature,
+                EVENT_ID_HEADER: event_id,
+            })
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+            except urllib.error.URLError:
+                return 0
+
+        return send
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+import time
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint the SQLite WAL and refresh query planner statistics (optionally on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias')
+        parser.add_argument(
+            '--mode',
+            choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            default='TRUNCATE',
+            help='wal_checkpoint mode; TRUNCATE also shrinks the -wal file',
+        )
+        parser.add_argument('--vacuum', action='store_true', help='Also VACUUM to reclaim free pages (locks the database while it runs)')
+        parser.add_argument('--every', type=int, help='Repeat every N seconds instead of running once')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Database '{options['database']}' is not SQLite")
+
+        while True:
+            self.run(connection, options)
+            if not options['every']:
+                break
+            # Don't hold a connection (or its snapshot) between runs
+            connection.close()
+            time.sleep(options['every'])
+
+    def run(self, connection, options):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA wal_checkpoint({options['mode']})")
+            busy, wal_pages, checkpointed = cursor.fetchone()
+            cursor.execute('PRAGMA optimize')
+            if options['vacuum']:
+                cursor.execute('VACUUM')
+        elapsed = time.perf_counter() - started
+
+        if busy:
+            self.stdout.write(self.style.WARNING(
+                f"Checkpoint incomplete, readers still active: {checkpointed} of {wal_pages} WAL pages copied"
+            ))
+        elif wal_pages < 0:
+            self.stdout.write(self.style.WARNING('Database is not in WAL mode; nothing to checkpoint'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Checkpointed {checkpointed} WAL pages and optimized in {elapsed * 1000:.0f}ms"
+            ))
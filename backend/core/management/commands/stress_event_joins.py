@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.utils import timezone
+from collections import Counter
+from datetime import timedelta
+import random
+import threading
+import time
+
+from core.models import Event
+from core.rsvp import Attendee, join_event, leave_event
+
+User = get_user_model()
+
+PREFIX = 'rsvp-stress-'
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent joins and leaves against one capped event and verify the stored counter and capacity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=60, help='Number of temporary students')
+        parser.add_argument('--capacity', type=int, default=20, help='Capacity of the temporary event')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent worker threads')
+        parser.add_argument('--operations', type=int, default=50, help='Join/leave calls per worker')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f'Users prefixed "{PREFIX}" already exist; remove them first')
+
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', role='student', password='!')
+            for i in range(options['students'])
+        ])
+        student_ids = list(User.objects.filter(username__startswith=PREFIX).values_list('id', flat=True))
+        now = timezone.now()
+        event = Event.objects.create(
+            title=f'{PREFIX}event', description='', event_type='other', start_date=now,
+            end_date=now + timedelta(hours=1), location='Hall', organizer_id=student_ids[0],
+            capacity=options['capacity'],
+        )
+
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(options['operations']):
+                    user_id = random.choice(student_ids)
+                    if random.random() < 0.7:
+                        result = join_event(event.id, user_id)
+                    else:
+                        result = leave_event(event.id, user_id)
+                    with lock:
+                        outcomes[result] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, options['workers']))]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        event.refresh_from_db()
+        actual = Attendee.objects.filter(event_id=event.id).count()
+        total = sum(outcomes.values())
+        self.stdout.write(f'{total} RSVP calls with {len(threads)} workers in {elapsed:.2f}s')
+        for result, count in sorted(outcomes.items()):
+            self.stdout.write(f'  {result}: {count}')
+        self.stdout.write(f'Stored count {event.attendees_count}, attendee rows {actual}, capacity {event.capacity}')
+
+        event.delete()
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+        if event.attendees_count != actual or actual > event.capacity:
+            raise CommandError('Attendee counter drifted or capacity exceeded')
+        self.stdout.write(self.style.SUCCESS('Counter matches attendee rows and capacity held'))
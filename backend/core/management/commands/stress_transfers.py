@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from collections import Counter
+from decimal import Decimal
+import random
+import threading
+import time
+
+from core.allocation import AllocationConflict, AllocationError, transfer_allocation
+from core.models import Room, RoomAllocation
+
+User = get_user_model()
+
+PREFIX = 'stress-'
+
+
+class Command(BaseCommand):
+    help = 'Run many concurrent room transfers against a few rooms and verify no room is overbooked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=30, help='Number of temporary students')
+        parser.add_argument('--rooms', type=int, default=4, help='Number of temporary rooms to contend on')
+        parser.add_argument('--capacity', type=int, default=8, help='Beds per temporary room')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent worker threads')
+        parser.add_argument('--transfers', type=int, default=25, help='Transfers attempted per worker')
+        parser.add_argument('--keep', action='store_true', help='Keep the temporary rows afterwards')
+
+    def handle(self, *args, **options):
+        if Room.objects.filter(number__startswith=PREFIX).exists():
+            raise CommandError(f'Rooms prefixed "{PREFIX}" already exist; remove them or rerun without --keep')
+
+        students, rooms = self.create_fixture(options)
+        room_ids = [room.id for room in rooms]
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(options['transfers']):
+                    student = random.choice(students)
+                    try:
+                        transfer_allocation(student, random.choice(room_ids))
+                        result = 'transferred'
+                    except AllocationError:
+                        result = 'rejected'
+                    except AllocationConflict:
+                        result = 'conflict'
+                    with lock:
+                        outcomes[result] += 1
+            finally:
+                connection.close()
+
+        workers = max(1, options['workers'])
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        errors = self.verify(students, rooms)
+        total = sum(outcomes.values())
+        self.stdout.write(f'Attempted {total} transfers with {workers} workers in {elapsed:.2f}s '
+                          f'({total / elapsed if elapsed else 0:.0f}/s)')
+        for result in ('transferred', 'rejected', 'conflict'):
+            self.stdout.write(f'  {result}: {outcomes[result]}')
+
+        if not options['keep']:
+            self.remove_fixture()
+
+        if errors:
+            for error in errors:
+                self.stderr.write(error)
+            raise CommandError('Invariant violated under concurrent transfers')
+        self.stdout.write(self.style.SUCCESS('No room overbooked and no student holds two active allocations'))
+
+    def create_fixture(self, options):
+        Room.objects.bulk_create([
+            Room(
+                number=f'{PREFIX}{i}',
+                capacity=options['capacity'],
+                floor=1,
+                room_type='triple',
+                monthly_rent=Decimal('5000'),
+            )
+            for i in range(options['rooms'])
+        ])
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', role='student', password='!')
+            for i in range(options['students'])
+        ])
+        students = list(User.objects.filter(username__startswith=PREFIX))
+        return students, list(Room.objects.filter(number__startswith=PREFIX))
+
+    def verify(self, students, rooms):
+        errors = []
+        for room in rooms:
+            active = RoomAllocation.objects.filter(room=room, status='active').count()
+            if active > room.capacity:
+                errors.append(f'Room {room.number}: {active} active allocations for {room.capacity} beds')
+        for student in students:
+            active = RoomAllocation.objects.filter(user=student, status='active').count()
+            if active > 1:
+                errors.append(f'Student {student.username}: {active} active allocations')
+        return errors
+
+    def remove_fixture(self):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        Room.objects.filter(number__startswith=PREFIX).delete()
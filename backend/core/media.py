@@ -0,0 +1,142 @@
+"""
+Efficient file responses for stored media.
+
+Whole files go out through FileResponse, which lets the WSGI server use
+os.sendfile. Single byte ranges and conditional GETs (ETag / Last-Modified)
+are answered here, reading a range in fixed-size blocks. With
+MEDIA_SERVE_MODE set to "x-accel" (nginx) or "x-sendfile" (Apache) the
+response only carries a header and the proxy sends the bytes itself.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_url(field_file, request=None):
+    """
+    URL of a stored file on the access-checked media view, or None without a
+    file. MEDIA_URL itself is not served.
+    """
+    if not field_file:
+        return None
+    url = reverse('protected-media', args=[field_file.name])
+    return request.build_absolute_uri(url) if request else url
+
+
+def _etag(stat):
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to send the
+    whole file, or raises ValueError when the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _disposition(response, filename, as_attachment):
+    header = content_disposition_header(as_attachment, os.path.basename(filename))
+    if header:
+        response['Content-Disposition'] = header
+
+
+def serve_file(request, name, as_attachment=False, filename=None):
+    """
+    Response for a stored file the caller has already authorised
+    """
+    if not name:
+        raise Http404
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        # Remote storage: no local path, stream through Python
+        return FileResponse(default_storage.open(name, 'rb'), as_attachment=as_attachment, filename=filename or name)
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+
+    if mode in ('x-accel', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + name.lstrip('/')
+        else:
+            response['X-Sendfile'] = path
+        _disposition(response, filename or name, as_attachment)
+        return response
+
+    etag = _etag(stat)
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_read_range(path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    _disposition(response, filename or name, as_attachment)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_noticeread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every occupancy change (optimistic locking)'),
+        ),
+        migrations.AddField(
+            model_name='roomallocation',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every status change (optimistic locking)'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_room_version_roomallocation_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='allocation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='core.roomallocation'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='billing_period',
+            field=models.DateField(blank=True, help_text='First day of the billed month for rent invoices', null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='payment',
+            unique_together={('allocation', 'billing_period')},
+        ),
+    ]
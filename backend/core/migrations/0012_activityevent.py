@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_paymentwebhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('payment', 'Payment'), ('complaint', 'Complaint'), ('visitor', 'Visitor')], max_length=20)),
+                ('scope', models.CharField(choices=[('all', 'Everyone'), ('staff', 'Admins and Wardens')], default='staff', max_length=10)),
+                ('user_name', models.CharField(blank=True, max_length=300)),
+                ('description', models.CharField(max_length=300)),
+                ('object_id', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='activity_time_idx'), models.Index(fields=['scope', '-created_at', '-id'], name='activity_scope_time_idx'), models.Index(fields=['user', '-created_at', '-id'], name='activity_user_time_idx')],
+            },
+        ),
+    ]
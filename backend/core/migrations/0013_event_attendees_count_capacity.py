@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_attendees_count(apps, schema_editor):
+    Event = apps.get_model('core', 'Event')
+    Attendee = Event.attendees.through
+    counts = (
+        Attendee.objects.filter(event_id=OuterRef('pk'))
+        .values('event_id').annotate(total=Count('id')).values('total')
+    )
+    Event.objects.update(attendees_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_activityevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='attendees_count',
+            field=models.PositiveIntegerField(default=0, help_text='Maintained by join/leave; never edit directly'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum attendees; empty means unlimited', null=True),
+        ),
+        migrations.RunPython(backfill_attendees_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_event_attendees_count_capacity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['visit_date', 'status'], name='visitor_day_status_idx'),
+        ),
+    ]
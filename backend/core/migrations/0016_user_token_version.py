@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on role, status or password change; older tokens stop working'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-19 11:00
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_lookup_keys(apps, schema_editor):
+    # Same normalization as core.gate at the time of this migration
+    Visitor = apps.get_model('core', 'Visitor')
+    batch = []
+    for visitor in Visitor.objects.only('visitor_id_proof', 'visitor_phone').iterator(chunk_size=2000):
+        visitor.id_proof_key = re.sub(r'[\s\-]', '', visitor.visitor_id_proof or '').upper()
+        visitor.phone_key = re.sub(r'\D', '', visitor.visitor_phone or '')[-10:]
+        batch.append(visitor)
+        if len(batch) == 2000:
+            Visitor.objects.bulk_update(batch, ['id_proof_key', 'phone_key'])
+            batch = []
+    Visitor.objects.bulk_update(batch, ['id_proof_key', 'phone_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visitor',
+            name='id_proof_key',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='visitor',
+            name='phone_key',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['visit_date', 'id_proof_key'], name='visitor_day_id_proof_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['visit_date', 'phone_key'], name='visitor_day_phone_idx'),
+        ),
+        migrations.RunPython(backfill_lookup_keys, migrations.RunPython.noop),
+    ]
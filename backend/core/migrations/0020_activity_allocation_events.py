@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-19 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_visitor_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activityevent',
+            name='event_type',
+            field=models.CharField(choices=[('payment', 'Payment'), ('complaint', 'Complaint'), ('visitor', 'Visitor'), ('allocation', 'Room Allocation')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_activity_allocation_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhookevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Reconciliations that found no matching payment'),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhookevent',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, help_text='Not reconciled again before this time', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_webhook_event_retry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='response_headers',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='idempotencykey',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, help_text='End of the replay window, or of the claim while the request runs'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 import uuid
 
@@ -22,6 +24,46 @@ class User(AbstractUser):
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
+    token_version = models.PositiveIntegerField(default=0, help_text="Bumped on role, status or password change; older tokens stop working")
+
+    # Changing any of these invalidates issued tokens
+    TOKEN_STATE_FIELDS = ("role", "is_active", "password")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._token_state = {
+            name: value for name, value in zip(field_names, values) if name in cls.TOKEN_STATE_FIELDS
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        # A user built from token claims loads all remaining fields on first access
+        if fields is not None and getattr(self, "from_token_claims", False):
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using=using, fields=fields)
+        # Values just read from the database are the new baseline for change tracking
+        state = getattr(self, "_token_state", None)
+        if state is not None:
+            for name in self.TOKEN_STATE_FIELDS:
+                if (fields is None or name in fields) and name in self.__dict__:
+                    state[name] = self.__dict__[name]
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_token_state", None)
+        changed = bool(loaded) and any(self.__dict__.get(name, value) != value for name, value in loaded.items())
+        if changed:
+            self.token_version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "token_version"}
+        if kwargs.get("update_fields") is not None:
+            # Partial saves (last_login, password) still count as a change for incremental backups
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+        super().save(*args, **kwargs)
+        self._token_state = {name: self.__dict__[name] for name in self.TOKEN_STATE_FIELDS if name in self.__dict__}
+        if changed:
+            from .authentication import publish_token_version
+            publish_token_version(self.pk, self.token_version)
 
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
@@ -51,6 +93,7 @@ class Room(models.Model):
     amenities = models.TextField(blank=True, help_text="Comma-separated list of amenities")
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='rooms/', null=True, blank=True)
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every occupancy change (optimistic locking)")
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
@@ -123,9 +166,14 @@ class Payment(models.Model):
     due_date = models.DateField(null=True, blank=True)
     paid_date = models.DateTimeField(null=True, blank=True)
     description = models.TextField(blank=True)
+    allocation = models.ForeignKey("RoomAllocation", on_delete=models.SET_NULL, null=True, blank=True, related_name="payments")
+    billing_period = models.DateField(null=True, blank=True, help_text="First day of the billed month for rent invoices")
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
+    class Meta:
+        unique_together = ("allocation", "billing_period")
+
 
 class Feedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="feedbacks")
@@ -156,6 +204,7 @@ class RoomAllocation(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.ACTIVE)
     monthly_rent = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     security_deposit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every status change (optimistic locking)")
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
@@ -269,6 +318,24 @@ class Document(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+class UploadSession(models.Model):
+    class Status(models.TextChoices):
+        UPLOADING = "uploading", "Uploading"
+        COMPLETE = "complete", "Complete"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField(help_text="Total bytes the client announced")
+    received = models.BigIntegerField(default=0, help_text="Bytes written so far; the resume offset")
+    sha256 = models.CharField(max_length=64, blank=True)
+    stored_name = models.CharField(max_length=255, blank=True, help_text="Content-addressed storage path once complete")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
 class Visitor(models.Model):
     class Status(models.TextChoices):
         PENDING = "pending", "Pending"
@@ -290,6 +357,24 @@ class Visitor(models.Model):
     actual_entry_time = models.DateTimeField(null=True, blank=True)
     actual_exit_time = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Normalized copies the gate looks passes up by; kept in sync by save()
+    id_proof_key = models.CharField(max_length=50, blank=True, editable=False)
+    phone_key = models.CharField(max_length=20, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["visit_date", "status"], name="visitor_day_status_idx"),
+            models.Index(fields=["visit_date", "id_proof_key"], name="visitor_day_id_proof_idx"),
+            models.Index(fields=["visit_date", "phone_key"], name="visitor_day_phone_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .gate import normalize_id_proof, normalize_phone
+        self.id_proof_key = normalize_id_proof(self.visitor_id_proof)
+        self.phone_key = normalize_phone(self.visitor_phone)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "id_proof_key", "phone_key"}
+        super().save(*args, **kwargs)
 
 
 class Event(models.Model):
@@ -308,8 +393,120 @@ class Event(models.Model):
     location = models.CharField(max_length=200)
     organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="organized_events")
     attendees = models.ManyToManyField(User, related_name="attended_events", blank=True)
+    attendees_count = models.PositiveIntegerField(default=0, help_text="Maintained by join/leave; never edit directly")
+    capacity = models.PositiveIntegerField(null=True, blank=True, help_text="Maximum attendees; empty means unlimited")
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
 
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of method, path and body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True, help_text="End of the replay window, or of the claim while the request runs")
+
+    class Meta:
+        unique_together = ("user", "key")
+
+
+class PaymentWebhookEvent(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        APPLIED = "applied", "Applied"
+        IGNORED = "ignored", "Ignored"
+        FAILED = "failed", "Failed"
+
+    provider = models.CharField(max_length=20, default="razorpay")
+    event_id = models.CharField(max_length=100)
+    payload = models.TextField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0, help_text="Reconciliations that found no matching payment")
+    retry_at = models.DateTimeField(null=True, blank=True, help_text="Not reconciled again before this time")
+
+    class Meta:
+        unique_together = ("provider", "event_id")
+
+
+class ActivityEvent(models.Model):
+    class EventType(models.TextChoices):
+        PAYMENT = "payment", "Payment"
+        COMPLAINT = "complaint", "Complaint"
+        VISITOR = "visitor", "Visitor"
+        ALLOCATION = "allocation", "Room Allocation"
+
+    class Scope(models.TextChoices):
+        ALL = "all", "Everyone"
+        STAFF = "staff", "Admins and Wardens"
+
+    event_type = models.CharField(max_length=20, choices=EventType.choices)
+    scope = models.CharField(max_length=10, choices=Scope.choices, default=Scope.STAFF)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="activity_events")
+    user_name = models.CharField(max_length=300, blank=True)
+    description = models.CharField(max_length=300)
+    object_id = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="activity_time_idx"),
+            models.Index(fields=["scope", "-created_at", "-id"], name="activity_scope_time_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="activity_user_time_idx"),
+        ]
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="revoked_tokens")
+    token_type = models.CharField(max_length=20)
+    expires_at = models.DateTimeField(db_index=True, help_text="Row can be purged once the token would have expired anyway")
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    task = models.CharField(max_length=100, db_index=True)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="Last heartbeat of the worker running it")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs")
+    schedule = models.CharField(max_length=100, blank=True, help_text="Periodic schedule that enqueued it")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # The dequeue scan: due jobs in priority order
+            models.Index(fields=["status", "-priority", "run_at"], name="core_job_dequeue_idx"),
+        ]
+
+
+class JobSchedule(models.Model):
+    """
+    When each periodic job in JOB_SCHEDULES is next due; shared by all workers
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    next_run_at = models.DateTimeField()
+    last_run_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,218 @@
+"""
+Bulk student import from CSV or JSON.
+
+Rows are validated one by one and problems are reported per row instead of
+failing the whole file; usernames are checked against the database with a
+single query for the batch. Supplied passwords are hashed in parallel across
+a process pool, since one PBKDF2 hash costs tens of milliseconds of CPU.
+Rows without a password get an unusable one and a one-time activation token
+the student exchanges for a password of their choice. Valid rows are then
+inserted with bulk_create.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .serializers import StudentImportRowSerializer
+
+User = get_user_model()
+
+MAX_IMPORT_ROWS = 20000
+BATCH_SIZE = 500
+# Below this many passwords a pool costs more to start than it saves
+PARALLEL_HASH_THRESHOLD = 16
+
+
+class ActivationTokenGenerator(PasswordResetTokenGenerator):
+    """
+    Tokens stop working once a password is set, so each one is single use.
+    Valid for PASSWORD_RESET_TIMEOUT.
+    """
+    key_salt = 'core.provisioning.ActivationTokenGenerator'
+
+
+activation_token_generator = ActivationTokenGenerator()
+
+
+def parse_rows(content, filename=''):
+    """
+    List of row dicts from CSV or JSON text. JSON may be a list of objects or
+    {"students": [...]}.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if filename.lower().endswith('.json') or content.lstrip()[:1] in ('[', '{'):
+        data = json.loads(content)
+        rows = data.get('students') if isinstance(data, dict) else data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('JSON must be a list of student objects')
+    else:
+        rows = list(csv.DictReader(io.StringIO(content)))
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f'At most {MAX_IMPORT_ROWS} rows can be imported at once')
+    return rows
+
+
+def _clean_row(row):
+    # Blank CSV cells mean "not given"
+    return {
+        str(key).strip(): value.strip() if isinstance(value, str) else value
+        for key, value in row.items()
+        if key and value not in ('', None)
+    }
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    make_password for each password, spread across processes for large batches
+    """
+    workers = workers or settings.BULK_IMPORT_HASH_WORKERS or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    # Spawned, not forked: a fork from a threaded server copies other threads'
+    # held locks (logging, database connections) into a child that can
+    # deadlock. The fresh interpreter only needs settings and apps loaded.
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+    )
+    with pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def _insert(users, errors, row_numbers):
+    """
+    bulk_create in batches; a batch that hits a unique constraint (a username
+    taken since validation) is retried row by row to find the culprit
+    """
+    created = []
+    for start in range(0, len(users), BATCH_SIZE):
+        batch = users[start:start + BATCH_SIZE]
+        try:
+            with transaction.atomic():
+                created.extend(User.objects.bulk_create(batch))
+        except IntegrityError:
+            for user in batch:
+                try:
+                    with transaction.atomic():
+                        created.extend(User.objects.bulk_create([user]))
+                except IntegrityError:
+                    errors.append({'row': row_numbers[user.username], 'errors': {'username': ['A user with that username already exists.']}})
+
+    missing = [user for user in created if user.pk is None]
+    if missing:
+        # Backends that cannot return primary keys from a bulk insert
+        pks = dict(User.objects.filter(username__in=[user.username for user in missing]).values_list('username', 'pk'))
+        for user in missing:
+            user.pk = pks.get(user.username)
+    return created
+
+
+def import_students(rows, dry_run=False, workers=None):
+    """
+    Create a student for every valid row. Returns a summary with per-row
+    errors (1-based row numbers) and activation tokens for rows that came
+    without a password.
+    """
+    errors = []
+    valid = []
+    row_numbers = {}
+    for number, row in enumerate(rows, start=1):
+        serializer = StudentImportRowSerializer(data=_clean_row(row))
+        if not serializer.is_valid():
+            errors.append({'row': number, 'errors': serializer.errors})
+            continue
+        data = dict(serializer.validated_data)
+        username = data['username']
+        if username in row_numbers:
+            errors.append({'row': number, 'errors': {'username': [f'Duplicate of row {row_numbers[username]}.']}})
+            continue
+        password = data.pop('password', '')
+        if password:
+            try:
+                validate_password(password, user=User(**data))
+            except ValidationError as e:
+                errors.append({'row': number, 'errors': {'password': list(e.messages)}})
+                continue
+        row_numbers[username] = number
+        valid.append((number, data, password))
+
+    existing = set(User.objects.filter(username__in=list(row_numbers)).values_list('username', flat=True))
+    if existing:
+        for number, data, _ in valid:
+            if data['username'] in existing:
+                errors.append({'row': number, 'errors': {'username': ['A user with that username already exists.']}})
+        valid = [entry for entry in valid if entry[1]['username'] not in existing]
+
+    summary = {
+        'rows': len(rows),
+        'created': 0,
+        'failed': 0,
+        'with_password': sum(1 for _, _, password in valid if password),
+        'activation_required': sum(1 for _, _, password in valid if not password),
+        'dry_run': dry_run,
+        'errors': errors,
+        'activations': [],
+    }
+    if dry_run or not valid:
+        summary['created'] = len(valid)
+        summary['failed'] = len(errors)
+        summary['errors'] = sorted(errors, key=lambda error: error['row'])
+        return summary
+
+    hashes = iter(hash_passwords([password for _, _, password in valid if password], workers))
+    users = []
+    for _, data, password in valid:
+        # An unusable password is random per user, which also keeps activation tokens distinct
+        users.append(User(
+            **data,
+            role=User.Roles.STUDENT,
+            password=next(hashes) if password else make_password(None),
+        ))
+
+    created = _insert(users, errors, row_numbers)
+    created_ids = {id(user) for user in created}
+    for user, (_, _, password) in zip(users, valid):
+        if id(user) in created_ids and not password:
+            summary['activations'].append({
+                'username': user.username,
+                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+                'token': activation_token_generator.make_token(user),
+            })
+
+    summary['created'] = len(created)
+    summary['failed'] = len(errors)
+    summary['activation_required'] = len(summary['activations'])
+    summary['errors'] = sorted(errors, key=lambda error: error['row'])
+    return summary
+
+
+def activate_account(uid, token, password):
+    """
+    Set the first password of an imported student. Raises ValueError for an
+    unknown user or a used/expired token, ValidationError for a weak password.
+    """
+    try:
+        user = User.objects.get(pk=force_str(urlsafe_base64_decode(uid)))
+    except (User.DoesNotExist, ValueError, TypeError, OverflowError):
+        raise ValueError('Invalid activation link')
+    if user.has_usable_password() or not activation_token_generator.check_token(user, token):
+        raise ValueError('Activation link is invalid or has already been used')
+    validate_password(password, user=user)
+    user.set_password(password)
+    user.save(update_fields=['password'])
+    return user
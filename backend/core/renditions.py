@@ -0,0 +1,166 @@
+"""
+Fixed-size thumbnails for profile pictures and room images.
+
+Renditions are stored next to the original as
+``<dir>/renditions/<stem>_<size>.<fmt>``. They are generated in a small
+background pool when an image is uploaded, and lazily by RenditionView the
+first time a missing one is requested (older uploads, a lost file). A bounded
+per-worker LRU remembers which renditions are known to exist, so repeat hits
+skip the storage lookup.
+"""
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+from .models import Room, User
+
+logger = logging.getLogger(__name__)
+
+# name -> (max width, max height)
+SIZES = {
+    'thumb': (128, 128),
+    'card': (480, 360),
+}
+
+FORMAT, EXTENSION, CONTENT_TYPE = (
+    ('WEBP', 'webp', 'image/webp') if features.check('webp') else ('JPEG', 'jpg', 'image/jpeg')
+)
+QUALITY = 80
+
+_KNOWN_CACHE_SIZE = 4096
+_known = OrderedDict()
+_known_lock = threading.Lock()
+_locks = {}
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+
+
+def rendition_name(original, size):
+    directory, filename = os.path.split(original)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/renditions/{stem}_{size}.{EXTENSION}'.lstrip('/')
+
+
+def _remember(name):
+    with _known_lock:
+        _known[name] = True
+        _known.move_to_end(name)
+        while len(_known) > _KNOWN_CACHE_SIZE:
+            _known.popitem(last=False)
+
+
+def _is_known(name):
+    with _known_lock:
+        if name in _known:
+            _known.move_to_end(name)
+            return True
+    return False
+
+
+def is_rendition_source(original):
+    """
+    Only profile pictures and room images get renditions, never documents
+    """
+    return (
+        User.objects.filter(profile_picture=original).exists()
+        or Room.objects.filter(image=original).exists()
+    )
+
+
+def render(original, size):
+    """
+    Write one rendition of ``original`` to storage and return its name
+    """
+    name = rendition_name(original, size)
+    with default_storage.open(original, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.thumbnail(SIZES[size], Image.LANCZOS)
+        if FORMAT == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, FORMAT, quality=QUALITY)
+
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+    _remember(name)
+    return name
+
+
+def ensure_rendition(original, size):
+    """
+    Name of the rendition, generating it first if it does not exist yet.
+    Concurrent requests for the same rendition render it once.
+    """
+    name = rendition_name(original, size)
+    if _is_known(name):
+        return name
+    with _known_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    try:
+        with lock:
+            if default_storage.exists(name):
+                _remember(name)
+                return name
+            return render(original, size)
+    finally:
+        with _known_lock:
+            _locks.pop(name, None)
+
+
+def resolve_rendition(original, size):
+    """
+    Rendition to serve for a request, rendering it if needed. Raises
+    LookupError for unknown sizes and originals that are not avatars or
+    room images.
+    """
+    if size not in SIZES:
+        raise LookupError(size)
+    name = rendition_name(original, size)
+    if _is_known(name):
+        return name
+    if not default_storage.exists(name) and not is_rendition_source(original):
+        raise LookupError(original)
+    return ensure_rendition(original, size)
+
+
+def _render_all(original):
+    for size in SIZES:
+        try:
+            ensure_rendition(original, size)
+        except Exception as e:
+            logger.error(f"Failed to render {size} rendition of {original}: {e}")
+
+
+def schedule_renditions(field_file):
+    """
+    Render every size of an uploaded image in the background once the
+    surrounding transaction commits
+    """
+    if not field_file:
+        return
+    original = field_file.name
+    transaction.on_commit(lambda: _pool.submit(_render_all, original))
+
+
+def rendition_urls(field_file, request=None):
+    """
+    {size: url} for every rendition of an image field, or None without an image
+    """
+    if not field_file:
+        return None
+    urls = {}
+    for size in SIZES:
+        url = reverse('rendition', args=[size, field_file.name])
+        urls[size] = request.build_absolute_uri(url) if request else url
+    return urls
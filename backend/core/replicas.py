@@ -0,0 +1,160 @@
+"""
+Read-replica routing.
+
+DB_REPLICA_URLS adds replica databases. During GET/HEAD/OPTIONS requests,
+reads go to a replica picked once per request. Everything else stays on the
+primary: writes, reads in requests with other methods, reads inside a
+transaction, reads before DRF has authenticated the request (and in views
+that are not DRF views), and every read after the request has written.
+After an authenticated user's request writes, a cache key pins that user's
+reads to the primary for DB_REPLICA_PIN_SECONDS, until replication has
+caught up. The pin is kept server-side because the SPA is cross-origin and
+does not send cookies; with several workers it needs a shared cache
+(REDIS_URL).
+
+A replica that fails to connect is skipped for DB_REPLICA_RETRY_SECONDS and
+the request falls back to another replica or the primary. Code running
+outside a request (management commands, workers) always uses the primary.
+"""
+import logging
+import random
+import threading
+import time
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = Local()
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+def _available(alias):
+    until = _down_until.get(alias)
+    if until is not None:
+        if time.monotonic() < until:
+            return False
+        with _down_lock:
+            _down_until.pop(alias, None)
+    try:
+        connections[alias].ensure_connection()
+    except OperationalError as e:
+        logger.warning(f"Replica {alias} unavailable, reading from elsewhere: {e}")
+        with _down_lock:
+            _down_until[alias] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+def _pin_key(user_id):
+    return f'db:primary-pin:{user_id}'
+
+
+def _authenticated_user_id(request):
+    """
+    The id of the user DRF authenticated, None for anonymous requests, or
+    False while that is not known yet. DRF replaces the lazy user
+    AuthenticationMiddleware installs when it authenticates.
+    """
+    user = request.__dict__.get('user') if request is not None else None
+    if user is None or isinstance(user, SimpleLazyObject):
+        return False
+    return user.pk if user.is_authenticated else None
+
+
+def _pinned():
+    pinned = getattr(_state, 'pinned', None)
+    if pinned is None:
+        user_id = _authenticated_user_id(getattr(_state, 'request', None))
+        if user_id is False:
+            return True
+        pinned = _state.pinned = user_id is not None and cache.get(_pin_key(user_id)) is not None
+    return pinned
+
+
+def pick_replica():
+    """
+    A reachable replica alias, or None when every replica is down
+    """
+    candidates = list(settings.DATABASE_REPLICAS)
+    random.shuffle(candidates)
+    for alias in candidates:
+        if _available(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'use_replica', False) or getattr(_state, 'wrote', False):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or _pinned():
+            return DEFAULT_DB_ALIAS
+        replica = getattr(_state, 'replica', None)
+        if replica is None:
+            replica = _state.replica = pick_replica() or DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Reads for the rest of the request must see this write
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._begin(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self._end(request)
+
+    async def __acall__(self, request):
+        self._begin(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self._end(request)
+
+    def _begin(self, request):
+        _state.use_replica = bool(settings.DATABASE_REPLICAS) and request.method in SAFE_METHODS
+        _state.wrote = False
+        _state.replica = None
+        # Whether the user is pinned is looked up on the first replica read,
+        # once DRF has authenticated the request
+        _state.request = request
+        _state.pinned = None
+
+    def _end(self, request):
+        wrote = getattr(_state, 'wrote', False)
+        _state.use_replica, _state.wrote, _state.replica = False, False, None
+        _state.request, _state.pinned = None, None
+        if wrote and settings.DATABASE_REPLICAS:
+            user_id = _authenticated_user_id(request)
+            if user_id:
+                cache.set(_pin_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS)
@@ -0,0 +1,490 @@
+"""
+Restore backups written by core.backup.
+
+The database must be migrated to the schema the backup was taken with.
+Every table's columns must match the manifest exactly. A restore runs in
+three phases:
+1. Empty every table and drop the plain (non-unique) indexes. On
+   PostgreSQL, also drop the foreign keys.
+2. Load the full base backup. Tables are grouped by the foreign-key graph,
+   parents before children. Tables in the same group load in parallel on
+   RESTORE_WORKERS threads. PostgreSQL uses COPY; other backends use
+   multi-row INSERTs. Each chunk of BACKUP_CHUNK_SIZE rows is committed
+   with foreign-key checks off, as loaddata does.
+3. Recreate the indexes and foreign keys and check every foreign key, then
+   apply each incremental backup in its own transaction.
+
+Progress is saved to a state file next to the manifest after every
+committed step, so an interrupted restore resumes where it stopped when
+run again. Rows are inserted raw, so auto_now timestamps keep their
+backed-up values.
+"""
+import datetime
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils.duration import duration_iso_string
+
+from .backup import (
+    BackupError, backup_chain, backup_models, columns, dependency_levels, read_rows, verify_backup,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _Checkpoint:
+    """
+    Restore progress, written after every committed step. A state file left
+    by a restore of another backup or database is ignored.
+    """
+    def __init__(self, path, key):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = None
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('key') == key:
+                self.state = state
+        self.resumed = self.state is not None
+        if self.state is None:
+            self.state = {'key': key, 'prepared': False, 'ddl': None, 'tables': {}, 'loaded': False, 'incrementals': []}
+
+    def save(self):
+        with self.lock:
+            self._write()
+
+    def update_table(self, label, progress):
+        """
+        Record a table's progress. Parallel loads call this, so the entry is
+        changed under the same lock that serializes the state; json.dump()
+        walking a dict another thread adds to fails.
+        """
+        with self.lock:
+            self.state['tables'][label] = progress
+            self._write()
+
+    def _write(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def state_path(path, using=DEFAULT_DB_ALIAS):
+    return os.path.join(path, f'.restore-{using}.json')
+
+
+def _converter(model, fields):
+    """
+    Function turning a JSON row back into Python values
+    """
+    by_attname = {field.attname: field for field in model._meta.concrete_fields}
+    # JSONField values are already decoded; everything else goes through to_python
+    converters = [
+        None if by_attname[name].get_internal_type() == 'JSONField' else by_attname[name].to_python
+        for name in fields
+    ]
+
+    def convert(row):
+        return [
+            value if value is None or to_python is None else to_python(value)
+            for value, to_python in zip(row, converters)
+        ]
+    return convert
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, rows, using):
+    """
+    Insert converted rows with one prepared INSERT run by executemany.
+    Values are prepared like a raw save: no pre_save, so auto_now fields
+    are not overwritten.
+    """
+    connection = connections[using]
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    params = [
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, values)]
+        for values in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _copy_value(value, is_json):
+    if value is None:
+        return '\\N'
+    if is_json:
+        text = json.dumps(value)
+    elif isinstance(value, bool):
+        text = 't' if value else 'f'
+    elif isinstance(value, (bytes, memoryview)):
+        text = '\\x' + bytes(value).hex()
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        text = value.isoformat()
+    elif isinstance(value, datetime.timedelta):
+        text = duration_iso_string(value)
+    else:
+        text = str(value)
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy(model, rows, using):
+    """
+    Load converted rows with PostgreSQL COPY (text format)
+    """
+    connection = connections[using]
+    fields = model._meta.concrete_fields
+    is_json = [field.get_internal_type() == 'JSONField' for field in fields]
+    buffer = io.StringIO()
+    for values in rows:
+        buffer.write('\t'.join(_copy_value(value, json_) for value, json_ in zip(values, is_json)))
+        buffer.write('\n')
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) FROM STDIN",
+            buffer,
+        )
+
+
+def _can_copy(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    # psycopg 3 has a different COPY API; it falls back to INSERTs
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return not is_psycopg3
+
+
+def check_compatible(manifest, models):
+    """
+    Raise BackupError unless the backup's tables and columns match the
+    current schema
+    """
+    current = {model._meta.label: columns(model) for model in models}
+    missing = sorted(set(current) - set(manifest['models']))
+    extra = sorted(set(manifest['models']) - set(current))
+    if missing or extra:
+        raise BackupError(
+            f"Backup {manifest['id']} does not match the current schema "
+            f"(not in backup: {', '.join(missing) or '-'}; unknown: {', '.join(extra) or '-'})"
+        )
+    for label, entry in manifest['models'].items():
+        if entry['columns'] != current[label]:
+            raise BackupError(f"Backup {manifest['id']}: columns of {label} do not match the current schema")
+
+
+def _deferrable_ddl(connection, tables):
+    """
+    Statements to drop and later recreate what slows a bulk load down: plain
+    indexes everywhere, and foreign keys on PostgreSQL (elsewhere their
+    checks are switched off instead). Unique indexes stay; they back
+    constraints.
+    """
+    quote = connection.ops.quote_name
+    ddl = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                """
+                SELECT i.relname, pg_get_indexdef(ix.indexrelid)
+                FROM pg_index ix
+                JOIN pg_class i ON i.oid = ix.indexrelid
+                JOIN pg_class t ON t.oid = ix.indrelid
+                WHERE t.relname = ANY(%s) AND pg_table_is_visible(t.oid)
+                  AND NOT ix.indisunique AND NOT ix.indisprimary
+                """,
+                [tables],
+            )
+            indexes = cursor.fetchall()
+            cursor.execute(
+                """
+                SELECT t.relname, c.conname, pg_get_constraintdef(c.oid)
+                FROM pg_constraint c
+                JOIN pg_class t ON t.oid = c.conrelid
+                WHERE c.contype = 'f' AND t.relname = ANY(%s) AND pg_table_is_visible(t.oid)
+                """,
+                [tables],
+            )
+            for table, name, definition in cursor.fetchall():
+                ddl.append({
+                    'drop': f'ALTER TABLE {quote(table)} DROP CONSTRAINT IF EXISTS {quote(name)}',
+                    'create': f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}',
+                    'constraint': [table, name],
+                })
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                "AND sql NOT LIKE 'CREATE UNIQUE%%' AND tbl_name IN ({})".format(', '.join(['%s'] * len(tables))),
+                tables,
+            )
+            indexes = cursor.fetchall()
+        else:
+            indexes = []
+    for name, definition in indexes:
+        ddl.append({
+            'drop': f'DROP INDEX IF EXISTS {quote(name)}',
+            'create': definition.replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS ', 1),
+            'constraint': None,
+        })
+    return ddl
+
+
+def _constraint_exists(cursor, table, name):
+    cursor.execute(
+        'SELECT 1 FROM pg_constraint c JOIN pg_class t ON t.oid = c.conrelid '
+        'WHERE t.relname = %s AND c.conname = %s AND pg_table_is_visible(t.oid)',
+        [table, name],
+    )
+    return cursor.fetchone() is not None
+
+
+def _prepare(models, checkpoint, using):
+    """
+    Empty every table and drop the deferrable indexes and constraints
+    """
+    connection = connections[using]
+    tables = [model._meta.db_table for model in models]
+    if checkpoint.state['ddl'] is None:
+        # Recorded before anything is dropped, so a resumed restore can rebuild it
+        checkpoint.state['ddl'] = _deferrable_ddl(connection, tables)
+        checkpoint.save()
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            for statement in checkpoint.state['ddl']:
+                cursor.execute(statement['drop'])
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, allow_cascade=True))
+    checkpoint.state['prepared'] = True
+    checkpoint.save()
+
+
+def _load_table(model, manifest, checkpoint, using, chunk_size, copy):
+    """
+    Load one table of the base backup in committed chunks, skipping the rows
+    a previous attempt already committed
+    """
+    label = model._meta.label
+    entry = manifest['models'][label]
+    progress = checkpoint.state['tables'].get(label, {'rows': 0, 'last_pk': None, 'done': False})
+    if progress['done']:
+        return 0
+    connection = connections[using]
+    pk = model._meta.pk
+    pk_index = entry['columns'].index(pk.attname)
+    convert = _converter(model, entry['columns'])
+    queryset = model._base_manager.using(using)
+    loaded = 0
+    try:
+        with connection.constraint_checks_disabled():
+            # Rows committed after the last checkpoint was written
+            if progress['last_pk'] is None:
+                queryset.all()._raw_delete(using)
+            else:
+                queryset.filter(pk__gt=pk.to_python(progress['last_pk']))._raw_delete(using)
+
+            rows = read_rows(os.path.join(manifest['path'], entry['file']))
+            for _ in range(progress['rows']):
+                next(rows)
+            for chunk in _batches(rows, chunk_size):
+                values = [convert(row) for row in chunk]
+                with transaction.atomic(using=using):
+                    (_copy if copy else _insert)(model, values, using)
+                loaded += len(chunk)
+                progress = {'rows': progress['rows'] + len(chunk), 'last_pk': chunk[-1][pk_index], 'done': False}
+                checkpoint.update_table(label, progress)
+        checkpoint.update_table(label, dict(progress, done=True))
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+    return loaded
+
+
+def _finish_load(models, checkpoint, using):
+    """
+    Recreate the dropped indexes and constraints, then check every foreign key
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        while checkpoint.state['ddl']:
+            statement = checkpoint.state['ddl'][0]
+            if not (statement['constraint'] and _constraint_exists(cursor, *statement['constraint'])):
+                cursor.execute(statement['create'])
+            checkpoint.state['ddl'].pop(0)
+            checkpoint.save()
+    connection.check_constraints(table_names=[model._meta.db_table for model in models])
+    checkpoint.state['loaded'] = True
+    checkpoint.save()
+
+
+def _apply_changes(model, manifest, entry, using, chunk_size):
+    """
+    Insert the rows of an incremental backup's file, replacing rows with
+    the same keys
+    """
+    pk_index = entry['columns'].index(model._meta.pk.attname)
+    convert = _converter(model, entry['columns'])
+    rows = read_rows(os.path.join(manifest['path'], entry['file']))
+    loaded = 0
+    for chunk in _batches(rows, chunk_size):
+        if entry['mode'] == 'changes':
+            model._base_manager.using(using).filter(pk__in=[row[pk_index] for row in chunk])._raw_delete(using)
+        _insert(model, [convert(row) for row in chunk], using)
+        loaded += len(chunk)
+    return loaded
+
+
+def _apply_deletions(model, manifest, entry, using, chunk_size):
+    """
+    Delete rows whose keys are not in the backup's key list. Both sides are
+    in key order, so this is a merge join that holds one chunk at a time.
+    """
+    pk = model._meta.pk
+    kept = (pk.to_python(value) for value in read_rows(os.path.join(manifest['path'], entry['pks_file'])))
+    next_kept = next(kept, None)
+    queryset = model._base_manager.using(using).order_by('pk')
+    doomed = []
+    deleted = 0
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        keys = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not keys:
+            break
+        for key in keys:
+            while next_kept is not None and next_kept < key:
+                next_kept = next(kept, None)
+            if key != next_kept:
+                doomed.append(key)
+        last = keys[-1]
+        if len(doomed) >= chunk_size:
+            deleted += model._base_manager.using(using).filter(pk__in=doomed)._raw_delete(using)
+            doomed = []
+    if doomed:
+        deleted += model._base_manager.using(using).filter(pk__in=doomed)._raw_delete(using)
+    return deleted
+
+
+def _apply_incremental(manifest, models, using, chunk_size):
+    """
+    Apply one incremental backup in a single transaction; returns
+    (rows, deleted)
+    """
+    rows = deleted = 0
+    with transaction.atomic(using=using):
+        for model in models:
+            entry = manifest['models'][model._meta.label]
+            if entry['mode'] == 'changes':
+                rows += _apply_changes(model, manifest, entry, using, chunk_size)
+                deleted += _apply_deletions(model, manifest, entry, using, chunk_size)
+            else:
+                model._base_manager.using(using).all()._raw_delete(using)
+                rows += _apply_changes(model, manifest, entry, using, chunk_size)
+        connections[using].check_constraints(table_names=[model._meta.db_table for model in models])
+    return rows, deleted
+
+
+def restore_backup(path, using=DEFAULT_DB_ALIAS, chunk_size=None, workers=None, verify=True, restart=False,
+                   progress=None):
+    """
+    Replace the database contents with a backup (and, for an incremental
+    backup, the chain it builds on), resuming an interrupted restore of the
+    same backup unless ``restart``. ``progress(label, rows)`` is called as
+    each table of the base backup finishes. Returns a summary.
+    """
+    started = time.perf_counter()
+    chunk_size = chunk_size or settings.BACKUP_CHUNK_SIZE
+    workers = workers or settings.RESTORE_WORKERS
+    chain = backup_chain(path)
+    models = backup_models()
+    for manifest in chain:
+        if verify:
+            verify_backup(manifest)
+        check_compatible(manifest, models)
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        # SQLite has a single writer; more threads would only wait on its lock
+        workers = 1
+    key = {'backup': chain[-1]['id'], 'vendor': connection.vendor, 'database': str(connection.settings_dict['NAME'])}
+    checkpoint = _Checkpoint(state_path(chain[-1]['path'], using), key)
+    if restart and checkpoint.resumed:
+        checkpoint.discard()
+        checkpoint = _Checkpoint(state_path(chain[-1]['path'], using), key)
+
+    summary = {
+        'backup': chain[-1]['id'], 'chain': [manifest['id'] for manifest in chain], 'resumed': checkpoint.resumed,
+        'workers': workers, 'rows': 0, 'deleted': 0,
+    }
+    base = chain[0]
+    if not checkpoint.state['loaded']:
+        if not checkpoint.state['prepared']:
+            _prepare(models, checkpoint, using)
+        copy = _can_copy(connection)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for level in dependency_levels(models):
+                if workers == 1:
+                    loads = [(model, _load_table(model, base, checkpoint, using, chunk_size, copy)) for model in level]
+                else:
+                    futures = [
+                        (model, executor.submit(_load_table, model, base, checkpoint, using, chunk_size, copy))
+                        for model in level
+                    ]
+                    loads = [(model, future.result()) for model, future in futures]
+                for model, loaded in loads:
+                    summary['rows'] += loaded
+                    if progress:
+                        progress(model._meta.label, loaded)
+        _finish_load(models, checkpoint, using)
+
+    for manifest in chain[1:]:
+        if manifest['id'] in checkpoint.state['incrementals']:
+            continue
+        rows, deleted = _apply_incremental(manifest, models, using, chunk_size)
+        summary['rows'] += rows
+        summary['deleted'] += deleted
+        checkpoint.state['incrementals'].append(manifest['id'])
+        checkpoint.save()
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+        if connection.vendor in ('postgresql', 'sqlite'):
+            # Planner statistics are stale after a bulk load
+            cursor.execute('ANALYZE')
+    checkpoint.discard()
+
+    ContentType.objects.clear_cache()
+    summary['models'] = len(models)
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    logger.info(f"Restored backup {summary['backup']}: {summary['rows']} rows in {summary['seconds']}s")
+    return summary
@@ -0,0 +1,167 @@
+"""
+Revoked JWTs (logout) without a database query per request.
+
+Revoked token IDs (JTIs) are stored in RevokedToken. Each worker keeps a
+bloom filter of every unexpired revoked JTI plus a small LRU of recent
+answers. Most tokens were never revoked, so the filter answers "no" from
+memory; a "maybe" is confirmed with one indexed query and the answer kept
+in the LRU. The filter picks up revocations made in other workers every
+TOKEN_REVOCATION_REFRESH_SECONDS and is rebuilt hourly so expired entries
+drop out.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+REBUILD_SECONDS = 3600
+# Re-read revocations slightly older than the last sync to cover late commits and clock skew
+SYNC_OVERLAP = timedelta(seconds=60)
+_RECENT_CACHE_SIZE = 1024
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit halves
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._recent = OrderedDict()
+        self._synced_at = None
+        self._next_refresh = 0.0
+        self._next_rebuild = 0.0
+
+    def _remember(self, jti, revoked):
+        self._recent[jti] = revoked
+        self._recent.move_to_end(jti)
+        while len(self._recent) > _RECENT_CACHE_SIZE:
+            self._recent.popitem(last=False)
+
+    def _rebuild(self):
+        now = timezone.now()
+        jtis = list(RevokedToken.objects.filter(expires_at__gt=now).values_list('jti', flat=True))
+        # Leave headroom so the false positive rate holds until the next rebuild
+        bloom = BloomFilter(
+            max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, 2 * len(jtis)),
+            settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+        )
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom, self._recent, self._synced_at = bloom, OrderedDict(), now
+        self._next_rebuild = time.monotonic() + REBUILD_SECONDS
+
+    def _sync(self):
+        now = timezone.now()
+        jtis = RevokedToken.objects.filter(revoked_at__gte=self._synced_at - SYNC_OVERLAP).values_list('jti', flat=True)
+        for jti in jtis:
+            self._bloom.add(jti)
+            if jti in self._recent:
+                self._remember(jti, True)
+        self._synced_at = now
+
+    def _refresh(self):
+        if self._bloom is not None and time.monotonic() < self._next_refresh:
+            return
+        # One thread refreshes; the others keep answering from the current filter
+        if not self._lock.acquire(blocking=self._bloom is None):
+            return
+        try:
+            if self._bloom is None or time.monotonic() >= self._next_rebuild:
+                self._rebuild()
+            elif time.monotonic() >= self._next_refresh:
+                try:
+                    self._sync()
+                except Exception as e:
+                    logger.error(f"Failed to refresh token revocations: {e}")
+            self._next_refresh = time.monotonic() + settings.TOKEN_REVOCATION_REFRESH_SECONDS
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, jti):
+        self._refresh()
+        revoked = self._recent.get(jti)
+        if revoked is not None:
+            return revoked
+        if jti not in self._bloom:
+            return False
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        with self._lock:
+            self._remember(jti, revoked)
+        return revoked
+
+    def add(self, jti):
+        """
+        Mark a JTI revoked in this worker straight away
+        """
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            self._remember(jti, True)
+
+    def clear(self):
+        with self._lock:
+            self._bloom, self._recent, self._synced_at = None, OrderedDict(), None
+
+
+revocation_list = RevocationList()
+
+
+def is_token_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    return bool(jti) and revocation_list.is_revoked(jti)
+
+
+def revoke_token(token, user=None):
+    """
+    Revoke a validated access or refresh token until it expires
+    """
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return
+    RevokedToken.objects.get_or_create(jti=jti, defaults={
+        'user': user,
+        'token_type': token.get(api_settings.TOKEN_TYPE_CLAIM, ''),
+        'expires_at': datetime_from_epoch(token['exp']),
+    })
+    transaction.on_commit(lambda: revocation_list.add(jti))
+
+
+def purge_expired_revocations():
+    """
+    Delete revocations of tokens that have expired anyway
+    """
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,83 @@
+"""
+Event RSVPs with a stored attendee counter.
+
+Event.attendees_count is only changed together with the attendee row in the
+same transaction. A join first claims a seat with a conditional UPDATE
+(count below capacity), which also row-locks the event, so concurrent joins
+can never push the count past the capacity.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Event
+
+Attendee = Event.attendees.through
+
+JOINED = 'joined'
+ALREADY_JOINED = 'already_joined'
+FULL = 'full'
+LEFT = 'left'
+NOT_JOINED = 'not_joined'
+NOT_FOUND = 'not_found'
+
+MAX_BULK_RSVP = 100
+
+
+class _AlreadyJoined(Exception):
+    pass
+
+
+def join_event(event_id, user_id):
+    """
+    Add the user to the event if a seat is free. Returns JOINED,
+    ALREADY_JOINED, FULL or NOT_FOUND.
+    """
+    has_seat = Q(capacity__isnull=True) | Q(attendees_count__lt=F('capacity'))
+    try:
+        with transaction.atomic():
+            claimed = Event.objects.filter(pk=event_id).filter(has_seat).update(
+                attendees_count=F('attendees_count') + 1, updated_at=timezone.now()
+            )
+            if not claimed:
+                if Attendee.objects.filter(event_id=event_id, user_id=user_id).exists():
+                    return ALREADY_JOINED
+                return FULL if Event.objects.filter(pk=event_id).exists() else NOT_FOUND
+            try:
+                with transaction.atomic():
+                    Attendee.objects.create(event_id=event_id, user_id=user_id)
+            except IntegrityError:
+                # Undo the claimed seat together with the outer transaction
+                raise _AlreadyJoined
+    except _AlreadyJoined:
+        return ALREADY_JOINED
+    return JOINED
+
+
+def leave_event(event_id, user_id):
+    """
+    Remove the user from the event. Returns LEFT or NOT_JOINED.
+    """
+    with transaction.atomic():
+        deleted, _ = Attendee.objects.filter(event_id=event_id, user_id=user_id).delete()
+        if not deleted:
+            return NOT_JOINED
+        Event.objects.filter(pk=event_id, attendees_count__gt=0).update(
+            attendees_count=F('attendees_count') - 1, updated_at=timezone.now()
+        )
+    return LEFT
+
+
+def bulk_rsvp(user_id, join=(), leave=()):
+    """
+    Apply several joins and leaves for one user; each event is its own
+    transaction so one full event does not undo the others. Returns
+    {event_id: outcome}.
+    """
+    results = {}
+    for event_id in dict.fromkeys(leave):
+        results[event_id] = leave_event(event_id, user_id)
+    for event_id in dict.fromkeys(join):
+        results[event_id] = join_event(event_id, user_id)
+    return results
+
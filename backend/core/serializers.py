@@ -1,16 +1,106 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import models
+from django.db.models import Count, Prefetch, Q
 from .models import (
     Room, Attendance, Complaint, ComplaintComment, Payment, Feedback, RoomAllocation, 
     Notice, NoticeRead, MaintenanceRequest, AuditLog, EmailNotification, 
-    Document, Visitor, Event
+    Document, Visitor, Event, ActivityEvent, UploadSession, Job
 )
+from .billing import DEFAULT_DUE_DAY, parse_billing_period
+from .media import media_url
+from .renditions import rendition_urls
+from .rsvp import MAX_BULK_RSVP
+from .uploads import UploadError, claim_upload
 
 
 User = get_user_model()
 
 
+def requested_fields(request, param='fields'):
+    """
+    Names in a comma-separated query parameter of a read request, or None
+    when it is absent (meaning every field)
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get(param, '')
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    return names or None
+
+
+def field_requested(request, name):
+    fields = requested_fields(request)
+    return fields is None or name in fields
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=id,title returns only those fields; ?expand=user swaps a foreign
+    key listed in Meta.expandable_fields for a nested object. Only the
+    top-level serializer of a read reads the query string; nested ones take
+    fields=[...] instead. Dropped fields are never evaluated, so method
+    fields and properties behind them run no queries.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        self._only = fields
+        super().__init__(*args, **kwargs)
+
+    def _is_top_level(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self._only, None
+        if only is None and self._is_top_level():
+            request = self.context.get('request')
+            only = requested_fields(request)
+            expand = requested_fields(request, 'expand')
+        if only is not None:
+            fields = {name: field for name, field in fields.items() if name in only}
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expand or ():
+            if name in fields and name in expandable:
+                serializer_class, options = expandable[name]
+                fields[name] = serializer_class(read_only=True, **options)
+        return fields
+
+
+class ProtectedMediaMixin:
+    """
+    File fields that link to /api/media/, where access is checked
+    """
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        return media_url(value, self.context.get('request'))
+
+
+class ProtectedFileField(ProtectedMediaMixin, serializers.FileField):
+    pass
+
+
+class ProtectedImageField(ProtectedMediaMixin, serializers.ImageField):
+    pass
+
+
+# serializer_field_mapping for model serializers exposing stored files
+MEDIA_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.FileField: ProtectedFileField,
+    models.ImageField: ProtectedImageField,
+}
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
     password_confirm = serializers.CharField(write_only=True)
@@ -34,18 +124,57 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserSerializer(serializers.ModelSerializer):
+class StudentImportRowSerializer(serializers.ModelSerializer):
+    password = serializers.CharField(write_only=True, required=False, allow_blank=True)
+
+    class Meta:
+        model = User
+        fields = [
+            'username', 'email', 'password', 'first_name', 'last_name',
+            'phone_number', 'date_of_birth', 'address', 'emergency_contact'
+        ]
+        # Username uniqueness is checked for the whole import in one query
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+
+class StudentImportSerializer(serializers.Serializer):
+    file = serializers.FileField(required=False)
+    students = serializers.ListField(child=serializers.DictField(), required=False)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        if not attrs.get('file') and not attrs.get('students'):
+            raise serializers.ValidationError("Upload a CSV or JSON file, or pass a students list")
+        return attrs
+
+
+class AccountActivationSerializer(serializers.Serializer):
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+    password_confirm = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        if attrs['password'] != attrs['password_confirm']:
+            raise serializers.ValidationError("Passwords don't match")
+        return attrs
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = MEDIA_FIELD_MAPPING
+
     full_name = serializers.SerializerMethodField()
     current_room = serializers.SerializerMethodField()
     documents_count = serializers.SerializerMethodField()
     pending_visitors = serializers.SerializerMethodField()
+    profile_picture_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name', 'full_name',
             'role', 'phone_number', 'date_of_birth', 'address', 
-            'emergency_contact', 'profile_picture', 'is_active', 
+            'emergency_contact', 'profile_picture', 'profile_picture_thumbnails', 'is_active', 
             'email_verified', 'phone_verified', 'last_login_ip',
             'created_at', 'current_room', 'documents_count', 'pending_visitors'
         ]
@@ -55,7 +184,12 @@ class UserSerializer(serializers.ModelSerializer):
         return obj.get_full_name()
 
     def get_current_room(self, obj):
-        allocation = obj.allocations.filter(status='active').first()
+        # Use the prefetched active allocations when the view provides them
+        active_allocations = getattr(obj, 'active_allocations', None)
+        if active_allocations is not None:
+            allocation = active_allocations[0] if active_allocations else None
+        else:
+            allocation = obj.allocations.filter(status='active').select_related('room').first()
         if allocation:
             return {
                 'room_number': allocation.room.number,
@@ -65,28 +199,75 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
     def get_documents_count(self, obj):
+        if hasattr(obj, 'documents_total'):
+            return obj.documents_total
         return obj.documents.count()
 
     def get_pending_visitors(self, obj):
+        if hasattr(obj, 'pending_visitors_total'):
+            return obj.pending_visitors_total
         return obj.visitors.filter(status='pending').count()
 
-
-class RoomSerializer(serializers.ModelSerializer):
-    current_occupancy = serializers.ReadOnlyField()
-    is_available = serializers.ReadOnlyField()
+    def get_profile_picture_thumbnails(self, obj):
+        return rendition_urls(obj.profile_picture, self.context.get('request'))
+
+
+def annotate_user_stats(queryset, fields=None):
+    """
+    Precompute the per-user fields UserSerializer reads (current room,
+    document and pending visitor counts) so a list runs a fixed number of
+    queries. With ``fields`` (from ?fields=), only the ones requested.
+    """
+    if fields is None or 'documents_count' in fields:
+        queryset = queryset.annotate(documents_total=Count('documents', distinct=True))
+    if fields is None or 'pending_visitors' in fields:
+        queryset = queryset.annotate(
+            pending_visitors_total=Count('visitors', filter=Q(visitors__status='pending'), distinct=True),
+        )
+    if fields is None or 'current_room' in fields:
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                'allocations',
+                queryset=RoomAllocation.objects.filter(status='active').select_related('room').order_by('id'),
+                to_attr='active_allocations',
+            )
+        )
+    return queryset
+
+
+class RoomSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = MEDIA_FIELD_MAPPING
+
+    current_occupancy = serializers.SerializerMethodField()
+    is_available = serializers.SerializerMethodField()
     occupants = serializers.SerializerMethodField()
+    image_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = Room
         fields = [
             'id', 'number', 'capacity', 'floor', 'room_type', 'status',
-            'monthly_rent', 'amenities', 'description', 'image',
+            'monthly_rent', 'amenities', 'description', 'image', 'image_thumbnails',
             'current_occupancy', 'is_available', 'occupants',
             'created_at', 'updated_at'
         ]
 
+    def get_current_occupancy(self, obj):
+        if hasattr(obj, 'occupancy_total'):
+            return obj.occupancy_total
+        return obj.current_occupancy
+
+    def get_is_available(self, obj):
+        return self.get_current_occupancy(obj) < obj.capacity
+
+    def get_image_thumbnails(self, obj):
+        return rendition_urls(obj.image, self.context.get('request'))
+
     def get_occupants(self, obj):
-        active_allocations = obj.allocations.filter(status='active')
+        # Use the prefetched active allocations when the view provides them
+        active_allocations = getattr(obj, 'active_occupancies', None)
+        if active_allocations is None:
+            active_allocations = obj.allocations.filter(status='active').select_related('user')
         return [
             {
                 'id': allocation.user.id,
@@ -97,22 +278,29 @@ class RoomSerializer(serializers.ModelSerializer):
         ]
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+# Compact nested objects for ?expand=
+USER_SUMMARY = (UserSerializer, {'fields': ['id', 'username', 'full_name', 'email', 'role']})
+ROOM_SUMMARY = (RoomSerializer, {'fields': ['id', 'number', 'floor', 'room_type', 'status']})
+
+
+class AttendanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = Attendance
+        expandable_fields = {'user': USER_SUMMARY}
         fields = ['id', 'user', 'user_name', 'date', 'present', 'marked_at']
         read_only_fields = ['marked_at', 'user']
 
 
-class ComplaintSerializer(serializers.ModelSerializer):
+class ComplaintSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     room_number = serializers.CharField(source='room.number', read_only=True)
     comments = serializers.SerializerMethodField()
     
     class Meta:
         model = Complaint
+        expandable_fields = {'user': USER_SUMMARY, 'room': ROOM_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'room', 'room_number', 'title', 
             'description', 'status', 'created_at', 'updated_at', 'comments'
@@ -120,38 +308,57 @@ class ComplaintSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at', 'updated_at']
 
     def get_comments(self, obj):
-        return ComplaintCommentSerializer(obj.comments.all().order_by('-created_at'), many=True).data
+        comments = getattr(obj, 'ordered_comments', None)
+        if comments is None:
+            comments = obj.comments.all().select_related('user').order_by('-created_at')
+        return ComplaintCommentSerializer(comments, many=True).data
 
 
-class ComplaintCommentSerializer(serializers.ModelSerializer):
+class ComplaintCommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
 
     class Meta:
         model = ComplaintComment
+        expandable_fields = {'user': USER_SUMMARY}
         fields = ['id', 'user', 'user_name', 'message', 'created_at']
         read_only_fields = ['user', 'created_at']
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = Payment
+        expandable_fields = {'user': USER_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'amount', 'currency', 'payment_type',
-            'status', 'due_date', 'paid_date', 'description', 'created_at'
+            'status', 'due_date', 'paid_date', 'description', 'allocation',
+            'billing_period', 'created_at'
         ]
         read_only_fields = [
             'status', 'provider_order_id', 'provider_payment_id', 
-            'provider_signature', 'paid_date'
+            'provider_signature', 'paid_date', 'allocation', 'billing_period'
         ]
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class RentInvoiceRunSerializer(serializers.Serializer):
+    period = serializers.CharField()
+    due_day = serializers.IntegerField(required=False, default=DEFAULT_DUE_DAY, min_value=1, max_value=31)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+    def validate_period(self, value):
+        try:
+            return parse_billing_period(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class FeedbackSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = Feedback
+        expandable_fields = {'user': USER_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'rating', 'comments', 'category', 
             'is_anonymous', 'created_at'
@@ -159,13 +366,14 @@ class FeedbackSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
 
-class RoomAllocationSerializer(serializers.ModelSerializer):
+class RoomAllocationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     room_number = serializers.CharField(source='room.number', read_only=True)
     room_type = serializers.CharField(source='room.room_type', read_only=True)
     
     class Meta:
         model = RoomAllocation
+        expandable_fields = {'user': USER_SUMMARY, 'room': ROOM_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'room', 'room_number', 'room_type',
             'start_date', 'end_date', 'status', 'monthly_rent', 
@@ -173,12 +381,29 @@ class RoomAllocationSerializer(serializers.ModelSerializer):
         ]
 
 
-class NoticeSerializer(serializers.ModelSerializer):
+class AllocationPreferenceSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    room_type = serializers.ChoiceField(choices=Room.RoomType.choices, required=False, allow_null=True)
+    floor = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    max_rent = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+
+class BatchAllocationSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    students = serializers.ListField(child=serializers.IntegerField(), required=False)
+    preferences = AllocationPreferenceSerializer(many=True, required=False)
+    max_rent = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    security_deposit_months = serializers.IntegerField(required=False, default=0, min_value=0)
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+
+class NoticeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     is_read = serializers.SerializerMethodField()
     
     class Meta:
         model = Notice
+        expandable_fields = {'created_by': USER_SUMMARY}
         fields = [
             'id', 'title', 'content', 'priority', 'target_audience',
             'is_active', 'created_by', 'created_by_name', 'created_at', 'updated_at', 'is_read'
@@ -189,16 +414,19 @@ class NoticeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
+        if hasattr(obj, 'read_by_user'):
+            return obj.read_by_user
         return NoticeRead.objects.filter(notice=obj, user=request.user).exists()
 
 
-class MaintenanceRequestSerializer(serializers.ModelSerializer):
+class MaintenanceRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     room_number = serializers.CharField(source='room.number', read_only=True)
     assigned_to_name = serializers.CharField(source='assigned_to.get_full_name', read_only=True)
     
     class Meta:
         model = MaintenanceRequest
+        expandable_fields = {'user': USER_SUMMARY, 'room': ROOM_SUMMARY, 'assigned_to': USER_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'room', 'room_number', 'title',
             'description', 'priority', 'status', 'assigned_to', 'assigned_to_name',
@@ -207,11 +435,12 @@ class MaintenanceRequestSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at', 'updated_at']
 
 
-class AuditLogSerializer(serializers.ModelSerializer):
+class AuditLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = AuditLog
+        expandable_fields = {'user': USER_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'action', 'model_name', 'object_id',
             'description', 'ip_address', 'user_agent', 'created_at'
@@ -219,11 +448,12 @@ class AuditLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class EmailNotificationSerializer(serializers.ModelSerializer):
+class EmailNotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
     class Meta:
         model = EmailNotification
+        expandable_fields = {'user': USER_SUMMARY}
         fields = [
             'id', 'user', 'user_name', 'subject', 'message', 'status',
             'sent_at', 'created_at'
@@ -231,50 +461,139 @@ class EmailNotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['status', 'sent_at', 'created_at']
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = MEDIA_FIELD_MAPPING
+
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     verified_by_name = serializers.CharField(source='verified_by.get_full_name', read_only=True)
+    upload = serializers.UUIDField(write_only=True, required=False, help_text="ID of a completed chunked upload, instead of file")
     
     class Meta:
         model = Document
+        expandable_fields = {'user': USER_SUMMARY, 'verified_by': USER_SUMMARY}
         fields = [
-            'id', 'user', 'user_name', 'document_type', 'title', 'file',
+            'id', 'user', 'user_name', 'document_type', 'title', 'file', 'upload',
             'description', 'is_verified', 'verified_by', 'verified_by_name',
             'verified_at', 'created_at'
         ]
-        read_only_fields = ['is_verified', 'verified_by', 'verified_at', 'created_at']
+        read_only_fields = ['user', 'is_verified', 'verified_by', 'verified_at', 'created_at']
+        extra_kwargs = {'file': {'required': False}}
 
+    def validate(self, attrs):
+        if not self.instance and not attrs.get('file') and not attrs.get('upload'):
+            raise serializers.ValidationError({'file': ["Provide a file or a completed upload."]})
+        if attrs.get('file') and attrs.get('upload'):
+            raise serializers.ValidationError({'upload': ["Send either file or upload, not both."]})
+        return attrs
+
+    def _attach_upload(self, validated_data):
+        upload = validated_data.pop('upload', None)
+        if upload:
+            try:
+                validated_data['file'] = claim_upload(upload, self.context['request'].user)
+            except UploadError as e:
+                raise serializers.ValidationError({'upload': [str(e)]})
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._attach_upload(validated_data))
 
-class VisitorSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        return super().update(instance, self._attach_upload(validated_data))
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'content_type', 'size', 'received', 'sha256', 'status', 'created_at']
+        read_only_fields = ['received', 'sha256', 'status', 'created_at']
+
+
+class VisitorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.get_full_name', read_only=True)
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True)
     
     class Meta:
         model = Visitor
+        expandable_fields = {'student': USER_SUMMARY, 'approved_by': USER_SUMMARY}
         fields = [
             'id', 'student', 'student_name', 'visitor_name', 'visitor_phone',
             'visitor_id_proof', 'purpose', 'visit_date', 'visit_time',
             'expected_duration', 'status', 'approved_by', 'approved_by_name',
             'approved_at', 'actual_entry_time', 'actual_exit_time', 'created_at'
         ]
-        read_only_fields = ['approved_by', 'approved_at', 'actual_entry_time', 'actual_exit_time', 'created_at']
+        read_only_fields = ['student', 'status', 'approved_by', 'approved_at', 'actual_entry_time', 'actual_exit_time', 'created_at']
+
+    def validate(self, attrs):
+        # Read-only fields are silently dropped; say why the status did not change
+        if 'status' in self.initial_data:
+            raise serializers.ValidationError({'status': ['Use the approve or reject action to change the status.']})
+        return attrs
 
 
-class EventSerializer(serializers.ModelSerializer):
+class GateCheckSerializer(serializers.Serializer):
+    id_proof = serializers.CharField(required=False, allow_blank=True, max_length=50)
+    phone = serializers.CharField(required=False, allow_blank=True, max_length=20)
+    visitor = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        if not attrs.get('id_proof') and not attrs.get('phone'):
+            raise serializers.ValidationError("Provide the visitor's ID proof or phone number.")
+        return attrs
+
+
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organizer_name = serializers.CharField(source='organizer.get_full_name', read_only=True)
-    attendees_count = serializers.SerializerMethodField()
+    is_attending = serializers.SerializerMethodField()
     
     class Meta:
         model = Event
+        expandable_fields = {'organizer': USER_SUMMARY}
         fields = [
             'id', 'title', 'description', 'event_type', 'start_date', 'end_date',
-            'location', 'organizer', 'organizer_name', 'attendees', 'attendees_count',
-            'is_public', 'created_at', 'updated_at'
+            'location', 'organizer', 'organizer_name', 'attendees_count', 'capacity',
+            'is_attending', 'is_public', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['organizer', 'created_at', 'updated_at']
+        read_only_fields = ['organizer', 'attendees_count', 'created_at', 'updated_at']
+
+    def get_is_attending(self, obj):
+        if hasattr(obj, 'user_attending'):
+            return obj.user_attending
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return False
+        return obj.attendees.filter(id=request.user.id).exists()
+
+    def validate_capacity(self, value):
+        if value is not None and self.instance and value < self.instance.attendees_count:
+            raise serializers.ValidationError(
+                f"Capacity cannot be below the current {self.instance.attendees_count} attendees."
+            )
+        return value
+
+
+class EventAttendeeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    full_name = serializers.CharField(source='get_full_name', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'full_name']
 
-    def get_attendees_count(self, obj):
-        return obj.attendees.count()
+
+class BulkRSVPSerializer(serializers.Serializer):
+    join = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    leave = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+
+    def validate(self, attrs):
+        if not attrs['join'] and not attrs['leave']:
+            raise serializers.ValidationError("Provide event IDs to join or leave.")
+        if len(attrs['join']) + len(attrs['leave']) > MAX_BULK_RSVP:
+            raise serializers.ValidationError(f"At most {MAX_BULK_RSVP} events per request.")
+        if set(attrs['join']) & set(attrs['leave']):
+            raise serializers.ValidationError("An event cannot be both joined and left.")
+        return attrs
 
 
 class DashboardStatsSerializer(serializers.Serializer):
@@ -288,5 +607,41 @@ class DashboardStatsSerializer(serializers.Serializer):
     pending_visitors = serializers.IntegerField()
     monthly_revenue = serializers.DecimalField(max_digits=10, decimal_places=2)
     average_rating = serializers.DecimalField(max_digits=3, decimal_places=2)
+    recent_activities = serializers.ListField(child=serializers.DictField(), required=False)
+
+
+class ActivityEventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    type = serializers.CharField(source='event_type')
+    timestamp = serializers.DateTimeField(source='created_at')
+    user = serializers.CharField(source='user_name')
+
+    class Meta:
+        model = ActivityEvent
+        fields = ['id', 'type', 'description', 'timestamp', 'user', 'object_id']
 
 
+class JobSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    error = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'task', 'status', 'attempts', 'max_attempts', 'run_at',
+            'created_at', 'started_at', 'finished_at', 'result', 'error'
+        ]
+
+    def get_error(self, obj):
+        # The exception line, not the whole traceback
+        lines = obj.last_error.strip().splitlines()
+        return lines[-1] if lines else None
+
+
+class ReportRequestSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=['financial', 'occupancy', 'attendance'])
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError("end_date must not be before start_date")
+        return attrs
@@ -0,0 +1,23 @@
+"""
+Activity feed events for changes saved through the ORM (see core.activity).
+"""
+from django.db.models.signals import post_init, post_save
+
+from .activity import FOLLOWED, record_changes, remember_status
+
+
+def _loaded(sender, instance, **kwargs):
+    remember_status(instance)
+
+
+def _saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if not created and update_fields is not None and 'status' not in update_fields:
+        return
+    record_changes([instance], created)
+
+
+for model in FOLLOWED:
+    post_init.connect(_loaded, sender=model, dispatch_uid=f'activity-loaded-{model._meta.label}')
+    post_save.connect(_saved, sender=model, dispatch_uid=f'activity-saved-{model._meta.label}')
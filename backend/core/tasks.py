@@ -0,0 +1,66 @@
+"""
+Tasks run by ``manage.py run_jobs`` workers.
+
+Arguments and results are stored as JSON, so tasks take IDs and plain
+values rather than model instances. Raising makes the job retry.
+"""
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.db.models.query import QuerySet
+
+from . import utils
+from .idempotency import purge_expired_keys
+from .jobs import task
+from .revocation import purge_expired_revocations
+from .uploads import purge_stale_sessions
+
+User = get_user_model()
+
+
+@task('send_notification_email', max_attempts=3)
+def notify_user(user_id, subject, message):
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return {'sent': False, 'reason': 'user deleted'}
+    if not utils.send_notification_email(user, subject, message):
+        raise RuntimeError(f'Email to user {user_id} could not be sent')
+    return {'sent': True}
+
+
+@task('backup_database', max_attempts=2)
+def backup_database(incremental=False):
+    path = utils.backup_database(incremental=incremental)
+    if path is None:
+        raise RuntimeError('Backup failed, see the error log')
+    return {'file': path}
+
+
+@task('cleanup_old_data')
+def cleanup_old_data():
+    result = utils.cleanup_old_data()
+    if result is None:
+        raise RuntimeError('Cleanup failed, see the error log')
+    return result
+
+
+@task('generate_report')
+def generate_report(report_type, start_date, end_date):
+    data = utils.generate_report_data(date.fromisoformat(start_date), date.fromisoformat(end_date), report_type)
+    # Breakdowns are lazy .values() querysets
+    return {key: list(value) if isinstance(value, QuerySet) else value for key, value in data.items()}
+
+
+@task('purge_idempotency_keys')
+def purge_idempotency_keys():
+    return {'deleted': purge_expired_keys()}
+
+
+@task('purge_revoked_tokens')
+def purge_revoked_tokens():
+    return {'deleted': purge_expired_revocations()}
+
+
+@task('purge_upload_sessions')
+def purge_upload_sessions():
+    return {'removed': purge_stale_sessions()}
@@ -0,0 +1,791 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from unittest import mock
+
+from .allocation import (
+    AllocationConflict, AllocationError, allocate_pending_students, solve_room_assignment, transfer_allocation
+)
+from .billing import generate_rent_invoices, prorate_rent
+from .gate import GateError, check_in, check_out, pass_index
+from .idempotency import idempotent
+from .models import (
+    ActivityEvent, AuditLog, Complaint, ComplaintComment, Document, Event, IdempotencyKey, Payment, PaymentWebhookEvent, Room,
+    RoomAllocation, UploadSession, Visitor
+)
+from . import replicas
+from .replicas import ReplicaPinningMiddleware
+from .restore import _Checkpoint
+from .throttling import LocalBucketStore, LoginRateThrottle
+from .rsvp import ALREADY_JOINED, FULL, JOINED, join_event
+from .uploads import append_chunk
+from .webhooks import reconcile_batch, record_event
+
+User = get_user_model()
+
+
+def run_concurrently(calls):
+    """
+    Run each call in its own thread, all released at once. Returns their
+    results (or raised exceptions) in order.
+    """
+    barrier = threading.Barrier(len(calls))
+    results = [None] * len(calls)
+
+    def worker(index, call):
+        try:
+            barrier.wait()
+            results[index] = call()
+        except Exception as e:
+            results[index] = e
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+LIST_ENDPOINTS = [
+    '/api/users/',
+    '/api/rooms/',
+    '/api/complaints/',
+    '/api/advanced/users/',
+    '/api/documents/',
+    '/api/visitors/',
+    '/api/events/',
+    '/api/audit-logs/',
+    '/api/dashboard/advanced-stats/',
+]
+
+
+class ListQueryCountTests(APITestCase):
+    """
+    List endpoints prefetch what their serializers touch, so the number of
+    queries does not grow with the number of rows.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', role='admin', password='!')
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def add_rows(self, start, end):
+        now = timezone.now()
+        for i in range(start, end):
+            student = User.objects.create(username=f'student{i}', role='student', password='!')
+            room = Room.objects.create(number=f'R{i}', capacity=2, monthly_rent=Decimal('5000'))
+            RoomAllocation.objects.create(user=student, room=room, start_date=date.today(), monthly_rent=room.monthly_rent)
+            Document.objects.create(user=student, document_type='id_proof', title=f'ID {i}', file=f'documents/{i}.pdf', verified_by=self.admin)
+            Visitor.objects.create(
+                student=student, visitor_name=f'Guest {i}', visitor_phone='9999999999',
+                visitor_id_proof=f'ID{i}', purpose='Visit', visit_date=date.today(),
+                visit_time=dt_time(10, 0), expected_duration=2, approved_by=self.admin,
+            )
+            event = Event.objects.create(
+                title=f'Event {i}', description='', event_type='meeting', start_date=now,
+                end_date=now + timedelta(hours=1), location='Hall', organizer=self.admin,
+            )
+            join_event(event.id, student.id)
+            join_event(event.id, self.admin.id)
+            AuditLog.objects.create(user=student, action='create', model_name='Visitor', description='Created')
+            complaint = Complaint.objects.create(user=student, room=room, title=f'Complaint {i}', description='')
+            ComplaintComment.objects.create(complaint=complaint, user=self.admin, message='Looking into it')
+
+    def get(self, url):
+        # Responses cached by a previous request would hide the queries
+        cache.clear()
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_rows(0, 2)
+        counts = {}
+        for url in LIST_ENDPOINTS:
+            with CaptureQueriesContext(connection) as queries:
+                self.get(url)
+            counts[url] = len(queries)
+
+        self.add_rows(2, 12)
+        for url in LIST_ENDPOINTS:
+            with self.subTest(url=url), self.assertNumQueries(counts[url]):
+                self.get(url)
+
+
+class TransferRaceTests(TransactionTestCase):
+    """
+    Concurrent transfers on separate connections never overbook a room or
+    leave a student with two active allocations. On PostgreSQL the threads
+    race on the version compare-and-swap; SQLite serializes the writers, so
+    there they exercise the retries on lock errors instead.
+    """
+
+    def transfer(self, student, room):
+        def call():
+            try:
+                transfer_allocation(student, room.id)
+                return 'transferred'
+            except AllocationError:
+                return 'rejected'
+            except AllocationConflict:
+                return 'conflict'
+        return call
+
+    def test_racing_students_do_not_overbook_a_room(self):
+        room = Room.objects.create(number='R1', capacity=2, monthly_rent=Decimal('5000'))
+        students = [User.objects.create(username=f'student{i}', role='student', password='!') for i in range(8)]
+
+        results = run_concurrently([self.transfer(student, room) for student in students])
+
+        outcomes = Counter(results)
+        self.assertEqual(outcomes['transferred'] + outcomes['rejected'] + outcomes['conflict'], len(students), results)
+        active = RoomAllocation.objects.filter(room=room, status='active').count()
+        self.assertLessEqual(active, room.capacity)
+        self.assertEqual(active, outcomes['transferred'])
+        room.refresh_from_db()
+        self.assertEqual(room.status, 'occupied' if active == room.capacity else 'available')
+
+    def test_racing_transfers_of_one_student_leave_one_allocation(self):
+        rooms = [Room.objects.create(number=f'R{i}', capacity=4, monthly_rent=Decimal('5000')) for i in range(4)]
+        student = User.objects.create(username='student', role='student', password='!')
+
+        results = run_concurrently([self.transfer(student, room) for room in rooms])
+
+        outcomes = Counter(results)
+        self.assertEqual(outcomes['transferred'] + outcomes['rejected'] + outcomes['conflict'], len(rooms), results)
+        self.assertGreaterEqual(outcomes['transferred'], 1, results)
+        self.assertEqual(RoomAllocation.objects.filter(user=student, status='active').count(), 1)
+
+
+class BatchAllocationRaceTests(TransactionTestCase):
+    """
+    A transfer that commits while a batch allocation is solving must not
+    leave a room overbooked or a student with two active allocations.
+    """
+
+    def race(self, transfer):
+        """
+        Run allocate_pending_students and start ``transfer`` in another thread
+        once the batch has read the free beds. The batch gives the transfer a
+        moment to commit before it writes.
+        """
+        loaded, done = threading.Event(), threading.Event()
+        outcome = {}
+
+        def solve(*args, **kwargs):
+            loaded.set()
+            done.wait(1)
+            return solve_room_assignment(*args, **kwargs)
+
+        def run_transfer():
+            loaded.wait(5)
+            try:
+                transfer()
+                outcome['transfer'] = 'transferred'
+            except (AllocationError, AllocationConflict) as e:
+                outcome['transfer'] = e
+            finally:
+                done.set()
+                connection.close()
+
+        thread = threading.Thread(target=run_transfer)
+        thread.start()
+        try:
+            with mock.patch('core.allocation.solve_room_assignment', side_effect=solve):
+                outcome['batch'] = allocate_pending_students(start_date=date.today())
+        except AllocationConflict as e:
+            outcome['batch'] = e
+        finally:
+            loaded.set()
+            thread.join()
+        return outcome
+
+    def test_transfer_into_the_last_bed_during_a_batch(self):
+        room = Room.objects.create(number='R1', capacity=1, monthly_rent=Decimal('4000'))
+        other_room = Room.objects.create(number='R2', capacity=1, monthly_rent=Decimal('5000'))
+        User.objects.create(username='pending', role='student', password='!')
+        mover = User.objects.create(username='mover', role='student', password='!')
+        RoomAllocation.objects.create(user=mover, room=other_room, start_date=date.today() - timedelta(days=30), monthly_rent=other_room.monthly_rent)
+
+        outcome = self.race(lambda: transfer_allocation(mover, room.id))
+
+        self.assertLessEqual(RoomAllocation.objects.filter(room=room, status='active').count(), room.capacity, outcome)
+        self.assertEqual(RoomAllocation.objects.filter(user=mover, status='active').count(), 1)
+
+    def test_transfer_of_a_pending_student_during_a_batch(self):
+        Room.objects.create(number='R1', capacity=1, monthly_rent=Decimal('4000'))
+        room = Room.objects.create(number='R2', capacity=1, monthly_rent=Decimal('5000'))
+        student = User.objects.create(username='pending', role='student', password='!')
+
+        outcome = self.race(lambda: transfer_allocation(student, room.id))
+
+        self.assertEqual(RoomAllocation.objects.filter(user=student, status='active').count(), 1, outcome)
+
+
+class JoinRaceTests(TransactionTestCase):
+    """
+    Concurrent joins on separate connections never seat more attendees than
+    the event's capacity, and the stored counter matches the attendee rows.
+    """
+
+    def setUp(self):
+        self.organizer = User.objects.create(username='organizer', role='admin', password='!')
+        now = timezone.now()
+        self.event = Event.objects.create(
+            title='Talk', description='', event_type='meeting', start_date=now,
+            end_date=now + timedelta(hours=1), location='Hall', organizer=self.organizer, capacity=3,
+        )
+
+    def assertCounterMatches(self):
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attendees_count, self.event.attendees.count())
+        self.assertLessEqual(self.event.attendees_count, self.event.capacity)
+
+    def test_racing_joins_do_not_exceed_capacity(self):
+        students = [User.objects.create(username=f'student{i}', role='student', password='!') for i in range(10)]
+
+        results = run_concurrently([lambda student=student: join_event(self.event.id, student.id) for student in students])
+
+        outcomes = Counter(results)
+        self.assertEqual(outcomes[JOINED] + outcomes[FULL], len(students), results)
+        self.assertEqual(outcomes[JOINED], self.event.capacity)
+        self.assertCounterMatches()
+
+    def test_racing_joins_by_one_user_seat_them_once(self):
+        student = User.objects.create(username='student', role='student', password='!')
+
+        results = run_concurrently([lambda: join_event(self.event.id, student.id)] * 4)
+
+        outcomes = Counter(results)
+        self.assertEqual(outcomes[JOINED], 1, results)
+        self.assertEqual(outcomes[ALREADY_JOINED], 3, results)
+        self.assertCounterMatches()
+
+
+class ApprovedVisitEditTests(APITestCase):
+    """
+    Editing who visits or when takes an approved visit back to pending, so
+    the gate stops honouring the approval.
+    """
+
+    def setUp(self):
+        pass_index.clear()
+        self.addCleanup(pass_index.clear)
+        self.student = User.objects.create(username='student', role='student', password='!')
+        self.warden = User.objects.create(username='warden', role='warden', password='!')
+        self.visitor = Visitor.objects.create(
+            student=self.student, visitor_name='Guest', visitor_phone='9876543210',
+            visitor_id_proof='ID-1', purpose='Visit', visit_date=timezone.localdate(),
+            visit_time=dt_time(10, 0), expected_duration=2,
+        )
+        self.client.force_authenticate(self.warden)
+        response = self.client.post(f'/api/visitors/{self.visitor.id}/approve/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.visitor.refresh_from_db()
+        self.client.force_authenticate(self.student)
+
+    def test_edited_identity_no_longer_passes_the_gate(self):
+        response = self.client.patch(
+            f'/api/visitors/{self.visitor.id}/', {'visitor_name': 'Someone Else', 'visitor_id_proof': 'ID-2'}, secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+        self.visitor.refresh_from_db()
+        self.assertEqual(self.visitor.status, Visitor.Status.PENDING)
+        self.assertIsNone(self.visitor.approved_by)
+        self.assertIsNone(self.visitor.approved_at)
+        for id_proof in ('ID-2', 'ID-1'):
+            with self.subTest(id_proof=id_proof), self.assertRaises(GateError):
+                check_in(id_proof=id_proof)
+
+    def test_stale_pass_in_another_worker_is_refused(self):
+        self.assertEqual(len(pass_index.lookup(id_proof='ID-1')), 1)
+        response = self.client.patch(
+            f'/api/visitors/{self.visitor.id}/', {'visit_date': str(timezone.localdate() + timedelta(days=1))}, secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+        # A worker that indexed the pass before the edit still holds it
+        pass_index.add(self.visitor)
+        with self.assertRaises(GateError):
+            check_in(id_proof='ID-1')
+        self.assertEqual(pass_index.lookup(id_proof='ID-1'), [])
+
+    def test_other_edits_keep_the_approval(self):
+        response = self.client.patch(f'/api/visitors/{self.visitor.id}/', {'purpose': 'Birthday'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.visitor.refresh_from_db()
+        self.assertEqual(self.visitor.status, Visitor.Status.APPROVED)
+        self.assertEqual(check_in(id_proof='ID-1').visitor_id, self.visitor.id)
+
+
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overrides = override_settings(CHUNKED_UPLOAD_DIR=directory, MEDIA_ROOT=directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create(username='student', role='student', password='!')
+        self.client.force_authenticate(self.user)
+        self.content = b'0123456789'
+        response = self.client.post('/api/uploads/', {'filename': 'notes.txt', 'size': len(self.content)}, secure=True)
+        self.assertEqual(response.status_code, 201)
+        self.url = f"/api/uploads/{response.data['id']}/"
+
+    def patch(self, offset, data):
+        return self.client.patch(
+            self.url, data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset), secure=True
+        )
+
+    def test_resumed_upload_completes_with_the_whole_file_hash(self):
+        self.assertEqual(self.patch(0, self.content[:4]).status_code, 200)
+        response = self.client.get(self.url, secure=True)
+        self.assertEqual(response['Upload-Offset'], '4')
+        self.assertEqual(self.patch(4, self.content[4:]).status_code, 200)
+        response = self.client.post(f'{self.url}complete/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['sha256'], hashlib.sha256(self.content).hexdigest())
+
+    def test_short_read_keeps_what_arrived(self):
+        session = UploadSession.objects.get()
+        session = append_chunk(session.pk, self.user, 0, io.BytesIO(self.content[:3]), 6)
+        self.assertEqual(session.received, 3)
+        self.assertEqual(self.patch(3, self.content[3:]).status_code, 200)
+        response = self.client.post(f'{self.url}complete/', secure=True)
+        self.assertEqual(response.data['sha256'], hashlib.sha256(self.content).hexdigest())
+
+    def test_offset_mismatch_is_refused_with_the_current_offset(self):
+        self.patch(0, self.content[:4])
+        for offset in (0, 6):
+            with self.subTest(offset=offset):
+                response = self.patch(offset, self.content[offset:offset + 2])
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response['Upload-Offset'], '4')
+        self.assertEqual(UploadSession.objects.get().received, 4)
+
+    def test_chunk_past_the_announced_size_is_refused(self):
+        self.patch(0, self.content[:4])
+        response = self.patch(4, self.content[4:] + b'extra')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(UploadSession.objects.get().received, 4)
+
+    def test_body_is_read_outside_a_transaction(self):
+        test = self
+        # TestCase wraps each test in transactions of its own
+        depth = len(connection.atomic_blocks)
+
+        class Stream(io.BytesIO):
+            def read(self, *args):
+                test.assertEqual(len(connection.atomic_blocks), depth)
+                return super().read(*args)
+
+        session = UploadSession.objects.get()
+        session = append_chunk(session.pk, self.user, 0, Stream(self.content), len(self.content))
+        self.assertEqual(session.received, len(self.content))
+
+
+class RestoreCheckpointTests(SimpleTestCase):
+    def test_table_progress_waits_for_a_write_in_progress(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        checkpoint = _Checkpoint(os.path.join(directory, 'state.json'), 'key')
+        dumping, release = threading.Event(), threading.Event()
+        dump = json.dump
+
+        def slow_dump(obj, f):
+            dumping.set()
+            release.wait(5)
+            dump(obj, f)
+
+        with mock.patch('core.restore.json.dump', side_effect=slow_dump):
+            saver = threading.Thread(target=checkpoint.save)
+            saver.start()
+            self.assertTrue(dumping.wait(5))
+            # Another table's first chunk lands while the state is being written
+            updater = threading.Thread(target=checkpoint.update_table, args=('core.Room', {'rows': 1, 'last_pk': 1, 'done': False}))
+            updater.start()
+            updater.join(0.2)
+            self.assertTrue(updater.is_alive())
+            release.set()
+            saver.join()
+            updater.join()
+
+        with open(checkpoint.path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['tables'], {'core.Room': {'rows': 1, 'last_pk': 1, 'done': False}})
+
+
+class ActivityRecordingTests(TransactionTestCase):
+    """
+    Complaints, payments, allocations and visitors reach the activity feed
+    however they are written.
+    """
+
+    def setUp(self):
+        self.student = User.objects.create(username='student', role='student', first_name='Asha', last_name='Rao', password='!')
+        self.room = Room.objects.create(number='R1', capacity=2, monthly_rent=Decimal('3000'))
+
+    def events(self, event_type):
+        return list(
+            ActivityEvent.objects.filter(event_type=event_type, user=self.student)
+            .order_by('id').values_list('description', flat=True)
+        )
+
+    def test_complaint_created_and_status_changes(self):
+        complaint = Complaint.objects.create(user=self.student, title='Leaking tap', description='')
+        complaint.title = 'Leaking tap in bathroom'
+        complaint.save()
+        complaint.status = Complaint.Status.RESOLVED
+        complaint.save()
+        self.assertEqual(self.events('complaint'), [
+            'New complaint: Leaking tap', 'Complaint resolved: Leaking tap in bathroom',
+        ])
+
+    def test_visitor_created_approved_and_checked_out(self):
+        pass_index.clear()
+        self.addCleanup(pass_index.clear)
+        visitor = Visitor.objects.create(
+            student=self.student, visitor_name='Guest', visitor_phone='9876543210', visitor_id_proof='ID-1',
+            purpose='Visit', visit_date=timezone.localdate(), visit_time=dt_time(10, 0), expected_duration=2,
+        )
+        visitor.status = Visitor.Status.APPROVED
+        visitor.save()
+        check_in(id_proof='ID-1')
+        check_out(id_proof='ID-1')
+        self.assertEqual(self.events('visitor'), [
+            'Visitor request: Guest', 'Visitor approved: Guest', 'Visitor completed: Guest',
+        ])
+
+    def test_allocations_from_the_batch_and_transfers(self):
+        other_room = Room.objects.create(number='R2', capacity=2, monthly_rent=Decimal('4000'))
+        allocate_pending_students(start_date=date.today() - timedelta(days=10))
+        transfer_allocation(self.student, other_room.id)
+        self.assertEqual(self.events('allocation'), [
+            'Asha Rao moved into room R1', 'Asha Rao moved out of room R1', 'Asha Rao moved into room R2',
+        ])
+
+    def test_payments_billed_and_paid_through_the_webhook(self):
+        RoomAllocation.objects.create(user=self.student, room=self.room, start_date=date(2024, 1, 1), monthly_rent=Decimal('3000'))
+        generate_rent_invoices('2024-03')
+        payment = Payment.objects.get(user=self.student)
+        payment.provider_order_id = 'order_1'
+        payment.save()
+        record_event(json.dumps({
+            'event': 'order.paid', 'payload': {'order': {'entity': {'id': 'order_1'}}},
+        }).encode())
+        reconcile_batch()
+        self.assertEqual(self.events('payment'), ['Asha Rao was billed ₹3000.00', 'Asha Rao paid ₹3000.00'])
+
+    def test_payment_status_saved_directly(self):
+        payment = Payment.objects.create(user=self.student, amount=Decimal('500.00'))
+        payment.status = Payment.Status.FAILED
+        payment.save(update_fields=['status'])
+        self.assertEqual(self.events('payment'), [
+            'Asha Rao was billed ₹500.00', 'Payment of ₹500.00 by Asha Rao is failed',
+        ])
+
+
+class EarlyWebhookTests(APITestCase):
+    """
+    A provider callback can beat the commit of the payment it refers to.
+    """
+
+    def setUp(self):
+        self.student = User.objects.create(username='payer', role='student', password='!')
+        self.body = json.dumps({
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {'id': 'pay_early', 'order_id': 'order_early'}}},
+        }).encode()
+
+    def test_event_before_its_payment_is_retried(self):
+        event_id = record_event(self.body)
+        summary = reconcile_batch()
+        self.assertEqual((summary['deferred'], summary['failed']), (1, 0))
+        event = PaymentWebhookEvent.objects.get(event_id=event_id)
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertGreater(event.retry_at, timezone.now())
+
+        # Not due yet, so the next pass leaves it alone
+        payment = Payment.objects.create(user=self.student, amount=Decimal('100.00'), provider_order_id='order_early')
+        self.assertEqual(reconcile_batch()['events'], 0)
+
+        PaymentWebhookEvent.objects.filter(pk=event.pk).update(retry_at=timezone.now())
+        self.assertEqual(reconcile_batch()['applied'], 1)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.provider_payment_id), ('success', 'pay_early'))
+        self.assertEqual(PaymentWebhookEvent.objects.get(pk=event.pk).status, 'applied')
+
+    def test_event_without_payment_fails_after_cutoff(self):
+        event_id = record_event(self.body)
+        reconcile_batch()
+        PaymentWebhookEvent.objects.filter(event_id=event_id).update(
+            retry_at=timezone.now(), received_at=timezone.now() - timedelta(hours=25),
+        )
+        self.assertEqual(reconcile_batch()['failed'], 1)
+        event = PaymentWebhookEvent.objects.get(event_id=event_id)
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+        self.assertIsNotNone(event.processed_at)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], DB_REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The replica is a second SQLite file copied from the primary. Rows added
+    to the primary afterwards are missing there, so a stale count shows the
+    read was served by the replica.
+    """
+
+    def setUp(self):
+        cache.clear()
+        replicas._down_until.clear()
+        self.student = User.objects.create(username='reader', role='student', password='!')
+        Room.objects.create(number='R1', capacity=2, monthly_rent=Decimal('3000'))
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.use_replica(os.path.join(self.tmp, 'replica.sqlite3'))
+        with sqlite3.connect(connection.settings_dict['NAME']) as source, sqlite3.connect(self.replica_name) as target:
+            source.backup(target)
+        Room.objects.create(number='R2', capacity=2, monthly_rent=Decimal('3000'))
+
+    def use_replica(self, name):
+        self.replica_name = name
+        connections.settings['replica_1'] = {**connection.settings_dict, 'NAME': name}
+        self.addCleanup(self.drop_replica)
+
+    def drop_replica(self):
+        if hasattr(connections._connections, 'replica_1'):
+            connections['replica_1'].close()
+            del connections['replica_1']
+        connections.settings.pop('replica_1', None)
+        replicas._down_until.clear()
+
+    def request(self, view, method='get'):
+        request = getattr(RequestFactory(), method)('/api/rooms/')
+        request.user = self.student
+        seen = []
+        ReplicaPinningMiddleware(lambda request: seen.append(view()))(request)
+        return seen[0]
+
+    def test_safe_request_reads_from_the_replica(self):
+        self.assertEqual(self.request(Room.objects.count), 1)
+        # Outside a request everything stays on the primary
+        self.assertEqual(Room.objects.count(), 2)
+
+    def test_unsafe_request_reads_from_the_primary(self):
+        self.assertEqual(self.request(Room.objects.count, method='post'), 2)
+
+    def test_reads_in_a_transaction_use_the_primary(self):
+        def view():
+            with transaction.atomic():
+                return Room.objects.count()
+        self.assertEqual(self.request(view), 2)
+
+    def test_write_sends_later_reads_to_the_primary(self):
+        def view():
+            before = Room.objects.count()
+            Room.objects.create(number='R3', capacity=2, monthly_rent=Decimal('3000'))
+            return before, Room.objects.count()
+        self.assertEqual(self.request(view), (1, 3))
+
+        # The user stays pinned to the primary until the replica catches up
+        self.assertEqual(self.request(Room.objects.count), 3)
+        cache.clear()
+        self.assertEqual(self.request(Room.objects.count), 1)
+
+    def test_dead_replica_falls_back_to_the_primary(self):
+        self.drop_replica()
+        self.use_replica(os.path.join(self.tmp, 'missing', 'replica.sqlite3'))
+        self.assertEqual(self.request(Room.objects.count), 2)
+        self.assertIn('replica_1', replicas._down_until)
+        # Skipped without another connection attempt until the retry delay passes
+        with mock.patch.object(connections['replica_1'], 'ensure_connection') as connect:
+            self.assertEqual(self.request(Room.objects.count), 2)
+        connect.assert_not_called()
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_RATES={'login': {'burst': 3, 'rate': '60/min'}, 'login-username': {'burst': 2, 'rate': '60/min'}},
+)
+class LoginThrottleTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('core.throttling.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.store = LocalBucketStore()
+        store = mock.patch('core.throttling._store', self.store)
+        store.start()
+        self.addCleanup(store.stop)
+
+    def attempt(self, username, ip='10.0.0.1'):
+        request = APIRequestFactory().post('/api/auth/token/', {'username': username}, format='json', REMOTE_ADDR=ip)
+        return LoginRateThrottle().allow_request(Request(request, parsers=[JSONParser()]), None)
+
+    def tokens(self, key):
+        return self.store._buckets[key][0]
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.attempt('asha') for _ in range(3)], [True, True, False])
+        # One token a second
+        self.now += 1
+        self.assertTrue(self.attempt('asha'))
+        self.assertFalse(self.attempt('asha'))
+
+    def test_refused_attempt_is_not_charged(self):
+        self.attempt('asha')
+        self.attempt('asha')
+        # The username bucket is empty; the IP bucket keeps its last token
+        self.assertFalse(self.attempt('asha'))
+        self.assertEqual(self.tokens('login:ip:10.0.0.1'), 1)
+        self.assertTrue(self.attempt('ravi'))
+
+        # And with the IP bucket empty, the username bucket is left alone
+        self.assertFalse(self.attempt('meena'))
+        self.assertEqual(self.tokens('login-username:meena:ip:10.0.0.1'), 2)
+
+    def test_other_addresses_cannot_lock_an_account_out(self):
+        for ip in ('10.0.0.2', '10.0.0.3'):
+            while self.attempt('Asha', ip=ip):
+                pass
+        self.assertTrue(self.attempt('asha', ip='10.0.0.1'))
+
+
+class IdempotentOrders:
+    """
+    Stand-in ViewSet whose create can be held open from the test
+    """
+    def __init__(self):
+        self.calls = 0
+        self.in_transaction = None
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    @idempotent
+    def create(self, request):
+        self.calls += 1
+        self.in_transaction = connection.in_atomic_block
+        self.entered.set()
+        self.release.wait(5)
+        return Response({'id': self.calls}, status=201, headers={'Location': f'/api/orders/{self.calls}/', 'X-Request-Time': '1'})
+
+
+class IdempotencyTests(TransactionTestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='buyer', role='student', password='!')
+        self.view = IdempotentOrders()
+
+    def post(self, body=None, key='order-1'):
+        request = APIRequestFactory().post(
+            '/api/payments/create_order/', body or {'amount': '100'}, format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+        request = Request(request, parsers=[JSONParser()])
+        request.user = self.student
+        return self.view.create(request)
+
+    def test_replay_keeps_the_response_headers(self):
+        first = self.post()
+        replay = self.post()
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual((replay.status_code, replay.data), (201, {'id': 1}))
+        self.assertEqual(replay['Location'], first['Location'])
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertFalse(replay.has_header('X-Request-Time'))
+
+    def test_key_reused_for_another_request(self):
+        self.post()
+        response = self.post({'amount': '999'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.view.calls, 1)
+
+    def test_view_runs_outside_the_claim_transaction(self):
+        self.post()
+        self.assertIs(self.view.in_transaction, False)
+
+    def test_concurrent_duplicate_waits_for_the_first(self):
+        self.view.release.clear()
+        results = {}
+
+        def first():
+            try:
+                results['first'] = self.post()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=first)
+        thread.start()
+        self.assertTrue(self.view.entered.wait(5))
+        try:
+            duplicate = self.post()
+        finally:
+            self.view.release.set()
+            thread.join()
+
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate['Retry-After'], '1')
+        self.assertEqual(results['first'].status_code, 201)
+        self.assertEqual(self.post().data, {'id': 1})
+        self.assertEqual(self.view.calls, 1)
+
+    def test_abandoned_claim_is_taken_over(self):
+        IdempotencyKey.objects.create(
+            user=self.student, key='order-1', fingerprint='', expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.post().status_code, 201)
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(IdempotencyKey.objects.get(key='order-1').status_code, 201)
+
+
+class TransferBillingTests(TransactionTestCase):
+    def setUp(self):
+        self.student = User.objects.create(username='mover', role='student', password='!')
+        self.old_room = Room.objects.create(number='R1', capacity=2, monthly_rent=Decimal('3000'))
+        self.new_room = Room.objects.create(number='R2', capacity=2, monthly_rent=Decimal('6000'))
+
+    def test_transfer_day_is_billed_once(self):
+        RoomAllocation.objects.create(user=self.student, room=self.old_room, start_date=date(2024, 3, 1), monthly_rent=Decimal('3000'))
+        with mock.patch('core.allocation.timezone.now', return_value=datetime(2024, 3, 16, 12, tzinfo=dt_timezone.utc)):
+            transfer_allocation(self.student, self.new_room.id)
+
+        summary = generate_rent_invoices('2024-03')
+        self.assertEqual(summary['created'], 2)
+        bills = {
+            payment.allocation.room.number: payment.description
+            for payment in Payment.objects.filter(user=self.student).select_related('allocation__room')
+        }
+        # Mar 1-15 in the old room, Mar 16-31 in the new one: 31 days in all
+        self.assertEqual(bills, {
+            'R1': 'Monthly rent for March 2024 (prorated, 15 days)',
+            'R2': 'Monthly rent for March 2024 (prorated, 16 days)',
+        })
+
+    def test_move_out_on_the_first_is_not_billed_that_month(self):
+        rent = Decimal('3000')
+        self.assertEqual(prorate_rent(rent, date(2024, 4, 1), date(2024, 4, 30), date(2024, 3, 1), date(2024, 4, 1)), (Decimal('0.00'), 0))
+        self.assertEqual(prorate_rent(rent, date(2024, 3, 1), date(2024, 3, 31), date(2024, 3, 1), date(2024, 4, 1)), (rent, 31))
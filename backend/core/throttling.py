@@ -0,0 +1,210 @@
+"""
+Token-bucket request throttling.
+
+Every (scope, client) pair gets a bucket holding up to ``burst`` tokens that
+refills at the scope's sustained ``rate``; a request takes one token from
+each of its buckets or, if any is empty, is refused with 429 and a
+Retry-After header without being charged. Clients are identified by user ID
+when authenticated and by IP otherwise. Scopes and their rates live in
+THROTTLE_RATES; a view picks one with ``throttle_scope``, or a ViewSet maps
+its actions to scopes with a ``{action: scope}`` dict. Views without one use
+"user" or "anon".
+
+Buckets live in this process (a dict behind a lock, a few microseconds per
+decision) or, with THROTTLE_STORE = "redis", in Redis via an atomic script so
+every worker shares the same limits.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_REDIS_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+
+def parse_rate(rate):
+    """
+    "60/min" -> 1.0 tokens per second
+    """
+    count, period = rate.split('/')
+    return int(count) / PERIODS[period.strip()[0]]
+
+
+class LocalBucketStore:
+    """
+    Buckets in this process; limits apply per worker
+    """
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, buckets):
+        """
+        Take one token from each (key, burst, rate) bucket, or from none of
+        them; returns 0 if allowed, else seconds until every bucket has one
+        """
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            levels = []
+            for key, burst, rate in buckets:
+                tokens, updated = self._buckets.pop(key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+                levels.append((key, tokens))
+            for key, tokens in levels:
+                self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                # Least recently seen buckets have had the longest to refill
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """
+    Buckets in Redis, shared by every worker; each decision is one atomic script call
+    """
+    def __init__(self, url):
+        import redis
+
+        self._script = redis.Redis.from_url(url).register_script(_REDIS_SCRIPT)
+
+    def consume(self, buckets):
+        keys, args = [], []
+        for key, burst, rate in buckets:
+            keys.append(f'throttle:{key}')
+            args.extend([burst, rate])
+        try:
+            return float(self._script(keys=keys, args=args))
+        except Exception as e:
+            # Never turn a Redis outage into an API outage
+            logger.error(f"Throttle store unavailable, allowing request: {e}")
+            return 0.0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.THROTTLE_STORE == 'redis':
+                    _store = RedisBucketStore(settings.REDIS_URL)
+                else:
+                    _store = LocalBucketStore()
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = 0.0
+
+    def get_scope(self, request, view):
+        if self.scope:
+            return self.scope
+        scope = getattr(view, 'throttle_scope', None)
+        if isinstance(scope, dict):
+            scope = scope.get(getattr(view, 'action', None))
+        return scope or ('user' if request.user and request.user.is_authenticated else 'anon')
+
+    def get_idents(self, request, view):
+        """
+        Clients to charge for this request; each gets its own bucket in the scope
+        """
+        if request.user and request.user.is_authenticated:
+            return [f'user:{request.user.pk}']
+        return [f'ip:{self.get_ident(request)}']
+
+    def get_buckets(self, request, view):
+        """
+        (key, burst, rate) of every bucket this request takes a token from
+        """
+        scope = self.get_scope(request, view)
+        config = settings.THROTTLE_RATES.get(scope)
+        if not config:
+            return []
+        burst, rate = config['burst'], parse_rate(config['rate'])
+        return [(f'{scope}:{ident}', burst, rate) for ident in self.get_idents(request, view)]
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+        buckets = self.get_buckets(request, view)
+        if not buckets:
+            return True
+        # All buckets are checked before any is charged, so a refused
+        # request does not use up the others
+        self.wait_seconds = get_store().consume(buckets)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """
+    Sign-in attempts, limited per IP and, more tightly, per username from
+    that IP. Keying the username bucket on the address too means guesses
+    from elsewhere cannot lock the account's owner out.
+    """
+    scope = 'login'
+    username_scope = 'login-username'
+
+    def get_buckets(self, request, view):
+        buckets = super().get_buckets(request, view)
+        config = settings.THROTTLE_RATES.get(self.username_scope)
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if username and config:
+            key = f'{self.username_scope}:{str(username).lower()[:150]}:ip:{self.get_ident(request)}'
+            buckets.append((key, config['burst'], parse_rate(config['rate'])))
+        return buckets
+
+
+class TokenRefreshRateThrottle(TokenBucketThrottle):
+    scope = 'token-refresh'
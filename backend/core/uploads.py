@@ -0,0 +1,246 @@
+"""
+Chunked, resumable uploads into content-addressed storage.
+
+A client opens an UploadSession with the total size, then PATCHes the bytes
+in order with an ``Upload-Offset`` header. Each chunk is streamed from the
+request into a file of its own in fixed-size blocks, then appended to the
+partial upload while feeding a sha256, so memory per upload stays constant
+whatever the file size. If a connection
+drops, the client asks for the current offset and continues from there.
+On completion the file is stored once under ``cas/<sha256>``; identical
+uploads reuse the existing blob.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .backends import write_atomic
+from .models import Document, Room, UploadSession, User
+
+BLOCK_SIZE = 64 * 1024
+CAS_PREFIX = 'cas/'
+
+# Running hashes of in-progress sessions; a miss (other worker, restart) rehashes the partial file
+_HASHER_CACHE_SIZE = 256
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """
+    Chunk or completion refused; ``status`` is the HTTP status to answer with
+    """
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def temp_path(session):
+    return Path(settings.CHUNKED_UPLOAD_DIR) / f'{session.pk}.part'
+
+
+def chunk_path(session):
+    # One file per request, so concurrent PATCHes never write the same file
+    return Path(settings.CHUNKED_UPLOAD_DIR) / f'{session.pk}.{uuid.uuid4().hex}.chunk'
+
+
+def blob_name(sha256, filename):
+    ext = os.path.splitext(filename)[1].lower()[:10]
+    return f'{CAS_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def _take_hasher(session):
+    with _hashers_lock:
+        cached = _hashers.pop(session.pk, None)
+    if cached and cached[0] == session.received:
+        return cached[1]
+
+    hasher = hashlib.sha256()
+    remaining = session.received
+    if remaining:
+        with open(temp_path(session), 'rb') as f:
+            while remaining:
+                block = f.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    raise UploadError('Partial upload is missing on disk; start a new upload', status=410)
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def _keep_hasher(session, hasher):
+    with _hashers_lock:
+        _hashers[session.pk] = (session.received, hasher)
+        _hashers.move_to_end(session.pk)
+        while len(_hashers) > _HASHER_CACHE_SIZE:
+            _hashers.popitem(last=False)
+
+
+def open_session(user, filename, size, content_type=''):
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f'File exceeds the {settings.CHUNKED_UPLOAD_MAX_SIZE} byte limit', status=413)
+    session = UploadSession.objects.create(
+        user=user, filename=os.path.basename(filename), size=size, content_type=content_type
+    )
+    Path(settings.CHUNKED_UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    temp_path(session).touch()
+    return session
+
+
+def _check_chunk(session, offset, length):
+    if session.status != UploadSession.Status.UPLOADING:
+        raise UploadError('Upload is already complete', status=409, offset=session.received)
+    if offset != session.received:
+        raise UploadError('Upload-Offset does not match the received bytes', status=409, offset=session.received)
+    if session.received + length > session.size:
+        raise UploadError('Chunk runs past the announced size', status=413, offset=session.received)
+
+
+def append_chunk(session_id, user, offset, stream, length):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset``. A short read (client
+    disconnect) keeps what arrived, so the client can resume from the new offset.
+
+    The body is read into a file of its own with no transaction open, so a
+    slow client never holds the session row (or SQLite's write lock). The
+    offset is checked again under the lock before the chunk is appended; of
+    two requests racing for the same offset, the second gets a 409.
+    """
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks may be at most {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes', status=413)
+
+    with write_atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+        _check_chunk(session, offset, length)
+
+    path = chunk_path(session)
+    try:
+        written = 0
+        with open(path, 'wb') as f:
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+
+        with write_atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+            _check_chunk(session, offset, written)
+            hasher = _take_hasher(session)
+            with open(path, 'rb') as chunk, open(temp_path(session), 'r+b') as f:
+                f.seek(session.received)
+                # Drop bytes a failed earlier append may have left past the offset
+                f.truncate()
+                for block in iter(lambda: chunk.read(BLOCK_SIZE), b''):
+                    f.write(block)
+                    hasher.update(block)
+            session.received += written
+            session.save(update_fields=['received', 'updated_at'])
+            _keep_hasher(session, hasher)
+    finally:
+        path.unlink(missing_ok=True)
+    return session
+
+
+def complete_session(session_id, user):
+    """
+    Move a fully received upload into content-addressed storage
+    """
+    with write_atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+        if session.status == UploadSession.Status.COMPLETE:
+            return session
+        if session.received != session.size:
+            raise UploadError(f'Only {session.received} of {session.size} bytes received', status=409, offset=session.received)
+
+        sha256 = _take_hasher(session).hexdigest()
+        name = blob_name(sha256, session.filename)
+        path = temp_path(session)
+        if not default_storage.exists(name):
+            with open(path, 'rb') as f:
+                name = default_storage.save(name, File(f))
+        path.unlink(missing_ok=True)
+
+        session.sha256 = sha256
+        session.stored_name = name
+        session.status = UploadSession.Status.COMPLETE
+        session.save(update_fields=['sha256', 'stored_name', 'status', 'updated_at'])
+    return session
+
+
+def discard_session(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    temp_path(session).unlink(missing_ok=True)
+    # Chunks left by a worker that died while reading a request
+    for path in Path(settings.CHUNKED_UPLOAD_DIR).glob(f'{session.pk}.*.chunk'):
+        path.unlink(missing_ok=True)
+    session.delete()
+
+
+def claim_upload(session_id, user):
+    """
+    Storage name of a completed upload owned by ``user``; the session is
+    consumed so it can only be attached once
+    """
+    try:
+        session = UploadSession.objects.get(pk=session_id, user=user, status=UploadSession.Status.COMPLETE)
+    except (UploadSession.DoesNotExist, ValueError):
+        raise UploadError('No completed upload with this ID')
+    name = session.stored_name
+    session.delete()
+    return name
+
+
+def is_valid_image(name):
+    """
+    Whether a stored file decodes as an image (what ImageField checks on upload)
+    """
+    from PIL import Image
+
+    try:
+        with default_storage.open(name, 'rb') as f:
+            Image.open(f).verify()
+        return True
+    except Exception:
+        return False
+
+
+def release_blob(name):
+    """
+    Delete a stored file unless another row still points at it. Blobs under
+    cas/ are shared by every identical upload.
+    """
+    if not name:
+        return
+    if name.startswith(CAS_PREFIX) and (
+        Document.objects.filter(file=name).exists()
+        or User.objects.filter(profile_picture=name).exists()
+        or Room.objects.filter(image=name).exists()
+        or UploadSession.objects.filter(stored_name=name).exists()
+    ):
+        return
+    default_storage.delete(name)
+
+
+def purge_stale_sessions():
+    """
+    Remove sessions idle past CHUNKED_UPLOAD_TTL_HOURS and their temp files
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_TTL_HOURS)
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard_session(session)
+        removed += 1
+    return removed
@@ -3,12 +3,16 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     UserRegistrationView, UserViewSet, RoomViewSet, AttendanceViewSet,
     ComplaintViewSet, PaymentViewSet, FeedbackViewSet, RoomAllocationViewSet,
-    NoticeViewSet, MaintenanceRequestViewSet, DashboardStatsView
+    NoticeViewSet, MaintenanceRequestViewSet, PaymentWebhookView,
+    ActivityFeedView, UploadSessionViewSet, RenditionView, MediaView, DatabasePoolStatsView,
+    JobViewSet, ReportJobView, BackupJobView, JobMetricsView
 )
-# from .views_enhanced import (
-#     AdvancedUserViewSet, AdvancedRoomViewSet, DocumentViewSet, VisitorViewSet,
-#     EventViewSet, AuditLogViewSet, AdvancedDashboardStatsView, DataExportView, SearchView
-# )
+from .views_enhanced import (
+    AdvancedUserViewSet, DocumentViewSet, VisitorViewSet,
+    EventViewSet, AuditLogViewSet, AdvancedDashboardStatsView
+)
+from .views_async import DashboardStatsView, NoticeListView, SearchView, UserMeView, async_reads
+# from .views_enhanced import AdvancedRoomViewSet, DataExportView
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet, basename="user")
@@ -20,22 +24,39 @@ router.register(r"feedback", FeedbackViewSet)
 router.register(r"allocations", RoomAllocationViewSet)
 router.register(r"notices", NoticeViewSet)
 router.register(r"maintenance", MaintenanceRequestViewSet)
+router.register(r"uploads", UploadSessionViewSet, basename="upload")
+router.register(r"jobs", JobViewSet, basename="job")
 
-# Enhanced API endpoints (temporarily disabled)
-# router.register(r"advanced/users", AdvancedUserViewSet, basename="advanced-user")
+# Enhanced API endpoints
+router.register(r"advanced/users", AdvancedUserViewSet, basename="advanced-user")
 # router.register(r"advanced/rooms", AdvancedRoomViewSet, basename="advanced-room")
-# router.register(r"documents", DocumentViewSet)
-# router.register(r"visitors", VisitorViewSet)
-# router.register(r"events", EventViewSet)
-# router.register(r"audit-logs", AuditLogViewSet)
+router.register(r"documents", DocumentViewSet)
+router.register(r"visitors", VisitorViewSet)
+router.register(r"events", EventViewSet)
+router.register(r"audit-logs", AuditLogViewSet)
 
 urlpatterns = [
+    # Async reads ahead of the router; other methods on these URLs reach the viewsets
+    path("users/me/", async_reads(
+        UserMeView.as_view(), UserViewSet.as_view({"get": "me", "patch": "me"})
+    ), name="user-me"),
+    path("notices/", async_reads(
+        NoticeListView.as_view(), NoticeViewSet.as_view({"get": "list", "post": "create"})
+    ), name="notice-list"),
     path("", include(router.urls)),
     path("register/", UserRegistrationView.as_view(), name="user-registration"),
     path("dashboard/stats/", DashboardStatsView.as_view(), name="dashboard-stats"),
-    # path("dashboard/advanced-stats/", AdvancedDashboardStatsView.as_view(), name="advanced-dashboard-stats"),
+    path("webhooks/payments/", PaymentWebhookView.as_view(), name="payment-webhook"),
+    path("media/<path:name>", MediaView.as_view(), name="protected-media"),
+    path("renditions/<str:size>/<path:name>", RenditionView.as_view(), name="rendition"),
+    path("activity/", ActivityFeedView.as_view(), name="activity-feed"),
+    path("system/db-pool/", DatabasePoolStatsView.as_view(), name="db-pool-stats"),
+    path("system/jobs/", JobMetricsView.as_view(), name="job-metrics"),
+    path("system/backups/", BackupJobView.as_view(), name="backup-job"),
+    path("reports/", ReportJobView.as_view(), name="report-job"),
+    path("dashboard/advanced-stats/", AdvancedDashboardStatsView.as_view(), name="advanced-dashboard-stats"),
     # path("export/", DataExportView.as_view(), name="data-export"),
-    # path("search/", SearchView.as_view(), name="search"),
+    path("search/", SearchView.as_view(), name="search"),
 ]
 
 
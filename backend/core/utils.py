@@ -1,6 +1,7 @@
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import models
 from .models import AuditLog, EmailNotification
 import logging
 
@@ -81,6 +82,15 @@ def send_notification_email(user, subject, message, template=None):
         return False
 
 
+def queue_notification_email(user, subject, message):
+    """
+    Send a notification email from a background job instead of the request
+    """
+    from .jobs import enqueue
+
+    return enqueue('send_notification_email', user_id=user.pk, subject=subject, message=message)
+
+
 def send_bulk_notification(users, subject, message):
     """
     Send bulk email notifications
@@ -97,7 +107,7 @@ def generate_report_data(start_date, end_date, report_type):
     """
     Generate data for various reports
     """
-    from .models import User, Room, Payment, Complaint, Attendance
+    from .models import User, Room, Payment, Complaint, Attendance, RoomAllocation
     
     data = {}
     
@@ -146,9 +156,10 @@ def generate_report_data(start_date, end_date, report_type):
             'present_count': attendance.filter(present=True).count(),
             'absent_count': attendance.filter(present=False).count(),
             'attendance_rate': 0,  # Calculate percentage
+            # Named apart from the `present` field, which the filters refer to
             'daily_breakdown': attendance.values('date').annotate(
-                present=models.Count('id', filter=models.Q(present=True)),
-                absent=models.Count('id', filter=models.Q(present=False))
+                present_count=models.Count('id', filter=models.Q(present=True)),
+                absent_count=models.Count('id', filter=models.Q(present=False))
             )
         }
     
@@ -165,10 +176,10 @@ def validate_room_availability(room, start_date, end_date=None):
         end_date = start_date
     
     conflicting_allocations = RoomAllocation.objects.filter(
+        models.Q(end_date__isnull=True) | models.Q(end_date__gte=start_date),
         room=room,
         status='active',
-        start_date__lte=end_date,
-        models.Q(end_date__isnull=True) | models.Q(end_date__gte=start_date)
+        start_date__lte=end_date
     )
     
     return conflicting_allocations.count() == 0
@@ -233,30 +244,17 @@ def get_user_statistics(user):
     return stats
 
 
-def backup_database():
+def backup_database(incremental=False):
     """
-    Create a backup of the database
+    Create a backup of the database and return its directory
     """
-    import os
-    import subprocess
-    from django.conf import settings
-    
+    from .backup import create_backup, prune_backups
+
     try:
-        # This is a simplified backup function
-        # In production, you'd want to use proper database backup tools
-        backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = os.path.join(backup_dir, f'backup_{timestamp}.json')
-        
-        # Export data to JSON (simplified approach)
-        from django.core.management import call_command
-        with open(backup_file, 'w') as f:
-            call_command('dumpdata', stdout=f)
-        
-        return backup_file
-        
+        manifest = create_backup(incremental=incremental)
+        prune_backups()
+        return manifest['path']
+
     except Exception as e:
         logger.error(f"Failed to create database backup: {e}")
         return None
@@ -1,26 +1,53 @@
+import os
 from datetime import date, datetime, timedelta
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum, Q
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Exists, OuterRef, Prefetch, Sum, Q
 from django.utils import timezone
-from rest_framework import viewsets, permissions, status, filters
+from rest_framework import viewsets, mixins, permissions, status, filters
 from rest_framework.decorators import action
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import (
     Room, Attendance, Complaint, ComplaintComment, Payment, Feedback, RoomAllocation, 
-    Notice, NoticeRead, MaintenanceRequest
+    Notice, NoticeRead, MaintenanceRequest, UploadSession, Document, Job
 )
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, RoomSerializer,
     AttendanceSerializer, ComplaintSerializer, ComplaintCommentSerializer, PaymentSerializer,
     FeedbackSerializer, RoomAllocationSerializer, NoticeSerializer,
-    MaintenanceRequestSerializer, DashboardStatsSerializer
+    MaintenanceRequestSerializer, BatchAllocationSerializer,
+    RentInvoiceRunSerializer, ActivityEventSerializer, UploadSessionSerializer,
+    StudentImportSerializer, AccountActivationSerializer, JobSerializer, ReportRequestSerializer,
+    annotate_user_stats, field_requested, requested_fields
 )
 from .permissions import IsAdmin, IsStudent, IsWarden
+from .activity import DEFAULT_FEED_LIMIT, activity_feed
+from .allocation import AllocationConflict, AllocationError, allocate_pending_students, transfer_allocation
+from .backends.pool import pool_stats
+from .billing import generate_rent_invoices
+from .fastlist import FastListMixin
+from .idempotency import idempotent
+from .jobs import enqueue, job_metrics
+from .media import serve_file
+from .provisioning import MAX_IMPORT_ROWS, activate_account, import_students, parse_rows
+from .revocation import revoke_token
+from .renditions import CONTENT_TYPE as RENDITION_CONTENT_TYPE, resolve_rendition, schedule_renditions
+from .uploads import (
+    UploadError, append_chunk, claim_upload, complete_session, discard_session, is_valid_image,
+    open_session, release_blob
+)
+from .webhooks import EVENT_ID_HEADER, SIGNATURE_HEADER, record_event, verify_signature
 
 
 User = get_user_model()
@@ -30,6 +57,7 @@ class UserRegistrationView(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'register'
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -42,18 +70,25 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ['username', 'first_name', 'last_name', 'email']
     ordering_fields = ['created_at', 'username']
     ordering = ['-created_at']
+    throttle_scope = {'activate': 'login'}
 
     def get_queryset(self):
+        queryset = annotate_user_stats(User.objects.all(), requested_fields(self.request))
         if self.request.user.role == "student":
-            return User.objects.filter(id=self.request.user.id)
-        return User.objects.all()
+            return queryset.filter(id=self.request.user.id)
+        return queryset
+
+    def perform_update(self, serializer):
+        user = serializer.save()
+        if 'profile_picture' in serializer.validated_data:
+            schedule_renditions(user.profile_picture)
 
     @action(detail=False, methods=["get", "patch"], url_path="me")
     def me(self, request):
         if request.method.lower() == "patch":
             serializer = self.get_serializer(request.user, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            self.perform_update(serializer)
             return Response(serializer.data)
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
@@ -80,19 +115,62 @@ class UserViewSet(viewsets.ModelViewSet):
         request.user.save(update_fields=["password"]) 
         return Response({"detail": "Password updated successfully."})
 
+    @action(detail=False, methods=["post"], url_path="import", permission_classes=[permissions.IsAuthenticated, IsAdmin],
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        serializer = StudentImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        rows = data.get('students')
+        if data.get('file'):
+            try:
+                rows = parse_rows(data['file'].read(), data['file'].name)
+            except ValueError as e:
+                return Response({'file': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        elif len(rows) > MAX_IMPORT_ROWS:
+            return Response({'students': [f'At most {MAX_IMPORT_ROWS} rows can be imported at once']}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = import_students(rows, dry_run=data['dry_run'])
+        return Response(summary, status=status.HTTP_201_CREATED if summary['created'] and not data['dry_run'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="activate", permission_classes=[permissions.AllowAny],
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def activate(self, request):
+        serializer = AccountActivationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            activate_account(data['uid'], data['token'], data['password'])
+        except ValueError as e:
+            return Response({'token': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        except DjangoValidationError as e:
+            return Response({'password': list(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"detail": "Account activated. You can now sign in."})
+
     @action(detail=False, methods=["post", "delete"], url_path="me/avatar")
     def avatar(self, request):
         if request.method.lower() == "delete":
-            request.user.profile_picture.delete(save=False)
+            name = request.user.profile_picture.name
             request.user.profile_picture = None
             request.user.save(update_fields=["profile_picture"]) 
+            release_blob(name)
             return Response({"detail": "Profile picture removed."})
 
         file_obj = request.FILES.get("profile_picture")
+        upload_id = request.data.get("upload")
+        if upload_id:
+            try:
+                file_obj = claim_upload(upload_id, request.user)
+            except UploadError as e:
+                return Response({"upload": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+            if not is_valid_image(file_obj):
+                release_blob(file_obj)
+                return Response({"upload": ["Upload a valid image."]}, status=status.HTTP_400_BAD_REQUEST)
         if not file_obj:
             return Response({"profile_picture": ["File is required."]}, status=status.HTTP_400_BAD_REQUEST)
         request.user.profile_picture = file_obj
         request.user.save(update_fields=["profile_picture"]) 
+        schedule_renditions(request.user.profile_picture)
         serializer = self.get_serializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -113,9 +191,33 @@ class RoomViewSet(viewsets.ModelViewSet):
     ordering_fields = ['number', 'monthly_rent', 'created_at']
     ordering = ['number']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if field_requested(self.request, 'current_occupancy') or field_requested(self.request, 'is_available'):
+            # Same count as Room.current_occupancy, in one query for the whole list
+            queryset = queryset.annotate(
+                occupancy_total=Count('allocations', filter=Q(allocations__end_date__isnull=True))
+            )
+        if field_requested(self.request, 'occupants'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'allocations',
+                queryset=RoomAllocation.objects.filter(status='active').select_related('user').order_by('id'),
+                to_attr='active_occupancies',
+            ))
+        return queryset
+
+    def perform_create(self, serializer):
+        room = serializer.save()
+        schedule_renditions(room.image)
+
+    def perform_update(self, serializer):
+        room = serializer.save()
+        if 'image' in serializer.validated_data:
+            schedule_renditions(room.image)
+
     @action(detail=False, methods=["get"], url_path="available")
     def available_rooms(self, request):
-        available_rooms = Room.objects.filter(status='available')
+        available_rooms = self.get_queryset().filter(status='available')
         serializer = self.get_serializer(available_rooms, many=True)
         return Response(serializer.data)
 
@@ -135,7 +237,7 @@ class RoomViewSet(viewsets.ModelViewSet):
         })
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all().select_related("user")
     serializer_class = AttendanceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -198,9 +300,16 @@ class ComplaintViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_queryset(self):
+        queryset = self.queryset
+        if field_requested(self.request, 'comments'):
+            queryset = queryset.prefetch_related(Prefetch(
+                'comments',
+                queryset=ComplaintComment.objects.select_related('user').order_by('-created_at'),
+                to_attr='ordered_comments',
+            ))
         if self.request.user.role == "student":
-            return self.queryset.filter(user=self.request.user)
-        return self.queryset
+            return queryset.filter(user=self.request.user)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -225,7 +334,7 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all().select_related("user")
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -240,6 +349,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return self.queryset
 
     @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated, IsStudent])
+    @idempotent
     def create_order(self, request):
         amount = request.data.get("amount")
         payment_type = request.data.get("payment_type", "rent")
@@ -254,6 +364,14 @@ class PaymentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(payment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="generate-rent", permission_classes=[permissions.IsAuthenticated, IsAdmin])
+    def generate_rent(self, request):
+        serializer = RentInvoiceRunSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        summary = generate_rent_invoices(data['period'], due_day=data['due_day'], dry_run=data['dry_run'])
+        return Response(summary, status=status.HTTP_201_CREATED if summary['created'] and not data['dry_run'] else status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"], url_path="pending")
     def pending_payments(self, request):
         pending = self.get_queryset().filter(status='pending')
@@ -323,6 +441,10 @@ class RoomAllocationViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(user=self.request.user)
         return self.queryset
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -333,21 +455,43 @@ class RoomAllocationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=["post"], url_path="transfer", permission_classes=[permissions.IsAuthenticated])
+    @idempotent
     def transfer(self, request):
-        from django.utils import timezone
         new_room_id = request.data.get('room')
         if not new_room_id:
             return Response({'room': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
-        current = RoomAllocation.objects.filter(user=request.user, status='active').first()
-        if current:
-            current.status = 'inactive'
-            current.end_date = timezone.now().date()
-            current.save(update_fields=['status', 'end_date'])
-        serializer = self.get_serializer(data={'room': new_room_id, 'start_date': timezone.now().date(), 'status': 'active'})
-        serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        try:
+            allocation = transfer_allocation(request.user, new_room_id)
+        except (ValueError, TypeError):
+            return Response({'room': ['A valid room ID is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        except AllocationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except AllocationConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        serializer = self.get_serializer(allocation)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="batch", permission_classes=[permissions.IsAuthenticated, IsAdmin])
+    def batch_allocate(self, request):
+        serializer = BatchAllocationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        preferences = {
+            pref['user']: pref for pref in data.get('preferences', [])
+        }
+        try:
+            report = allocate_pending_students(
+                start_date=data.get('start_date') or timezone.now().date(),
+                preferences=preferences,
+                student_ids=data.get('students'),
+                max_rent=data.get('max_rent'),
+                security_deposit_months=data['security_deposit_months'],
+                dry_run=data['dry_run'],
+            )
+        except AllocationConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(report, status=status.HTTP_200_OK if data['dry_run'] else status.HTTP_201_CREATED)
+
 
 class NoticeViewSet(viewsets.ModelViewSet):
     queryset = Notice.objects.all().select_related("created_by")
@@ -361,10 +505,15 @@ class NoticeViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user_role = self.request.user.role
-        return self.queryset.filter(
+        queryset = self.queryset.filter(
             Q(target_audience=user_role) | Q(target_audience='all'),
             is_active=True
         )
+        if not field_requested(self.request, 'is_read'):
+            return queryset
+        return queryset.annotate(read_by_user=Exists(
+            NoticeRead.objects.filter(notice=OuterRef('pk'), user=self.request.user.pk)
+        ))
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -373,6 +522,7 @@ class NoticeViewSet(viewsets.ModelViewSet):
     def mark_read(self, request, pk=None):
         notice = self.get_object()
         NoticeRead.objects.get_or_create(notice=notice, user=request.user)
+        notice.read_by_user = True
         serializer = self.get_serializer(notice)
         return Response(serializer.data)
 
@@ -380,6 +530,7 @@ class NoticeViewSet(viewsets.ModelViewSet):
     def mark_unread(self, request, pk=None):
         notice = self.get_object()
         NoticeRead.objects.filter(notice=notice, user=request.user).delete()
+        notice.read_by_user = False
         serializer = self.get_serializer(notice)
         return Response(serializer.data)
 
@@ -424,50 +575,253 @@ class MaintenanceRequestViewSet(viewsets.ModelViewSet):
         new_status = request.data.get('status')
         if new_status in ['pending', 'in_progress', 'completed', 'cancelled']:
             maintenance.status = new_status
-            maintenance.save(update_fields=["status"])
+            maintenance.save(update_fields=["status", "updated_at"])
             serializer = self.get_serializer(maintenance)
             return Response(serializer.data)
         return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class DashboardStatsView(APIView):
+class LogoutView(APIView):
+    """
+    Revoke the refresh token, and the access token the request was made
+    with if any, so neither can be used again
+    """
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'token-refresh'
+
+    def post(self, request):
+        try:
+            refresh = RefreshToken(request.data.get('refresh', ''))
+        except TokenError:
+            return Response({'refresh': ['Token is invalid or expired']}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = refresh.get(jwt_settings.USER_ID_CLAIM)
+        if request.user.is_authenticated and user_id != request.user.pk:
+            return Response({'refresh': ['Token belongs to another user']}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = User.objects.filter(pk=user_id).first()
+        revoke_token(refresh, user)
+        if request.auth is not None:
+            revoke_token(request.auth, user)
+        return Response(status=status.HTTP_205_RESET_CONTENT)
+
+
+class PaymentWebhookView(APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'webhook'
+
+    def post(self, request):
+        body = request.body
+        if not verify_signature(body, request.headers.get(SIGNATURE_HEADER)):
+            return Response({'error': 'Invalid signature'}, status=status.HTTP_401_UNAUTHORIZED)
+        # Acknowledge right away; the reconciler applies the event later
+        event_id = record_event(body, request.headers.get(EVENT_ID_HEADER))
+        return Response({'status': 'received', 'event_id': event_id})
+
+
+class DatabasePoolStatsView(APIView):
+    """
+    Connection pool counters of the worker process that answers; empty when
+    DB_POOL is off
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({'pid': os.getpid(), 'pools': pool_stats()})
+
+
+def job_accepted(job, request):
+    """
+    202 with the queued job; poll the Location URL for its result
+    """
+    location = reverse('job-detail', args=[job.pk], request=request)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background jobs: admins see all of them, everyone else the ones they started
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status', 'task']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        if self.request.user.role == "admin":
+            return Job.objects.all()
+        return Job.objects.filter(created_by=self.request.user.pk)
+
+
+class ReportJobView(APIView):
+    """
+    Build a financial, occupancy or attendance report in the background
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin | IsWarden]
+
+    def post(self, request):
+        serializer = ReportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        job = enqueue(
+            'generate_report',
+            created_by=request.user,
+            report_type=data['report_type'],
+            start_date=data['start_date'].isoformat(),
+            end_date=data['end_date'].isoformat(),
+        )
+        return job_accepted(job, request)
+
+
+class BackupJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        incremental = str(request.data.get('incremental', '')).lower() in ('true', '1')
+        job = enqueue('backup_database', created_by=request.user, priority=10, incremental=incremental)
+        return job_accepted(job, request)
+
+
+class JobMetricsView(APIView):
+    """
+    Queue depth, lag and per-task throughput over the last ?hours= (default 1)
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        try:
+            hours = max(1, min(int(request.query_params.get('hours', 1)), 168))
+        except ValueError:
+            return Response({'error': 'hours must be a whole number'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(job_metrics(hours))
+
+
+class ActivityFeedView(APIView):
+    """
+    Recent activity, newest first. Pass the returned ``next`` cursor back as
+    ?cursor= to fetch the following page.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        from django.db import models
-        
-        # Basic stats
-        total_students = User.objects.filter(role='student').count()
-        total_rooms = Room.objects.count()
-        occupied_rooms = RoomAllocation.objects.filter(status='active').values('room').distinct().count()
-        available_rooms = total_rooms - occupied_rooms
-        
-        # Payment stats
-        pending_payments = Payment.objects.filter(status='pending').count()
-        monthly_revenue = Payment.objects.filter(
-            status='success',
-            created_at__month=timezone.now().month,
-            created_at__year=timezone.now().year
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        # Complaint and maintenance stats
-        pending_complaints = Complaint.objects.filter(status='open').count()
-        pending_maintenance = MaintenanceRequest.objects.filter(status='pending').count()
-        pending_visitors = 0
-        
-        stats = {
-            'total_students': total_students,
-            'total_rooms': total_rooms,
-            'occupied_rooms': occupied_rooms,
-            'available_rooms': available_rooms,
-            'pending_payments': pending_payments,
-            'pending_complaints': pending_complaints,
-            'pending_maintenance': pending_maintenance,
-            'monthly_revenue': monthly_revenue,
-            'pending_visitors': pending_visitors
-        }
-        
-        serializer = DashboardStatsSerializer(stats)
-        return Response(serializer.data)
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_FEED_LIMIT))
+            events, next_cursor = activity_feed(request.user, limit, request.query_params.get('cursor'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'results': ActivityEventSerializer(events, many=True).data,
+            'next': next_cursor
+        })
 
 
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Chunked, resumable uploads. Create a session, PATCH raw bytes with an
+    Upload-Offset header, then POST complete/ and pass the session ID as
+    ``upload`` when creating a document or setting an avatar.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Chunk PATCHes come in quick succession
+    throttle_scope = 'uploads'
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def _offset_response(self, session, status_code=status.HTTP_200_OK):
+        response = Response(self.get_serializer(session).data, status=status_code)
+        response['Upload-Offset'] = str(session.received)
+        return response
+
+    def _error_response(self, error):
+        response = Response({'error': str(error), 'offset': error.offset}, status=error.status)
+        if error.offset is not None:
+            response['Upload-Offset'] = str(error.offset)
+        return response
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = open_session(request.user, **serializer.validated_data)
+        except UploadError as e:
+            return self._error_response(e)
+        return self._offset_response(session, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._offset_response(self.get_object())
+
+    def partial_update(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return Response({'error': 'Upload-Offset and Content-Length headers are required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Read the raw body straight from the request stream, never request.data
+            session = append_chunk(session.pk, request.user, offset, request.stream, length)
+        except UploadError as e:
+            return self._error_response(e)
+        return self._offset_response(session)
+
+    def perform_destroy(self, instance):
+        discard_session(instance)
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        try:
+            session = complete_session(session.pk, request.user)
+        except UploadError as e:
+            return self._error_response(e)
+        return self._offset_response(session)
+
+
+def check_media_access(user, name):
+    """
+    Raise Http404 unless ``user`` may see the stored file ``name``: documents
+    only to their owner and staff, profile pictures and room images to any
+    signed-in user, anything else to nobody
+    """
+    documents = Document.objects.filter(file=name)
+    if documents.exists():
+        if user.role == "student" and not documents.filter(user=user).exists():
+            raise Http404
+    elif not (User.objects.filter(profile_picture=name).exists() or Room.objects.filter(image=name).exists()):
+        raise Http404
+
+
+class RenditionView(APIView):
+    """
+    Serve a thumbnail of a profile picture or room image, rendering it on
+    first request. Same access rules as the original under MediaView.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, size, name):
+        check_media_access(request.user, name)
+        try:
+            rendition = resolve_rendition(name, size)
+            response = FileResponse(default_storage.open(rendition, 'rb'), content_type=RENDITION_CONTENT_TYPE)
+        except (LookupError, OSError, ValueError):
+            raise Http404
+        # Uploads never overwrite a stored name, so a rendition URL keeps its
+        # content; private keeps shared caches from serving it to others
+        response['Cache-Control'] = 'private, max-age=604800'
+        return response
+
+
+class MediaView(APIView):
+    """
+    Authenticated access to files under MEDIA_ROOT (see check_media_access)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, name):
+        check_media_access(request.user, name)
+        return serve_file(request, name)
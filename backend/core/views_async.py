@@ -0,0 +1,269 @@
+"""
+Async views for the read-heavy endpoints.
+
+Under ASGI a sync view holds a thread for its whole run, so concurrency is
+bounded by threads. These views await their queries instead. Authentication,
+permissions and throttling still run once in a thread, since DRF's
+machinery is synchronous.
+
+Django's async ORM (aget, acount, async for) runs every query of a request on
+that request's one thread, one after another, so independent queries are
+passed to ``gather_queries`` instead. It runs each in a small shared thread
+pool on that thread's own connection and awaits them together, so a page of
+counters costs about as long as its slowest query. Only use it for reads that
+need not see the request's own uncommitted writes.
+
+GET/HEAD on notices/ and users/me/ are served here via ``async_reads``;
+writes on the same URLs still go to the sync viewsets.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import permissions
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import (
+    Complaint, Document, Feedback, MaintenanceRequest, Notice, Payment, Room,
+    RoomAllocation, Visitor
+)
+from .serializers import DashboardStatsSerializer, NoticeSerializer, UserSerializer, field_requested
+from .views import NoticeViewSet
+
+User = get_user_model()
+
+SEARCH_LIMIT = 5
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_QUERY_WORKERS, thread_name_prefix='async-query'
+                )
+    return _executor
+
+
+def _run_query(query):
+    try:
+        return query()
+    finally:
+        # Pool threads outlive requests, so apply the per-request connection hygiene here
+        close_old_connections()
+
+
+async def gather_queries(*queries):
+    """
+    Run zero-argument query callables at the same time; results in the same order
+    """
+    run = sync_to_async(_run_query, thread_sensitive=False, executor=_get_executor())
+    return await asyncio.gather(*(run(query) for query in queries))
+
+
+def async_reads(async_view, sync_view):
+    """
+    One URL view sending GET and HEAD to async_view and other methods to sync_view
+    """
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    return csrf_exempt(view)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authenticators and throttles may touch the database or cache
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+
+def dashboard_stat_queries():
+    """
+    {name: query} for every independent number on the dashboard
+    """
+    now = timezone.now()
+    return {
+        'total_students': lambda: User.objects.filter(role='student').count(),
+        'total_rooms': lambda: Room.objects.count(),
+        'occupied_rooms': lambda: RoomAllocation.objects.filter(status='active').values('room').distinct().count(),
+        'payments': lambda: Payment.objects.aggregate(
+            pending=Count('id', filter=Q(status='pending')),
+            revenue=Sum('amount', filter=Q(status='success', created_at__month=now.month, created_at__year=now.year)),
+        ),
+        'pending_complaints': lambda: Complaint.objects.filter(status='open').count(),
+        'pending_maintenance': lambda: MaintenanceRequest.objects.filter(status='pending').count(),
+        'pending_visitors': lambda: Visitor.objects.filter(status='pending').count(),
+        'average_rating': lambda: Feedback.objects.aggregate(avg=Avg('rating'))['avg'],
+    }
+
+
+def dashboard_stats(results):
+    """
+    Serialized dashboard from the results of dashboard_stat_queries
+    """
+    payments = results.pop('payments')
+    stats = {
+        **results,
+        'available_rooms': results['total_rooms'] - results['occupied_rooms'],
+        'pending_payments': payments['pending'],
+        'monthly_revenue': payments['revenue'] or 0,
+        'average_rating': round(results['average_rating'] or 0, 2),
+    }
+    return DashboardStatsSerializer(stats).data
+
+
+class DashboardStatsView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        queries = dashboard_stat_queries()
+        results = await gather_queries(*queries.values())
+        return Response(dashboard_stats(dict(zip(queries, results))))
+
+
+class NoticeListView(AsyncAPIView, GenericAPIView):
+    """
+    GET notices/ with the same filters, search and ordering as NoticeViewSet
+    """
+    queryset = NoticeViewSet.queryset
+    serializer_class = NoticeSerializer
+    permission_classes = NoticeViewSet.permission_classes
+    filter_backends = NoticeViewSet.filter_backends
+    filterset_fields = NoticeViewSet.filterset_fields
+    search_fields = NoticeViewSet.search_fields
+    ordering_fields = NoticeViewSet.ordering_fields
+    ordering = NoticeViewSet.ordering
+    get_queryset = NoticeViewSet.get_queryset
+
+    async def get(self, request):
+        # Building the filtered queryset runs no queries for these filters
+        queryset = self.filter_queryset(self.get_queryset())
+        notices = [notice async for notice in queryset]
+        return Response(self.get_serializer(notices, many=True).data)
+
+
+class UserMeView(AsyncAPIView):
+    """
+    GET users/me/: the profile and its counters fetched together
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        user_id = request.user.pk
+        queries = {'user': lambda: User.objects.get(pk=user_id)}
+        # Counters left out of ?fields= are not queried at all
+        if field_requested(request, 'current_room'):
+            queries['allocation'] = lambda: (
+                RoomAllocation.objects.filter(user_id=user_id, status='active').select_related('room').first()
+            )
+        if field_requested(request, 'documents_count'):
+            queries['documents'] = lambda: Document.objects.filter(user_id=user_id).count()
+        if field_requested(request, 'pending_visitors'):
+            queries['pending_visitors'] = lambda: Visitor.objects.filter(student_id=user_id, status='pending').count()
+        results = dict(zip(queries, await gather_queries(*queries.values())))
+
+        # The names UserSerializer looks for before querying itself
+        user = results['user']
+        if 'allocation' in results:
+            user.active_allocations = [results['allocation']] if results['allocation'] else []
+        if 'documents' in results:
+            user.documents_total = results['documents']
+        if 'pending_visitors' in results:
+            user.pending_visitors_total = results['pending_visitors']
+        return Response(UserSerializer(user, context={'request': request}).data)
+
+
+class SearchView(AsyncAPIView):
+    """
+    GET search/?q=: up to five users, rooms, complaints and notices matching q,
+    limited to what the caller's role may list elsewhere in the API
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'results': []})
+
+        user = request.user
+        users = User.objects.filter(
+            Q(username__icontains=query) | Q(first_name__icontains=query) |
+            Q(last_name__icontains=query) | Q(email__icontains=query)
+        )
+        complaints = Complaint.objects.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ).select_related('user')
+        if user.role == 'student':
+            users = users.filter(pk=user.pk)
+            complaints = complaints.filter(user_id=user.pk)
+        rooms = Room.objects.filter(Q(number__icontains=query) | Q(description__icontains=query))
+        notices = Notice.objects.filter(
+            Q(title__icontains=query) | Q(content__icontains=query),
+            Q(target_audience=user.role) | Q(target_audience='all'),
+            is_active=True,
+        )
+
+        users, rooms, complaints, notices = await gather_queries(
+            lambda: list(users.order_by('username')[:SEARCH_LIMIT]),
+            lambda: list(rooms.order_by('number')[:SEARCH_LIMIT]),
+            lambda: list(complaints.order_by('-created_at')[:SEARCH_LIMIT]),
+            lambda: list(notices.order_by('-created_at')[:SEARCH_LIMIT]),
+        )
+        return Response({
+            'users': [
+                {'id': u.id, 'name': u.get_full_name(), 'username': u.username, 'role': u.role, 'type': 'user'}
+                for u in users
+            ],
+            'rooms': [
+                {'id': room.id, 'number': room.number, 'room_type': room.room_type, 'status': room.status, 'type': 'room'}
+                for room in rooms
+            ],
+            'complaints': [
+                {'id': c.id, 'title': c.title, 'status': c.status, 'user': c.user.get_full_name(), 'type': 'complaint'}
+                for c in complaints
+            ],
+            'notices': [
+                {'id': n.id, 'title': n.title, 'priority': n.priority, 'type': 'notice'}
+                for n in notices
+            ],
+        })
@@ -1,6 +1,7 @@
+import os
 from datetime import date, datetime, timedelta
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum, Q, Avg
+from django.db.models import Count, Sum, Q, Avg, Exists, OuterRef
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
@@ -10,7 +11,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView, ListAPIView
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
 from .models import (
@@ -23,10 +25,18 @@ from .serializers import (
     AttendanceSerializer, ComplaintSerializer, PaymentSerializer,
     FeedbackSerializer, RoomAllocationSerializer, NoticeSerializer,
     MaintenanceRequestSerializer, AuditLogSerializer, EmailNotificationSerializer,
-    DocumentSerializer, VisitorSerializer, EventSerializer, DashboardStatsSerializer
+    DocumentSerializer, VisitorSerializer, EventSerializer, DashboardStatsSerializer,
+    ActivityEventSerializer, EventAttendeeSerializer, BulkRSVPSerializer, GateCheckSerializer,
+    annotate_user_stats, field_requested, requested_fields
 )
 from .permissions import IsAdmin, IsStudent, IsWarden
-from .utils import log_audit_action, send_notification_email
+from .activity import activity_feed
+from .gate import APPROVED_FIELDS, GateError, pass_index
+from .gate import check_in as gate_check_in, check_out as gate_check_out
+from .media import serve_file
+from .renditions import schedule_renditions
+from .rsvp import ALREADY_JOINED, FULL, NOT_FOUND, NOT_JOINED, bulk_rsvp, join_event, leave_event
+from .utils import log_audit_action, queue_notification_email
 
 
 User = get_user_model()
@@ -43,9 +53,10 @@ class AdvancedUserViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_queryset(self):
+        queryset = annotate_user_stats(self.queryset, requested_fields(self.request))
         if self.request.user.role == "student":
-            return User.objects.filter(id=self.request.user.id)
-        return User.objects.all()
+            return queryset.filter(id=self.request.user.id)
+        return queryset
 
     def perform_create(self, serializer):
         user = serializer.save()
@@ -60,6 +71,8 @@ class AdvancedUserViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         user = serializer.save()
+        if 'profile_picture' in serializer.validated_data:
+            schedule_renditions(user.profile_picture)
         log_audit_action(
             user=self.request.user,
             action='update',
@@ -76,7 +89,7 @@ class AdvancedUserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"], url_path="students")
     def students(self, request):
-        students = User.objects.filter(role="student")
+        students = annotate_user_stats(self.queryset, requested_fields(request)).filter(role="student")
         serializer = self.get_serializer(students, many=True)
         return Response(serializer.data)
 
@@ -87,7 +100,7 @@ class AdvancedUserViewSet(viewsets.ModelViewSet):
         user.save()
         
         # Send verification email
-        send_notification_email(
+        queue_notification_email(
             user=user,
             subject="Email Verified",
             message="Your email has been successfully verified."
@@ -187,10 +200,10 @@ class AdvancedRoomViewSet(viewsets.ModelViewSet):
 
 
 class DocumentViewSet(viewsets.ModelViewSet):
-    queryset = Document.objects.all()
+    queryset = Document.objects.all().select_related("user", "verified_by")
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['document_type', 'is_verified']
     search_fields = ['title', 'description']
@@ -213,6 +226,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
             request=self.request
         )
 
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        # get_queryset already limits students to their own documents
+        document = self.get_object()
+        extension = os.path.splitext(document.file.name)[1]
+        return serve_file(request, document.file.name, as_attachment=True, filename=f'{document.title}{extension}')
+
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated, IsWarden])
     def verify(self, request, pk=None):
         document = self.get_object()
@@ -222,7 +242,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         document.save()
         
         # Send notification to user
-        send_notification_email(
+        queue_notification_email(
             user=document.user,
             subject="Document Verified",
             message=f"Your document '{document.title}' has been verified."
@@ -232,7 +252,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
 
 class VisitorViewSet(viewsets.ModelViewSet):
-    queryset = Visitor.objects.all()
+    queryset = Visitor.objects.all().select_related("student", "approved_by")
     serializer_class = VisitorSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -257,6 +277,24 @@ class VisitorViewSet(viewsets.ModelViewSet):
             request=self.request
         )
 
+    def perform_update(self, serializer):
+        visitor = serializer.instance
+        changed = any(
+            field in serializer.validated_data and serializer.validated_data[field] != getattr(visitor, field)
+            for field in APPROVED_FIELDS
+        )
+        if changed and visitor.status == Visitor.Status.APPROVED:
+            # The approval was for the old visitor or day; the gate must not honour it
+            visitor = serializer.save(status=Visitor.Status.PENDING, approved_by=None, approved_at=None)
+            pass_index.discard(visitor.id)
+            return
+        visitor = serializer.save()
+        pass_index.add(visitor)
+
+    def perform_destroy(self, instance):
+        pass_index.discard(instance.id)
+        instance.delete()
+
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated, IsWarden])
     def approve(self, request, pk=None):
         visitor = self.get_object()
@@ -264,9 +302,10 @@ class VisitorViewSet(viewsets.ModelViewSet):
         visitor.approved_by = request.user
         visitor.approved_at = timezone.now()
         visitor.save()
+        pass_index.add(visitor)
         
         # Send notification to student
-        send_notification_email(
+        queue_notification_email(
             user=visitor.student,
             subject="Visitor Request Approved",
             message=f"Your visitor request for {visitor.visitor_name} has been approved."
@@ -281,9 +320,10 @@ class VisitorViewSet(viewsets.ModelViewSet):
         visitor.approved_by = request.user
         visitor.approved_at = timezone.now()
         visitor.save()
+        pass_index.discard(visitor.id)
         
         # Send notification to student
-        send_notification_email(
+        queue_notification_email(
             user=visitor.student,
             subject="Visitor Request Rejected",
             message=f"Your visitor request for {visitor.visitor_name} has been rejected."
@@ -291,16 +331,47 @@ class VisitorViewSet(viewsets.ModelViewSet):
         
         return Response({'message': 'Visitor request rejected'})
 
+    @action(detail=False, methods=["post"], url_path="check-in", permission_classes=[permissions.IsAuthenticated, IsWarden])
+    def check_in(self, request):
+        return self._gate(request, gate_check_in)
+
+    @action(detail=False, methods=["post"], url_path="check-out", permission_classes=[permissions.IsAuthenticated, IsWarden])
+    def check_out(self, request):
+        return self._gate(request, gate_check_out)
+
+    def _gate(self, request, operation):
+        serializer = GateCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            visitor_pass = operation(data.get('id_proof'), data.get('phone'), data.get('visitor'))
+        except GateError as e:
+            return Response({'error': str(e)}, status=e.status)
+        return Response(visitor_pass.as_dict())
+
+
+class AttendeePagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
 
 class EventViewSet(viewsets.ModelViewSet):
-    queryset = Event.objects.all()
+    queryset = Event.objects.all().select_related("organizer")
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['event_type', 'is_public']
     search_fields = ['title', 'description', 'location']
-    ordering_fields = ['start_date', 'created_at']
+    ordering_fields = ['start_date', 'created_at', 'attendees_count']
     ordering = ['start_date']
+    throttle_scope = {'join': 'rsvp', 'leave': 'rsvp', 'rsvp': 'rsvp'}
+
+    def get_queryset(self):
+        if not field_requested(self.request, 'is_attending'):
+            return self.queryset
+        attending = Event.attendees.through.objects.filter(event_id=OuterRef('pk'), user_id=self.request.user.id)
+        return self.queryset.annotate(user_attending=Exists(attending))
 
     def perform_create(self, serializer):
         event = serializer.save(organizer=self.request.user)
@@ -316,24 +387,47 @@ class EventViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def join(self, request, pk=None):
         event = self.get_object()
-        if event.attendees.filter(id=request.user.id).exists():
+        result = join_event(event.id, request.user.id)
+        if result == FULL:
+            return Response({'error': 'This event is full'}, status=status.HTTP_409_CONFLICT)
+        if result == ALREADY_JOINED:
             return Response({'message': 'Already joined this event'})
-        
-        event.attendees.add(request.user)
         return Response({'message': 'Successfully joined the event'})
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
     def leave(self, request, pk=None):
         event = self.get_object()
-        if not event.attendees.filter(id=request.user.id).exists():
+        if leave_event(event.id, request.user.id) == NOT_JOINED:
             return Response({'message': 'Not joined this event'})
-        
-        event.attendees.remove(request.user)
         return Response({'message': 'Successfully left the event'})
 
+    @action(detail=True, methods=["get"], pagination_class=AttendeePagination)
+    def attendees(self, request, pk=None):
+        event = self.get_object()
+        queryset = event.attendees.only('id', 'username', 'first_name', 'last_name').order_by('id')
+        page = self.paginate_queryset(queryset)
+        serializer = EventAttendeeSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["post"])
+    def rsvp(self, request):
+        serializer = BulkRSVPSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data['join']) | set(serializer.validated_data['leave'])
+        visible = set(self.filter_queryset(self.get_queryset()).filter(id__in=requested).values_list('id', flat=True))
+
+        results = bulk_rsvp(
+            request.user.id,
+            join=[event_id for event_id in serializer.validated_data['join'] if event_id in visible],
+            leave=[event_id for event_id in serializer.validated_data['leave'] if event_id in visible],
+        )
+        for event_id in requested - visible:
+            results[event_id] = NOT_FOUND
+        return Response({'results': {str(event_id): result for event_id, result in results.items()}})
+
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = AuditLog.objects.all()
+    queryset = AuditLog.objects.all().select_related("user")
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -355,13 +449,18 @@ class AdvancedDashboardStatsView(APIView):
         occupied_rooms = RoomAllocation.objects.filter(status='active').values('room').distinct().count()
         available_rooms = total_rooms - occupied_rooms
         
-        # Payment stats
-        pending_payments = Payment.objects.filter(status='pending').count()
-        monthly_revenue = Payment.objects.filter(
-            status='success',
-            created_at__month=timezone.now().month,
-            created_at__year=timezone.now().year
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+        # Payment stats (one aggregate query)
+        now = timezone.now()
+        payment_stats = Payment.objects.aggregate(
+            pending=Count('id', filter=Q(status='pending')),
+            revenue=Sum('amount', filter=Q(
+                status='success',
+                created_at__month=now.month,
+                created_at__year=now.year
+            ))
+        )
+        pending_payments = payment_stats['pending']
+        monthly_revenue = payment_stats['revenue'] or 0
         
         # Complaint and maintenance stats
         pending_complaints = Complaint.objects.filter(status='open').count()
@@ -371,42 +470,9 @@ class AdvancedDashboardStatsView(APIView):
         # Feedback stats
         avg_rating = Feedback.objects.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
         
-        # Recent activities
-        recent_activities = []
-        
-        # Recent payments
-        recent_payments = Payment.objects.filter(status='success').order_by('-created_at')[:5]
-        for payment in recent_payments:
-            recent_activities.append({
-                'type': 'payment',
-                'description': f'{payment.user.get_full_name()} paid ₹{payment.amount}',
-                'timestamp': payment.created_at,
-                'user': payment.user.get_full_name()
-            })
-        
-        # Recent complaints
-        recent_complaints = Complaint.objects.order_by('-created_at')[:5]
-        for complaint in recent_complaints:
-            recent_activities.append({
-                'type': 'complaint',
-                'description': f'New complaint: {complaint.title}',
-                'timestamp': complaint.created_at,
-                'user': complaint.user.get_full_name()
-            })
-        
-        # Recent visitors
-        recent_visitors = Visitor.objects.filter(status='approved').order_by('-created_at')[:5]
-        for visitor in recent_visitors:
-            recent_activities.append({
-                'type': 'visitor',
-                'description': f'Visitor approved: {visitor.visitor_name}',
-                'timestamp': visitor.approved_at or visitor.created_at,
-                'user': visitor.student.get_full_name()
-            })
-        
-        # Sort by timestamp
-        recent_activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        recent_activities = recent_activities[:10]
+        # Recent activities (one indexed query on the activity stream)
+        events, _ = activity_feed(request.user, limit=10)
+        recent_activities = ActivityEventSerializer(events, many=True).data
         
         stats = {
             'total_students': total_students,
@@ -0,0 +1,219 @@
+"""
+Payment provider webhook ingestion and reconciliation.
+
+The webhook view only verifies the HMAC signature and appends the raw body
+to PaymentWebhookEvent; duplicate deliveries collapse on the
+(provider, event_id) unique key. The reconciler later drains pending events
+in batches, resolving every referenced Payment with one query and writing
+them back with one bulk_update per batch. An event whose payment does not
+exist yet stays pending and is retried with backoff until it is too old.
+"""
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .activity import record_changes
+from .backends import write_atomic
+from .models import Payment, PaymentWebhookEvent
+
+
+SIGNATURE_HEADER = 'X-Razorpay-Signature'
+EVENT_ID_HEADER = 'X-Razorpay-Event-Id'
+DEFAULT_PROVIDER = 'razorpay'
+
+# Provider event type -> Payment status it moves the payment to
+EVENT_STATUS = {
+    'payment.captured': 'success',
+    'order.paid': 'success',
+    'payment.failed': 'failed',
+    'refund.processed': 'refunded',
+}
+
+# Allowed transitions; anything else is a stale or out-of-order event
+TRANSITIONS = {
+    'pending': {'success', 'failed'},
+    'failed': {'success'},
+    'success': {'refunded'},
+    'refunded': set(),
+}
+
+
+def sign_payload(body, secret=None):
+    """
+    Hex HMAC-SHA256 of the raw request body, as sent by the provider
+    """
+    secret = secret if secret is not None else settings.PAYMENT_WEBHOOK_SECRET
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, signature, secret=None):
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_payload(body, secret), signature)
+
+
+def record_event(body, event_id=None, provider=DEFAULT_PROVIDER):
+    """
+    Append a verified callback to the inbox. Redeliveries of the same event
+    id are dropped by the unique key without an extra lookup.
+    """
+    if not event_id:
+        event_id = hashlib.sha256(body).hexdigest()[:64]
+    PaymentWebhookEvent.objects.bulk_create(
+        [PaymentWebhookEvent(provider=provider, event_id=event_id, payload=body.decode('utf-8'))],
+        ignore_conflicts=True,
+    )
+    return event_id
+
+
+def _entity(payload):
+    data = payload.get('payload', {})
+    for name in ('payment', 'refund', 'order'):
+        entity = data.get(name, {}).get('entity')
+        if entity:
+            return name, entity
+    return None, {}
+
+
+def parse_event(raw):
+    """
+    Extract (new_status, order_id, payment_id) from a raw provider event
+    """
+    payload = json.loads(raw)
+    new_status = EVENT_STATUS.get(payload.get('event'))
+    name, entity = _entity(payload)
+    if name == 'refund':
+        return new_status, None, entity.get('payment_id')
+    if name == 'order':
+        return new_status, entity.get('id'), None
+    return new_status, entity.get('order_id'), entity.get('id')
+
+
+def retry_delay(attempts):
+    """
+    Seconds before an unmatched event is looked at again: doubling from
+    PAYMENT_WEBHOOK_RETRY_BASE_SECONDS up to PAYMENT_WEBHOOK_RETRY_MAX_SECONDS
+    """
+    return min(
+        settings.PAYMENT_WEBHOOK_RETRY_MAX_SECONDS,
+        settings.PAYMENT_WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+    )
+
+
+def _claim_batch(batch_size, now):
+    queryset = (
+        PaymentWebhookEvent.objects.filter(status='pending')
+        .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+        .order_by('id')
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        # Several reconcilers can drain the inbox side by side
+        queryset = queryset.select_for_update(skip_locked=True)
+    return list(queryset[:batch_size])
+
+
+def reconcile_batch(batch_size=500):
+    """
+    Apply one batch of due events to Payment rows. Returns a summary with
+    the number of events applied, ignored, failed and deferred for a retry.
+    """
+    summary = {'events': 0, 'applied': 0, 'ignored': 0, 'failed': 0, 'deferred': 0}
+    now = timezone.now()
+    cutoff = now - timedelta(hours=settings.PAYMENT_WEBHOOK_RETRY_CUTOFF_HOURS)
+
+    with write_atomic():
+        events = _claim_batch(batch_size, now)
+        if not events:
+            return summary
+        summary['events'] = len(events)
+
+        parsed = []
+        order_ids, payment_ids = set(), set()
+        for event in events:
+            try:
+                new_status, order_id, payment_id = parse_event(event.payload)
+            except (ValueError, AttributeError) as e:
+                event.status, event.error = 'failed', f'Unparseable payload: {e}'
+                continue
+            if not new_status or not (order_id or payment_id):
+                event.status, event.error = 'ignored', 'Unsupported event'
+                continue
+            parsed.append((event, new_status, order_id, payment_id))
+            if order_id:
+                order_ids.add(order_id)
+            if payment_id:
+                payment_ids.add(payment_id)
+
+        by_order, by_payment = {}, {}
+        if parsed:
+            matches = Payment.objects.filter(provider_order_id__in=order_ids) | Payment.objects.filter(provider_payment_id__in=payment_ids)
+            for payment in matches.select_related('user'):
+                if payment.provider_order_id:
+                    by_order[payment.provider_order_id] = payment
+                if payment.provider_payment_id:
+                    by_payment[payment.provider_payment_id] = payment
+
+        changed = {}
+        for event, new_status, order_id, payment_id in parsed:
+            payment = by_order.get(order_id) or by_payment.get(payment_id)
+            if payment is None:
+                # The payment may not be committed yet; only give up on old events
+                event.attempts += 1
+                if event.received_at <= cutoff:
+                    event.status, event.error = 'failed', f'No matching payment after {event.attempts} attempts'
+                else:
+                    event.error = 'No matching payment yet'
+                    event.retry_at = now + timedelta(seconds=retry_delay(event.attempts))
+                continue
+            if new_status not in TRANSITIONS.get(payment.status, set()):
+                event.status, event.error = 'ignored', f'Stale transition {payment.status} -> {new_status}'
+                continue
+            payment.status = new_status
+            if payment_id and not payment.provider_payment_id:
+                payment.provider_payment_id = payment_id
+                by_payment[payment_id] = payment
+            if new_status == 'success' and not payment.paid_date:
+                payment.paid_date = now
+            payment.updated_at = now
+            changed[payment.pk] = payment
+            event.status = 'applied'
+
+        if changed:
+            Payment.objects.bulk_update(
+                list(changed.values()), ['status', 'provider_payment_id', 'paid_date', 'updated_at'], batch_size=500
+            )
+            record_changes(list(changed.values()))
+        for event in events:
+            if event.status == 'pending':
+                summary['deferred'] += 1
+                continue
+            event.processed_at = now
+            summary[event.status] += 1
+        PaymentWebhookEvent.objects.bulk_update(
+            events, ['status', 'error', 'processed_at', 'attempts', 'retry_at'], batch_size=500
+        )
+
+    return summary
+
+
+def reconcile_pending(batch_size=500, max_batches=None):
+    """
+    Drain the due events batch by batch until none are left (or max_batches
+    is hit). Deferred events are not due again within the same drain.
+    """
+    totals = {'events': 0, 'applied': 0, 'ignored': 0, 'failed': 0, 'deferred': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        summary = reconcile_batch(batch_size)
+        if not summary['events']:
+            break
+        batches += 1
+        for key in totals:
+            totals[key] += summary[key]
+    return totals
@@ -1,6 +1,8 @@
 from pathlib import Path
 import os
+import secrets
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +36,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.replicas.ReplicaPinningMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -59,11 +62,18 @@ TEMPLATES = [
 WSGI_APPLICATION = "hostelease.wsgi.application"
 ASGI_APPLICATION = "hostelease.asgi.application"
 
+# Persistent connections: seconds a connection is kept for reuse (0 closes it
+# after every request), and whether it is pinged before being reused
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+
 # Database (uses DATABASE_URL if set; else falls back to Postgres env; else SQLite)
 database_url = os.getenv("DATABASE_URL")
 if database_url:
     DATABASES = {
-        "default": dj_database_url.parse(database_url, conn_max_age=600, ssl_require=False)
+        "default": dj_database_url.parse(
+            database_url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS, ssl_require=False
+        )
     }
 else:
     if os.getenv("DB_HOST") or os.getenv("DB_NAME"):
@@ -75,6 +85,8 @@ else:
                 "PASSWORD": os.getenv("DB_PASSWORD", "postgres"),
                 "HOST": os.getenv("DB_HOST", "127.0.0.1"),
                 "PORT": os.getenv("DB_PORT", "5432"),
+                "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+                "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
             }
         }
     else:
@@ -82,9 +94,71 @@ else:
             "default": {
                 "ENGINE": "django.db.backends.sqlite3",
                 "NAME": BASE_DIR / "db.sqlite3",
+                "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+                "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
             }
         }
 
+# Read replicas: comma-separated database URLs. Safe-method requests read from
+# them; writes, and every read for DB_REPLICA_PIN_SECONDS after a user's
+# write, go to the primary. The pin is a cache key per user, so several
+# workers need REDIS_URL to share it. A replica that fails to connect is
+# skipped for DB_REPLICA_RETRY_SECONDS.
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+for index, replica_url in enumerate(DB_REPLICA_URLS, start=1):
+    DATABASES[f"replica_{index}"] = {
+        **dj_database_url.parse(
+            replica_url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=DB_CONN_HEALTH_CHECKS, ssl_require=False
+        ),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "10"))
+DB_REPLICA_RETRY_SECONDS = int(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+# Threads (each with its own DB connection) that async views use to run
+# independent queries of one request at the same time
+ASYNC_QUERY_WORKERS = int(os.getenv("ASYNC_QUERY_WORKERS", "8"))
+
+# Postgres connection pool shared by all threads of a worker process. Connections
+# return to the pool at the end of each request instead of being kept per thread.
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+
+# Opt-in SQLite production profile for concurrent requests on one node: WAL
+# journal, memory-mapped reads and a busy timeout (see core/backends/sqlite_tuned).
+# WAL is a persistent property of the database file
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "False") == "True"
+
+for database in DATABASES.values():
+    if DB_POOL and database["ENGINE"] == "django.db.backends.postgresql":
+        database.update({
+            "ENGINE": "core.backends.postgresql_pool",
+            "CONN_MAX_AGE": 0,
+            "POOL": {
+                "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            },
+        })
+    elif SQLITE_TUNED and database["ENGINE"] == "django.db.backends.sqlite3":
+        database.update({
+            "ENGINE": "core.backends.sqlite_tuned",
+            "PRAGMAS": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+                "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024))),
+                "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+                "temp_store": "MEMORY",
+            },
+        })
+
+# Race tests run several connections at once. An in-memory SQLite test
+# database fails them with "table is locked" where a file waits for the lock
+if DATABASES["default"]["ENGINE"] in ("django.db.backends.sqlite3", "core.backends.sqlite_tuned"):
+    DATABASES["default"].setdefault("TEST", {}).setdefault("NAME", str(BASE_DIR / "test_db.sqlite3"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -115,9 +189,22 @@ DEFAULT_FROM_EMAIL = 'SmartStay Hostel <your-email@gmail.com>'
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Multipart files above this size are spooled to a temp file instead of memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", str(2 * 1024 * 1024)))  # 2MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Chunked, resumable uploads (see core/uploads.py)
+CHUNKED_UPLOAD_DIR = Path(os.getenv("CHUNKED_UPLOAD_DIR", BASE_DIR / "upload_tmp"))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))  # 100MB
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_CHUNK_SIZE", str(8 * 1024 * 1024)))  # 8MB
+CHUNKED_UPLOAD_TTL_HOURS = int(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", "24"))
+
+# Protected media: "django" streams from the app (sendfile via the WSGI server),
+# "x-accel" hands off to nginx (internal location at MEDIA_ACCEL_PREFIX aliased
+# to MEDIA_ROOT), "x-sendfile" to Apache mod_xsendfile
+MEDIA_SERVE_MODE = os.getenv("MEDIA_SERVE_MODE", "django")
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
+
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -175,13 +262,120 @@ AUTH_USER_MODEL = "core.User"
 # DRF
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "core.throttling.TokenBucketThrottle",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+}
+
+# Build large unpaginated lists (attendance, payments) from values() rows
+# instead of serializer instances; the JSON is identical either way
+FAST_LIST_VIEWS = os.getenv("FAST_LIST_VIEWS", "True") == "True"
+
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "core.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "core.authentication.ClaimsTokenRefreshSerializer",
 }
 
+# Shared cache (Redis) when REDIS_URL is set, otherwise per-process memory
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# How long a user's current token version is cached. With the per-process
+# cache, a role/password change reaches other workers within this window.
+AUTH_TOKEN_VERSION_CACHE_SECONDS = int(os.getenv("AUTH_TOKEN_VERSION_CACHE_SECONDS", "300"))
+
+# Token-bucket throttling. "burst" is the bucket size, "rate" the sustained
+# refill. Buckets are per process unless THROTTLE_STORE is "redis".
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "True") == "True"
+THROTTLE_STORE = os.getenv("THROTTLE_STORE", "redis" if REDIS_URL else "local")
+THROTTLE_RATES = {
+    "anon": {"burst": 30, "rate": "60/min"},
+    "user": {"burst": 100, "rate": "600/min"},
+    "login": {"burst": 10, "rate": "20/min"},
+    "login-username": {"burst": 5, "rate": "5/min"},
+    "token-refresh": {"burst": 20, "rate": "60/min"},
+    "register": {"burst": 5, "rate": "20/hour"},
+    "rsvp": {"burst": 20, "rate": "60/min"},
+    "uploads": {"burst": 300, "rate": "3000/min"},
+    "webhook": {"burst": 500, "rate": "6000/min"},
+}
+
+# Revoked (logged out) tokens: how often each worker picks up revocations made
+# elsewhere, and the bloom filter's sizing
+TOKEN_REVOCATION_REFRESH_SECONDS = int(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "30"))
+TOKEN_REVOCATION_BLOOM_CAPACITY = int(os.getenv("TOKEN_REVOCATION_BLOOM_CAPACITY", "100000"))
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("TOKEN_REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+
+# Processes used to hash passwords during bulk student imports (0 = one per CPU)
+BULK_IMPORT_HASH_WORKERS = int(os.getenv("BULK_IMPORT_HASH_WORKERS", "0"))
+
+# Idempotency-Key replay window for retried POSTs
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# A key claimed by a request that has not stored its response for this long
+# (e.g. its worker died) is handed to the next retry
+IDEMPOTENCY_CLAIM_SECONDS = int(os.getenv("IDEMPOTENCY_CLAIM_SECONDS", "300"))
+
+# Background jobs (manage.py run_jobs). Failed jobs retry after a delay that
+# doubles from JOB_RETRY_BASE_SECONDS up to JOB_RETRY_MAX_SECONDS; a running
+# job whose worker has not sent a heartbeat for JOB_LEASE_SECONDS is requeued.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+# Periodic jobs, enqueued by the workers on cron expressions (TIME_ZONE)
+JOB_SCHEDULES = {
+    "backup-database": {"task": "backup_database", "cron": "0 2 * * 0"},
+    "backup-database-incremental": {
+        "task": "backup_database", "cron": "0 2 * * 1-6", "kwargs": {"incremental": True},
+    },
+    "cleanup-old-data": {"task": "cleanup_old_data", "cron": "30 3 * * *"},
+    "purge-idempotency-keys": {"task": "purge_idempotency_keys", "cron": "15 * * * *"},
+    "purge-revoked-tokens": {"task": "purge_revoked_tokens", "cron": "45 * * * *"},
+    "purge-upload-sessions": {"task": "purge_upload_sessions", "cron": "0 */6 * * *"},
+} if os.getenv("JOB_SCHEDULES_ENABLED", "True") == "True" else {}
+
+# Database backups (manage.py backup_database / restore_backup). Rows are
+# streamed in primary-key chunks of BACKUP_CHUNK_SIZE; incremental backups
+# re-read rows changed up to BACKUP_WATERMARK_OVERLAP_SECONDS before the
+# previous backup started. Chains older than the newest BACKUP_KEEP_FULL
+# full backups are deleted (0 keeps everything).
+BACKUP_DIR = os.getenv("BACKUP_DIR", str(BASE_DIR / "backups"))
+BACKUP_CHUNK_SIZE = int(os.getenv("BACKUP_CHUNK_SIZE", "2000"))
+BACKUP_COMPRESS_LEVEL = int(os.getenv("BACKUP_COMPRESS_LEVEL", "6"))
+BACKUP_WATERMARK_OVERLAP_SECONDS = int(os.getenv("BACKUP_WATERMARK_OVERLAP_SECONDS", "300"))
+BACKUP_KEEP_FULL = int(os.getenv("BACKUP_KEEP_FULL", "4"))
+# Threads loading independent tables during a restore (SQLite always uses one)
+RESTORE_WORKERS = int(os.getenv("RESTORE_WORKERS", "4"))
+
+# Payment provider webhooks (HMAC-SHA256 shared secret). Required outside
+# DEBUG; in development a random per-process secret is used, so no known
+# value can sign a callback
+PAYMENT_WEBHOOK_SECRET = os.getenv("PAYMENT_WEBHOOK_SECRET")
+if not PAYMENT_WEBHOOK_SECRET:
+    if not DEBUG:
+        raise ImproperlyConfigured("PAYMENT_WEBHOOK_SECRET must be set when DEBUG is False")
+    PAYMENT_WEBHOOK_SECRET = secrets.token_hex(32)
+# An event can arrive before its payment row is committed; it stays pending
+# and is retried after a delay doubling from PAYMENT_WEBHOOK_RETRY_BASE_SECONDS
+# up to PAYMENT_WEBHOOK_RETRY_MAX_SECONDS, and fails once it is older than
+# PAYMENT_WEBHOOK_RETRY_CUTOFF_HOURS
+PAYMENT_WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("PAYMENT_WEBHOOK_RETRY_BASE_SECONDS", "5"))
+PAYMENT_WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("PAYMENT_WEBHOOK_RETRY_MAX_SECONDS", "900"))
+PAYMENT_WEBHOOK_RETRY_CUTOFF_HOURS = float(os.getenv("PAYMENT_WEBHOOK_RETRY_CUTOFF_HOURS", "24"))
+
 # CORS
 FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
 CORS_ALLOWED_ORIGINS = [FRONTEND_ORIGIN]
@@ -1,6 +1,7 @@
 import React, { useState } from 'react'
 import { useAuth } from '../contexts/AuthContext'
 import { useNavigate } from 'react-router-dom'
+import ProtectedImage from './ProtectedImage'
 
 const Navbar = ({ onMenuClick }) => {
   const { user, logout } = useAuth()
@@ -54,7 +55,7 @@ const Navbar = ({ onMenuClick }) => {
           >
             <div className="profile-avatar">
               {user?.profile_picture ? (
-                <img src={user.profile_picture} alt="Profile" />
+                <ProtectedImage src={user.profile_picture_thumbnails?.thumb || user.profile_picture} alt="Profile" />
               ) : (
                 <span>{user?.first_name?.[0] || user?.username?.[0] || 'U'}</span>
               )}
@@ -0,0 +1,31 @@
+import React, { useEffect, useState } from 'react'
+import axios from 'axios'
+
+// /api/media/ and /api/renditions/ need the bearer token, which a plain
+// <img src> does not send
+const ProtectedImage = ({ src, alt, ...props }) => {
+  const [objectUrl, setObjectUrl] = useState(null)
+
+  useEffect(() => {
+    let url = null
+    let cancelled = false
+    setObjectUrl(null)
+    if (!src) return undefined
+    axios.get(src, { responseType: 'blob' })
+      .then(res => {
+        if (cancelled) return
+        url = URL.createObjectURL(res.data)
+        setObjectUrl(url)
+      })
+      .catch(() => {})
+    return () => {
+      cancelled = true
+      if (url) URL.revokeObjectURL(url)
+    }
+  }, [src])
+
+  if (!objectUrl) return null
+  return <img src={objectUrl} alt={alt} {...props} />
+}
+
+export default ProtectedImage
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react'
 import axios from 'axios'
 import { useAuth } from '../contexts/AuthContext'
+import ProtectedImage from './ProtectedImage'
 
 const Rooms = () => {
   const { user } = useAuth()
@@ -55,6 +56,9 @@ const Rooms = () => {
           {rooms.map(r => (
             <div key={r.id} className="activity-item">
               <div className="activity-content" style={{ width: '100%' }}>
+                {r.image_thumbnails?.card && (
+                  <ProtectedImage src={r.image_thumbnails.card} alt={`Room ${r.number}`} style={{ maxWidth: 240, borderRadius: 8, marginBottom: 8 }} />
+                )}
                 <p style={{ margin: 0 }}>#{r.number} • {r.room_type} • capacity {r.capacity}</p>
                 <div style={{ display: 'flex', gap: 8, marginTop: 8 }}>
                   <button className="register-btn" onClick={()=>book(r.id)}>Book</button>
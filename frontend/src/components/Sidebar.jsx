@@ -1,6 +1,7 @@
 import React from 'react'
 import { NavLink, useLocation } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
+import ProtectedImage from './ProtectedImage'
 
 const Sidebar = ({ isOpen, onClose }) => {
   const { user } = useAuth()
@@ -169,7 +170,7 @@ const Sidebar = ({ isOpen, onClose }) => {
           <div className="user-info">
             <div className="user-avatar">
               {user?.profile_picture ? (
-                <img src={user.profile_picture} alt="Profile" />
+                <ProtectedImage src={user.profile_picture_thumbnails?.thumb || user.profile_picture} alt="Profile" />
               ) : (
                 <span>{user?.first_name?.[0] || user?.username?.[0] || 'U'}</span>
               )}
@@ -29,12 +29,12 @@ const Visitors = () => {
     }
   }
 
-  const approve = async (id) => {
+  const decide = async (id, action) => {
     try {
-      await axios.patch(`http://localhost:8000/api/visitors/${id}/`, { status: 'approved' })
+      await axios.post(`http://localhost:8000/api/visitors/${id}/${action}/`)
       load()
     } catch (e) {
-      setError('Failed to approve')
+      setError(`Failed to ${action}`)
     }
   }
 
@@ -80,7 +80,8 @@ const Visitors = () => {
                 <p style={{ margin: 0 }}>{v.visitor_name} • {v.visit_date} {v.visit_time} — {v.status}</p>
                 {v.status === 'pending' && (
                   <div style={{ display: 'flex', gap: 8, marginTop: 8 }}>
-                    <button className="register-btn" onClick={()=>approve(v.id)}>Approve</button>
+                    <button className="register-btn" onClick={()=>decide(v.id, 'approve')}>Approve</button>
+                    <button className="register-btn" onClick={()=>decide(v.id, 'reject')}>Reject</button>
                   </div>
                 )}
               </div>